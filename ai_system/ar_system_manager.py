@@ -9,7 +9,7 @@ import logging
 import cv2
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Awaitable
 import uuid
 import aiohttp
 import pika
@@ -97,7 +97,11 @@ class Agent2AI:
         await ai_orchestrator.initialize()
         logger.info("Agent2 (AI) initialized successfully")
         
-    async def process_command(self, command: ARCommand) -> Dict[str, Any]:
+    async def process_command(
+        self,
+        command: ARCommand,
+        token_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
         """Process transcribed command through AI system"""
         try:
             logger.info(f"Agent2 processing command: {command. transcription}")
@@ -117,7 +121,8 @@ class Agent2AI:
                 query=command.transcription,
                 session_id=command.session_id,
                 use_tools=True,
-                use_memory=True
+                use_memory=True,
+                token_callback=token_callback
             )
             
             command.ai_response = result["response"]
@@ -305,8 +310,17 @@ class ARSystemManager:
             logger.error(f"❌ Error processing AR glasses stream: {e}")
             raise
     
-    async def process_ar_command(self, audio_data: bytes, user_id: str = "ar_user") -> Dict[str, Any]:
-        """Main processing pipeline for AR commands"""
+    async def process_ar_command(
+        self,
+        audio_data: bytes,
+        user_id: str = "ar_user",
+        token_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """Main processing pipeline for AR commands
+        
+        token_callback, if given, receives partial AI response tokens as
+        {"command_id", "stage", "token"} events while the LLM is generating.
+        """
         command_id = str(uuid.uuid4())
         command = ARCommand(
             command_id=command_id,
@@ -331,7 +345,12 @@ class ARSystemManager:
             
             # Step 2: Agent2 - AI Processing
             logger.info(f"Step 2: Processing '{transcription}' through Agent2 (AI)")
-            ai_result = await self.agent2.process_command(command)
+            command_token_callback = None
+            if token_callback:
+                async def command_token_callback(event: Dict[str, Any]):
+                    await token_callback({"command_id": command_id, **event})
+            
+            ai_result = await self.agent2.process_command(command, command_token_callback)
             
             # Step 3: Task Execution (if needed)
             if command.task_type:
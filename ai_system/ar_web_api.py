@@ -294,11 +294,19 @@ def create_ar_api_routes(app: FastAPI):
     
     # WebSocket endpoint for real-time AR communication
     @app.websocket("/ar/ws/{user_id}")
-    async def ar_websocket_endpoint(websocket: WebSocket, user_id: str):
-        """WebSocket endpoint for real-time AR communication"""
+    async def ar_websocket_endpoint(websocket: WebSocket, user_id: str, stream: bool = True):
+        """WebSocket endpoint for real-time AR communication
+        
+        With stream enabled (the default), partial response tokens are sent as
+        {"type": "token", "command_id", "stage", "token"} messages before the
+        final result. Connect with ?stream=false to receive only the result.
+        """
         await websocket.accept()
         logger.info(f"AR WebSocket connected for user: {user_id}")
         
+        async def send_token(event: Dict[str, Any]):
+            await websocket.send_text(json.dumps({"type": "token", **event}))
+        
         try:
             while True:
                 # Receive audio data
@@ -307,7 +315,8 @@ def create_ar_api_routes(app: FastAPI):
                 # Process through AR system
                 result = await ar_system_manager.process_ar_command(
                     audio_data=data,
-                    user_id=user_id
+                    user_id=user_id,
+                    token_callback=send_token if stream else None
                 )
                 
                 # Send response back
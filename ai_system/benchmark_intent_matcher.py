@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Intent Matcher Micro-benchmark
+Compares the per-pattern re.search loop with IntentMatcher as the pattern list grows
+
+Synthetic "learned" patterns shaped like the built-in ones are added on top
+of the agent's base patterns to simulate memory-loaded patterns.
+"""
+
+import argparse
+import random
+import re
+import statistics
+import time
+from typing import Callable, Dict, List
+
+try:
+    from .intent_matcher import IntentMatcher
+    from .intelligent_agent import IntelligentAgent
+except ImportError:
+    from intent_matcher import IntentMatcher
+    from intelligent_agent import IntelligentAgent
+
+INPUTS = [
+    "navigate to taipei 101",
+    "我要去台北車站",
+    "what is the tsmc stock price?",
+    "台積電的股價",
+    "show me pictures of the eiffel tower",
+    "my ur10 robot arm is making a grinding noise",
+    "remind me to call mom tomorrow",
+    "play some jazz",
+    "I'm hungry",
+    "explain how a pid controller works"
+]
+
+WORDS = [
+    "book", "order", "reserve", "translate", "convert", "measure", "scan", "identify",
+    "summarize", "compare", "track", "monitor", "calibrate", "inspect", "label", "count",
+    "預約", "翻譯", "掃描", "辨識", "測量", "比較", "追蹤", "檢查"
+]
+
+def synthetic_patterns(count: int, seed: int = 0) -> Dict[str, List[str]]:
+    """Learned-looking patterns spread over the intent categories"""
+    rng = random.Random(seed)
+    categories = list(IntelligentAgent._initialize_intent_patterns(None))
+    patterns: Dict[str, List[str]] = {}
+    for i in range(count):
+        verbs = "|".join(rng.sample(WORDS, 2))
+        if rng.random() < 0.5:
+            pattern = rf'(?:{verbs}) (?:the |a )?(.+) (?:for|with) (.+) {i}'
+        else:
+            pattern = rf'(?:{verbs})(.+)第{i}'
+        patterns.setdefault(rng.choice(categories), []).append(pattern)
+    return patterns
+
+def legacy_match_all(patterns: Dict[str, List[str]], user_input: str) -> list:
+    """The original loop: every uncompiled pattern searched in turn"""
+    text = user_input.lower().strip()
+    matches = []
+    for category, category_patterns in patterns.items():
+        for pattern in category_patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                matches.append((category, pattern))
+    return matches
+
+def _time_per_call(fn: Callable[[str], object], rounds: int) -> float:
+    """Median microseconds per input over rounds passes of INPUTS"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for user_input in INPUTS:
+            fn(user_input)
+        samples.append((time.perf_counter() - start) / len(INPUTS) * 1e6)
+    return statistics.median(samples)
+
+def run(sizes: List[int], rounds: int):
+    base = IntelligentAgent._initialize_intent_patterns(None)
+    print(f"{'patterns':>10}{'loop us':>12}{'matcher us':>12}{'speedup':>10}{'build ms':>10}")
+    for extra in sizes:
+        patterns = {category: list(category_patterns) for category, category_patterns in base.items()}
+        for category, category_patterns in synthetic_patterns(extra).items():
+            patterns[category].extend(category_patterns)
+        
+        start = time.perf_counter()
+        matcher = IntentMatcher(patterns)
+        matcher.match_all("-")  # builds the automaton
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        for user_input in INPUTS:
+            expected = sorted(legacy_match_all(patterns, user_input))
+            actual = sorted((match.category, match.pattern) for match in matcher.match_all(user_input))
+            assert expected == actual, f"matcher disagrees with the loop on {user_input!r}"
+        
+        loop_us = _time_per_call(lambda user_input: legacy_match_all(patterns, user_input), rounds)
+        matcher_us = _time_per_call(matcher.match_all, rounds)
+        print(f"{len(matcher):>10}{loop_us:>12.1f}{matcher_us:>12.1f}{loop_us / matcher_us:>9.1f}x{build_ms:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intent pattern matching")
+    parser.add_argument("--learned", type=int, nargs="+", default=[0, 100, 500, 1000],
+                        help="Synthetic learned patterns to add on top of the base set")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    run(args.learned, args.rounds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+LLM Client Benchmark
+Measures per-request HTTP overhead of LLMManager against a local Ollama stub
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import aiohttp
+
+try:
+    from .config import config
+    from .llm_manager import LLMManager
+    from .ollama_stub_server import OllamaStubServer
+except ImportError:
+    from config import config
+    from llm_manager import LLMManager
+    from ollama_stub_server import OllamaStubServer
+
+def _summarize(name: str, latencies: List[float], wall_time: float) -> Dict[str, float]:
+    """Summarize request latencies in milliseconds"""
+    ordered = sorted(latencies)
+    return {
+        "name": name,
+        "requests": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "throughput_rps": len(ordered) / wall_time if wall_time else 0.0
+    }
+
+async def _unpooled_chat(endpoint: str, messages: List[Dict[str, str]]) -> str:
+    """Chat request the way LLMManager used to issue it: one session per call"""
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            f"{endpoint}/api/chat",
+            json={"model": config.default_llm, "messages": messages, "stream": False}
+        ) as response:
+            data = await response.json()
+            return data.get("message", {}).get("content", "")
+
+async def _run(label: str, call, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return _summarize(label, latencies, time.perf_counter() - start)
+
+async def run_benchmark(requests: int, concurrency: int, port: int) -> List[Dict[str, float]]:
+    """Compare fresh-session requests with the pooled LLMManager client"""
+    server = OllamaStubServer(port=port)
+    await server.start()
+    
+    # Point every configured model at the stub
+    for llm_config in config.llm_configs.values():
+        llm_config.endpoint = server.endpoint
+    
+    manager = LLMManager()
+    await manager._load_available_models()
+    messages = [{"role": "user", "content": "What is the TSMC stock price?"}]
+    
+    try:
+        # Warm up both paths so neither pays one-time import/DNS costs
+        await _unpooled_chat(server.endpoint, messages)
+        await manager.chat_completion(messages=messages)
+        
+        results = [
+            await _run(
+                "unpooled (session per request)",
+                lambda: _unpooled_chat(server.endpoint, messages),
+                requests, concurrency
+            ),
+            await _run(
+                "pooled (LLMManager)",
+                lambda: manager.chat_completion(messages=messages),
+                requests, concurrency
+            )
+        ]
+    finally:
+        await manager.shutdown()
+        await server.stop()
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLMManager HTTP overhead")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--port", type=int, default=11435)
+    args = parser.parse_args()
+    
+    results = asyncio.run(run_benchmark(args.requests, args.concurrency, args.port))
+    
+    print(f"{'client':<34}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}")
+    for result in results:
+        print(
+            f"{result['name']:<34}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}"
+            f"{result['p95_ms']:>10.2f}{result['throughput_rps']:>10.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
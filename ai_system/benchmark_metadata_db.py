@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Metadata Database Benchmark
+Message insert and history lookup throughput in a large RAG metadata store
+
+Compares the original access pattern (a new connection per operation,
+rollback journal, primary keys only) with RAGMemorySystem's pooled WAL
+connection and indexes. Both databases are filled with the same synthetic
+conversations before timing.
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator, Tuple
+
+try:
+    from .config import RAGConfig
+    from .rag_memory import RAGMemorySystem
+except ImportError:
+    from config import RAGConfig
+    from rag_memory import RAGMemorySystem
+
+def synthetic_messages(count: int, conversations: int) -> Iterator[Tuple[str, str, str, str, str]]:
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        conversation_id = f"conv_{i % conversations}"
+        role = "user" if i % 2 == 0 else "assistant"
+        timestamp = (start + timedelta(seconds=i)).isoformat()
+        yield f"msg_{i}", conversation_id, role, f"synthetic message {i} in {conversation_id}", timestamp
+
+def populate(db_path: Path, messages: int, conversations: int):
+    """Bulk-load conversations and messages in a few large transactions"""
+    with sqlite3.connect(db_path) as conn:
+        now = datetime.now().isoformat()
+        conn.executemany(
+            "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?, ?)",
+            [(f"conv_{i}", f"Conversation {i}", now, now, messages // conversations) for i in range(conversations)]
+        )
+        rows = synthetic_messages(messages, conversations)
+        while True:
+            chunk = [row for _, row in zip(range(100_000), rows)]
+            if not chunk:
+                break
+            conn.executemany("INSERT INTO conversation_messages VALUES (?, ?, ?, ?, ?)", chunk)
+        conn.commit()
+
+def legacy_add_message(db_path: Path, conversation_id: str, role: str, content: str, message_id: str):
+    """The original write: its own connection, two statements, one commit"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "INSERT INTO conversation_messages (message_id, conversation_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (message_id, conversation_id, role, content, datetime.now().isoformat())
+        )
+        conn.execute(
+            "UPDATE conversations SET message_count = message_count + 1, updated_at = ? WHERE conversation_id = ?",
+            (datetime.now().isoformat(), conversation_id)
+        )
+        conn.commit()
+
+def legacy_history(db_path: Path, conversation_id: str, limit: int = 50) -> list:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            '''SELECT message_id, role, content, timestamp FROM conversation_messages
+               WHERE conversation_id = ? ORDER BY timestamp DESC LIMIT ?''',
+            (conversation_id, limit)
+        ).fetchall()
+
+def _throughput(fn: Callable[[int], object], count: int) -> float:
+    """Operations per second over count calls"""
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return count / (time.perf_counter() - start)
+
+def run(messages: int, conversations: int, inserts: int, lookups: int):
+    rng = random.Random(0)
+    targets = [f"conv_{rng.randrange(conversations)}" for _ in range(max(inserts, lookups))]
+    results = {}
+    
+    with tempfile.TemporaryDirectory(prefix="bench_metadata_") as tmp:
+        for mode in ("legacy", "pooled"):
+            memory = RAGMemorySystem(RAGConfig(vector_db_path=str(Path(tmp) / mode)))
+            memory.metadata_db_path.parent.mkdir(parents=True)
+            memory._create_metadata_tables()
+            if mode == "legacy":
+                memory.metadata_db.close()
+                with sqlite3.connect(memory.metadata_db_path) as conn:
+                    conn.execute("DROP INDEX idx_messages_conversation_time")
+                    conn.execute("DROP INDEX idx_documents_created_access")
+                    conn.execute("PRAGMA journal_mode=DELETE")
+            
+            start = time.perf_counter()
+            populate(memory.metadata_db_path, messages, conversations)
+            print(f"{mode}: loaded {messages:,} messages in {time.perf_counter() - start:.1f}s")
+            
+            if mode == "legacy":
+                add = lambda i: legacy_add_message(memory.metadata_db_path, targets[i], "user", f"bench {i}", f"bench_{i}")
+                history = lambda i: legacy_history(memory.metadata_db_path, targets[i])
+            else:
+                add = lambda i: memory._add_message_sync(targets[i], "user", f"bench {i}", f"bench_{i}")
+                history = lambda i: memory._get_conversation_history_sync(targets[i], 50)
+            
+            results[mode] = (_throughput(add, inserts), _throughput(history, lookups))
+            memory.metadata_db.close()
+    
+    print(f"{'mode':>8}{'inserts/s':>12}{'lookups/s':>12}")
+    for mode, (insert_rate, lookup_rate) in results.items():
+        print(f"{mode:>8}{insert_rate:>12.0f}{lookup_rate:>12.0f}")
+    legacy, pooled = results["legacy"], results["pooled"]
+    print(f"{'speedup':>8}{pooled[0] / legacy[0]:>11.1f}x{pooled[1] / legacy[1]:>11.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG metadata database")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--conversations", type=int, default=10_000)
+    parser.add_argument("--inserts", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=200, help="Unindexed lookups scan every message, so keep this small")
+    args = parser.parse_args()
+    run(args.messages, args.conversations, args.inserts, args.lookups)
+
+if __name__ == "__main__":
+    main()
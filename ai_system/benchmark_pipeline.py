@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Pipeline Latency Benchmark
+Drives the orchestrator, intelligent agent and AR pipeline against the Ollama stub
+
+Speech recognition and the RabbitMQ hand-off are replaced inside the harness
+so the AR stage runs without audio hardware or a broker. Pass --max-p95 /
+--max-p99 thresholds to make the run exit non-zero on regressions in CI.
+Each stage also reports "<stage>.loop_lag": how late the event loop woke a
+probe task while the stage ran, e.g. --max-p99 process_query.loop_lag=20.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from .config import config
+    from .llm_manager import llm_manager
+    from .loop_monitor import EventLoopMonitor
+    from .ollama_stub_server import OllamaStubServer
+except ImportError:
+    from config import config
+    from llm_manager import llm_manager
+    from loop_monitor import EventLoopMonitor
+    from ollama_stub_server import OllamaStubServer
+
+STAGES = ["process_query", "understand_intent", "process_ar_command"]
+
+QUERIES = [
+    "What is the TSMC stock price?",
+    "Search for pictures of the Taipei 101",
+    "My robotic arm is making a grinding noise, how do I fix it?",
+    "Navigate to the nearest coffee shop",
+    "台積電股價多少",
+    "Explain how a PID controller works",
+    "幫我找附近的餐廳",
+    "Read the file notes.txt"
+]
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def _summarize(stage: str, latencies: List[float], errors: int, wall_time: float) -> Dict[str, Any]:
+    """Summarize stage latencies in milliseconds"""
+    ordered = sorted(latencies)
+    return {
+        "stage": stage,
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "mean_ms": statistics.mean(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": _percentile(ordered, 0.50) * 1000,
+        "p95_ms": _percentile(ordered, 0.95) * 1000,
+        "p99_ms": _percentile(ordered, 0.99) * 1000,
+        "throughput_rps": len(ordered) / wall_time if wall_time else 0.0
+    }
+
+async def _run_stage(
+    stage: str,
+    call: Callable[[int], Awaitable[bool]],
+    requests: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """Run call(i) requests times at the given concurrency; call returns success"""
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return _summarize(stage, latencies, errors, time.perf_counter() - start)
+
+async def _bench_process_query(args, first_token: List[float]) -> Callable[[int], Awaitable[bool]]:
+    try:
+        from .orchestrator import ai_orchestrator, rag_memory
+    except ImportError:
+        from orchestrator import ai_orchestrator, rag_memory
+    
+    # Only the pieces process_query needs; MCP servers are not started
+    await llm_manager.initialize()
+    if args.memory:
+        await rag_memory.initialize()
+    ai_orchestrator.system_initialized = True
+    
+    async def call(i: int) -> bool:
+        start = time.perf_counter()
+        seen_first = False
+        
+        async def on_token(event: Dict[str, Any]):
+            nonlocal seen_first
+            if not seen_first:
+                seen_first = True
+                first_token.append(time.perf_counter() - start)
+        
+        result = await ai_orchestrator.process_query(
+            QUERIES[i % len(QUERIES)],
+            use_tools=False,
+            use_memory=args.memory,
+            token_callback=on_token if args.stream else None
+        )
+        return "error" not in result
+    
+    return call
+
+async def _bench_understand_intent(args) -> Callable[[int], Awaitable[bool]]:
+    try:
+        from .intelligent_agent import intelligent_agent
+    except ImportError:
+        from intelligent_agent import intelligent_agent
+    
+    await intelligent_agent.rag_memory.initialize()
+    
+    async def call(i: int) -> bool:
+        await intelligent_agent.understand_intent(
+            QUERIES[i % len(QUERIES)],
+            user_id=f"bench_user_{i % args.concurrency}"
+        )
+        return True
+    
+    return call
+
+async def _bench_process_ar_command(args) -> Callable[[int], Awaitable[bool]]:
+    try:
+        from .ar_system_manager import ARSystemManager, ai_orchestrator
+    except ImportError:
+        from ar_system_manager import ARSystemManager, ai_orchestrator
+    
+    await llm_manager.initialize()
+    ai_orchestrator.system_initialized = True
+    manager = ARSystemManager()
+    
+    async def fake_asr(command) -> Optional[str]:
+        # The "audio" is the UTF-8 query text
+        command.transcription = command.audio_data.decode("utf-8")
+        command.status = "transcribed"
+        return command.transcription
+    
+    async def fake_send_task(task_message: Dict[str, Any], *args, **kwargs) -> bool:
+        return True
+    
+    manager.agent1.process_audio_stream = fake_asr
+    manager.rabbitmq_client.send_task = fake_send_task
+    
+    async def call(i: int) -> bool:
+        result = await manager.process_ar_command(QUERIES[i % len(QUERIES)].encode("utf-8"), user_id="bench_ar_user")
+        return result.get("status") == "success"
+    
+    return call
+
+async def run_benchmark(args) -> List[Dict[str, Any]]:
+    """Start the stub, point every model at it and benchmark each stage"""
+    server = OllamaStubServer(
+        port=args.port,
+        response_text=args.response_text,
+        token_latency=args.token_latency,
+        first_token_latency=args.first_token_latency
+    )
+    await server.start()
+    
+    for llm_config in config.llm_configs.values():
+        llm_config.endpoint = server.endpoint
+        llm_config.endpoints = []
+        llm_config.warm_up = False
+    
+    # Keep benchmark documents out of the real memory store
+    config.rag_config.vector_db_path = tempfile.mkdtemp(prefix="bench_rag_")
+    
+    results = []
+    monitor = EventLoopMonitor(interval=0.01)
+    monitor.start()
+    try:
+        for stage in args.stages:
+            first_token: List[float] = []
+            try:
+                if stage == "process_query":
+                    call = await _bench_process_query(args, first_token)
+                elif stage == "understand_intent":
+                    call = await _bench_understand_intent(args)
+                else:
+                    call = await _bench_process_ar_command(args)
+            except ImportError as e:
+                print(f"Skipping {stage}: {e}", file=sys.stderr)
+                continue
+            
+            for i in range(args.warmup):
+                await call(i)
+            first_token.clear()
+            monitor.reset()
+            
+            results.append(await _run_stage(stage, call, args.requests, args.concurrency))
+            if first_token:
+                results.append(_summarize(f"{stage}.first_token", first_token, 0, 0.0))
+            results.append(_summarize(f"{stage}.loop_lag", list(monitor.samples), 0, 0.0))
+    finally:
+        await monitor.stop()
+        await llm_manager.shutdown()
+        await server.stop()
+    
+    return results
+
+def _parse_thresholds(values: List[str]) -> Dict[str, float]:
+    thresholds = {}
+    for value in values or []:
+        stage, _, limit = value.partition("=")
+        thresholds[stage] = float(limit)
+    return thresholds
+
+def _check_thresholds(results: List[Dict[str, Any]], args) -> List[str]:
+    """Return a description of every threshold the run exceeded"""
+    failures = []
+    limits = {"p95_ms": _parse_thresholds(args.max_p95), "p99_ms": _parse_thresholds(args.max_p99)}
+    for result in results:
+        for metric, thresholds in limits.items():
+            limit = thresholds.get(result["stage"])
+            if limit is not None and result[metric] > limit:
+                failures.append(f"{result['stage']} {metric} {result[metric]:.1f} > {limit:.1f}")
+        if args.fail_on_error and result["errors"]:
+            failures.append(f"{result['stage']} had {result['errors']} errors")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI pipeline against a stub Ollama server")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-latency", type=float, default=0.005)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--response-text", default="This is a stub response from the benchmark server.")
+    parser.add_argument("--stream", action="store_true", help="Stream process_query tokens and report time to first token")
+    parser.add_argument("--memory", action="store_true", help="Use RAG memory in process_query")
+    parser.add_argument("--max-p95", action="append", metavar="STAGE=MS", help="Fail if a stage's p95 exceeds MS")
+    parser.add_argument("--max-p99", action="append", metavar="STAGE=MS", help="Fail if a stage's p99 exceeds MS")
+    parser.add_argument("--fail-on-error", action="store_true")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args()
+    
+    results = asyncio.run(run_benchmark(args))
+    
+    print(f"{'stage':<32}{'req':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for result in results:
+        print(
+            f"{result['stage']:<32}{result['requests']:>6}{result['errors']:>6}"
+            f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+            f"{result['throughput_rps']:>10.1f}"
+        )
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    
+    failures = _check_thresholds(results, args)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
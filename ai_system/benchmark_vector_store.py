@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Vector Store Benchmark
+Recall@k and single-query latency of the RAG vector stores as the corpus grows
+
+Synthetic clustered, unit-length embeddings are streamed into each store
+in slices, so the full corpus never has to fit in memory. Exact neighbours
+are computed alongside with NumPy and used as ground truth.
+
+    python benchmark_vector_store.py --sizes 10000 100000 1000000 --backends faiss-flat faiss-hnsw chroma
+"""
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    from .vector_store import ChromaVectorStore, FaissVectorStore, VectorStore
+except ImportError:
+    from vector_store import ChromaVectorStore, FaissVectorStore, VectorStore
+
+BACKENDS = ["faiss-flat", "faiss-hnsw", "faiss-ivf", "chroma"]
+SLICE = 4096
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def corpus_slices(size: int, dim: int, seed: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+    """(offset, vectors) slices of a clustered corpus, reproducible for a seed"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((256, dim))
+    for start in range(0, size, SLICE):
+        count = min(SLICE, size - start)
+        points = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.standard_normal((count, dim))
+        yield start, _unit(points)
+
+def make_queries(count: int, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    centers = np.random.default_rng(0).standard_normal((256, dim))
+    return _unit(centers[rng.integers(0, len(centers), count)] + 0.5 * rng.standard_normal((count, dim)))
+
+def open_store(backend: str, path: str) -> VectorStore:
+    if backend == "chroma":
+        return ChromaVectorStore(path, "benchmark")
+    return FaissVectorStore(path, index_type=backend.split("-", 1)[1])
+
+def fill(store: VectorStore, size: int, dim: int, queries: np.ndarray, k: int) -> Tuple[float, np.ndarray]:
+    """Load the corpus; returns load seconds and the exact top-k rows per query"""
+    best_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k), dtype=np.int64)
+    load_seconds = 0.0
+    for start, vectors in corpus_slices(size, dim):
+        ids = [f"chunk_{start + i}" for i in range(len(vectors))]
+        began = time.perf_counter()
+        store.add(ids, vectors, [""] * len(ids), [{"doc_id": f"doc_{(start + i) // 8}"} for i in range(len(ids))])
+        load_seconds += time.perf_counter() - began
+        
+        # Merge this slice into the running exact top-k
+        distances = 2.0 - 2.0 * queries @ vectors.T
+        distances = np.concatenate([best_distances, distances], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(vectors)), distances[:, k:].shape)], axis=1)
+        keep = np.argsort(distances, axis=1)[:, :k]
+        best_distances = np.take_along_axis(distances, keep, axis=1)
+        best_rows = np.take_along_axis(rows, keep, axis=1)
+    return load_seconds, best_rows
+
+def measure(store: VectorStore, queries: np.ndarray, exact: np.ndarray, k: int) -> Tuple[float, float, List[float]]:
+    """Index build seconds, recall@k and per-query latencies in milliseconds"""
+    began = time.perf_counter()
+    store.query(queries[:1], k)  # builds the index
+    index_seconds = time.perf_counter() - began
+    hits, latencies = 0, []
+    for query, expected in zip(queries, exact):
+        began = time.perf_counter()
+        result = store.query(query[None, :], k)
+        latencies.append((time.perf_counter() - began) * 1000)
+        found = {int(chunk_id.rsplit("_", 1)[1]) for chunk_id in result["ids"][0]}
+        hits += len(found & set(expected.tolist()))
+    return index_seconds, hits / exact.size, latencies
+
+def run(sizes: List[int], backends: List[str], dim: int, query_count: int, k: int):
+    queries = make_queries(query_count, dim)
+    print(f"{'chunks':>10} {'backend':<12}{'load s':>9}{'index s':>9}{'recall':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for size in sizes:
+        for backend in backends:
+            path = tempfile.mkdtemp(prefix="bench_vectors_")
+            try:
+                store = open_store(backend, path)
+            except ImportError as e:
+                print(f"Skipping {backend}: {e}")
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                load_seconds, exact = fill(store, size, dim, queries, k)
+                index_seconds, recall, latencies = measure(store, queries, exact, k)
+                latencies.sort()
+                print(
+                    f"{size:>10} {backend:<12}{load_seconds:>9.1f}{index_seconds:>9.1f}{recall:>9.3f}"
+                    f"{statistics.median(latencies):>9.3f}{latencies[int(0.99 * (len(latencies) - 1))]:>9.3f}"
+                )
+            finally:
+                store.close()
+                shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG vector store backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings have 384 dimensions")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5, help="Results per query (RAGConfig.max_retrieved_docs)")
+    args = parser.parse_args()
+    run(args.sizes, args.backends, args.dim, args.queries, args.k)
+
+if __name__ == "__main__":
+    main()
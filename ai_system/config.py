@@ -5,7 +5,7 @@ Manages local LLMs, MCP tools, and RAG memory
 
 import os
 from typing import Dict, List, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 @dataclass
@@ -14,9 +14,69 @@ class LLMConfig:
     model_name: str
     model_type: str  # 'ollama', 'llamacpp', etc.
     endpoint: str = "http://localhost:11434"
+    endpoints: List[str] = field(default_factory=list)  # extra backends serving this model; empty means just endpoint
     context_length: int = 4096
     temperature: float = 0.7
     max_tokens: int = 2048
+    max_concurrent_requests: int = 2  # in-flight requests per model per endpoint; the rest queue
+    keep_alive: str = "30m"  # how long Ollama keeps the model loaded; "-1m" keeps it resident
+    warm_up: bool = True  # preload with a tiny prompt during LLMManager.initialize()
+    
+    def get_endpoints(self) -> List[str]:
+        """All backends this model can be served from"""
+        return self.endpoints or [self.endpoint]
+
+@dataclass
+class HTTPPoolConfig:
+    """Connection pool settings for HTTP clients talking to LLM backends"""
+    limit: int = 64  # total connections across all endpoints
+    limit_per_host: int = 16  # connections per endpoint
+    ttl_dns_cache: int = 300  # seconds to cache DNS lookups
+    keepalive_timeout: float = 60.0  # seconds an idle connection stays open
+    connect_timeout: float = 10.0
+    total_timeout: float = 300.0  # long generations can take minutes on CPU
+
+@dataclass
+class LoadBalancerConfig:
+    """Health checking for LLM backends when a model has several endpoints"""
+    probe_interval: float = 10.0  # seconds between /api/tags health probes
+    probe_timeout: float = 3.0
+    failure_threshold: int = 3  # consecutive failures before an endpoint is ejected
+    ejection_seconds: float = 30.0  # how long an ejected endpoint is skipped unless a probe succeeds
+
+@dataclass
+class ResponseCacheConfig:
+    """Configuration for the LLM response cache"""
+    enabled: bool = True
+    max_entries: int = 512
+    ttl_seconds: float = 600.0
+    semantic_enabled: bool = True  # embedding lookup once a model is attached
+    similarity_threshold: float = 0.95
+
+@dataclass
+class IntentCacheConfig:
+    """Configuration for the per-user intent cache"""
+    enabled: bool = True
+    max_entries: int = 1024
+    ttl_seconds: float = 300.0  # repeated commands within this window reuse the intent
+
+@dataclass
+class ConversationStoreConfig:
+    """Limits on per-user conversation state kept by the intelligent agent"""
+    max_active_users: int = 1000  # least recently active users are evicted beyond this
+    idle_seconds: float = 3600.0  # users idle this long are evicted
+    history_text_chars: int = 300  # history keeps summaries, not full payloads
+    max_learning_records: int = 1000
+    spill_enabled: bool = False  # keep evicted contexts in SQLite and restore them on return
+    spill_db_path: str = "./data/conversation_contexts.db"
+
+@dataclass
+class EquipmentCacheConfig:
+    """Configuration for the persistent equipment knowledge cache"""
+    enabled: bool = True
+    db_path: str = "./data/equipment_cache.db"
+    ttl_seconds: float = 7 * 24 * 3600.0  # older sections are served while being regenerated
+    version: str = "1"  # bump when prompts or models change to invalidate old sections
 
 @dataclass
 class MCPServerConfig:
@@ -36,6 +96,28 @@ class RAGConfig:
     chunk_overlap: int = 200
     max_retrieved_docs: int = 5
     similarity_threshold: float = 0.7
+    embedding_cache_size: int = 2048  # recently encoded texts kept process-wide
+    encode_batch_size: int = 64  # texts from concurrent callers embedded in one model call
+    encode_batch_window: float = 0.005  # seconds to wait for other callers before encoding
+    encode_workers: int = 1  # threads running the embedding model
+    sqlite_cache_mb: int = 20  # page cache per metadata database connection
+    sqlite_mmap_mb: int = 256
+    sqlite_synchronous: str = "NORMAL"  # WAL makes NORMAL safe against corruption; FULL also survives power loss
+    access_flush_interval: float = 5.0  # seconds retrieval counts are held in memory before being written
+    access_flush_max_docs: int = 500  # distinct documents pending that trigger an early write
+    vector_backend: str = "chroma"  # "chroma" or "faiss" (in-process, see vector_store.py)
+    faiss_index: str = "auto"  # flat, hnsw, ivf, or auto: flat up to faiss_flat_limit chunks, then HNSW
+    faiss_flat_limit: int = 10_000  # exact search stays under a millisecond up to about here
+    faiss_compact_ratio: float = 0.25  # deleted share of stored rows that triggers a rewrite without them
+
+@dataclass
+class MemoryWriteQueueConfig:
+    """Configuration for deferred, batched memory writes"""
+    max_queue_size: int = 1000  # records beyond this are dropped
+    batch_size: int = 32
+    flush_interval: float = 2.0  # seconds a partial batch waits before being written
+    high_water_ratio: float = 0.8  # past this fill level only a sample of records is kept
+    sample_rate: float = 0.25
 
 class SystemConfig:
     """Main system configuration"""
@@ -93,8 +175,42 @@ class SystemConfig:
             vector_db_path=str(self.data_dir / "vector_db")
         )
         
+        # Background batching for memory writes nobody waits on
+        self.memory_write_queue_config = MemoryWriteQueueConfig()
+        
+        # Generated manuals and troubleshooting guides per equipment
+        self.equipment_cache_config = EquipmentCacheConfig(
+            db_path=str(self.data_dir / "equipment_cache.db")
+        )
+        
+        # Bounded per-user conversation state
+        self.conversation_store_config = ConversationStoreConfig(
+            spill_db_path=str(self.data_dir / "conversation_contexts.db")
+        )
+        
+        # HTTP connection pool for LLM backends
+        self.http_pool_config = HTTPPoolConfig()
+        
+        # Endpoint health checking and ejection
+        self.load_balancer_config = LoadBalancerConfig()
+        
+        # Response cache in front of chat completions
+        self.response_cache_config = ResponseCacheConfig()
+        
+        # Intent cache for repeated commands
+        self.intent_cache_config = IntentCacheConfig()
+        
         # System settings
         self.default_llm = "llama3.2"
+        self.fallback_llm = "llama3.2"  # served while a requested model is being pulled
+        self.model_refresh_interval = 60.0  # seconds between /api/tags refreshes
+        self.reuse_generate_context = False  # orchestrator follow-ups send Ollama context tokens instead of the history
+        self.generate_context_ttl = 1800.0  # seconds a conversation's context tokens are kept
+        self.interactive_queue_deadline = 10.0  # seconds an interactive LLM request may wait for a slot before it is shed
+        self.technical_support_deadline = 20.0  # seconds before unfinished technical-support sections are given up
+        self.intent_fast_path_threshold = 0.8  # pattern score needed to skip LLM intent analysis; above 1.0 disables it
+        self.loop_monitor_interval = 0.1  # seconds between event-loop lag probes
+        self.loop_lag_warning = 0.1  # lag in seconds logged as an event-loop stall
         self.max_conversation_history = 50
         self.memory_retention_days = 30
         
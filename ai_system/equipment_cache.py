@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Equipment Knowledge Cache
+Persistent per-equipment store of generated manuals and troubleshooting guides
+
+Cached sections are served immediately. Once older than the TTL they are
+still served, while a fresh copy is generated in the background
+(stale-while-revalidate). Bumping EquipmentCacheConfig.version invalidates
+everything generated under an older prompt or model setup.
+
+Prewarm offline with:
+    python equipment_cache.py prewarm UR10 UR5 "KUKA KR6" --sections troubleshooting manual
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .config import EquipmentCacheConfig, config
+    from .llm_manager import llm_manager
+    from .llm_scheduler import RequestPriority
+except ImportError:
+    from config import EquipmentCacheConfig, config
+    from llm_manager import llm_manager
+    from llm_scheduler import RequestPriority
+
+logger = logging.getLogger(__name__)
+
+SECTION_PROMPTS = {
+    "manual": """
+            請提供 {equipment} 的詳細使用說明。包括：
+            
+            1. 基本操作步驟
+            2. 安全注意事項
+            3. 常用功能介紹
+            4. 維護保養要點
+            5. 常見問題解決
+            
+            請用繁體中文回答，內容要實用且詳細。
+            """,
+    "troubleshooting": """
+            {equipment} 出現問題，請提供故障排除指南：
+            
+            1. 常見故障現象及原因
+            2. 診斷步驟
+            3. 解決方法
+            4. 預防措施
+            5. 何時需要專業維修
+            
+            請用繁體中文回答，提供實用的解決方案。
+            """
+}
+
+def normalize_equipment(equipment: str) -> str:
+    """Cache key for an equipment name: case and spacing do not matter"""
+    return re.sub(r"\s+", " ", (equipment or "").strip().lower())
+
+async def generate_section(equipment: str, section: str, priority: RequestPriority = RequestPriority.NORMAL) -> str:
+    """Generate one knowledge section with the LLM"""
+    return await llm_manager.generate_response(
+        prompt=SECTION_PROMPTS[section].format(equipment=equipment),
+        model_name="llama3.2",
+        temperature=0.3,
+        priority=priority
+    )
+
+class EquipmentKnowledgeCache:
+    """SQLite-backed cache of generated sections keyed by equipment and section
+    
+    The async methods run their SQLite work in a thread so the event loop
+    never waits on the disk.
+    """
+    
+    def __init__(self, cache_config: EquipmentCacheConfig = None):
+        self.config = cache_config or config.equipment_cache_config
+        self._db_ready = False
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_failures": 0}
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection that commits on success and is always closed"""
+        if not self._db_ready:
+            Path(self.config.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.config.db_path)
+        try:
+            with conn:
+                if not self._db_ready:
+                    conn.execute('''
+                        CREATE TABLE IF NOT EXISTS equipment_sections (
+                            equipment TEXT NOT NULL,
+                            section TEXT NOT NULL,
+                            content TEXT NOT NULL,
+                            version TEXT NOT NULL,
+                            generated_at REAL NOT NULL,
+                            PRIMARY KEY (equipment, section)
+                        )
+                    ''')
+                    self._db_ready = True
+                yield conn
+        finally:
+            conn.close()
+    
+    def get(self, equipment: str, section: str) -> Optional[Tuple[str, bool]]:
+        """Cached content and whether it is still fresh; None if absent or outdated"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content, version, generated_at FROM equipment_sections WHERE equipment = ? AND section = ?",
+                (normalize_equipment(equipment), section)
+            ).fetchone()
+        
+        if row is None or row[1] != self.config.version:
+            return None
+        return row[0], time.time() - row[2] < self.config.ttl_seconds
+    
+    def set(self, equipment: str, section: str, content: str):
+        with self._connect() as conn:
+            conn.execute(
+                '''INSERT OR REPLACE INTO equipment_sections
+                   (equipment, section, content, version, generated_at)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (normalize_equipment(equipment), section, content, self.config.version, time.time())
+            )
+    
+    def invalidate(self, equipment: str = None) -> int:
+        """Remove cached sections for one equipment, or all of them"""
+        with self._connect() as conn:
+            if equipment is None:
+                cursor = conn.execute("DELETE FROM equipment_sections")
+            else:
+                cursor = conn.execute(
+                    "DELETE FROM equipment_sections WHERE equipment = ?",
+                    (normalize_equipment(equipment),)
+                )
+            return cursor.rowcount
+    
+    async def fetch(
+        self,
+        equipment: str,
+        section: str,
+        generate: Callable[[RequestPriority], Awaitable[str]],
+        priority: RequestPriority = RequestPriority.NORMAL
+    ) -> str:
+        """Cached content, regenerating stale entries in the background
+        
+        generate is called with the LLM priority to use. On a miss the
+        caller waits for generation at priority, but the generation runs as
+        its own task: if the caller gives up (e.g. a request deadline), the
+        result is still cached for the next request. Stale entries are
+        refreshed at BACKGROUND priority since nobody waits for them.
+        """
+        if not self.config.enabled:
+            return await generate(priority)
+        
+        cached = await asyncio.to_thread(self.get, equipment, section)
+        if cached is not None:
+            content, fresh = cached
+            if fresh:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                self._refresh(equipment, section, lambda: generate(RequestPriority.BACKGROUND))
+            return content
+        
+        self.stats["misses"] += 1
+        return await asyncio.shield(self._refresh(equipment, section, lambda: generate(priority)))
+    
+    def _refresh(self, equipment: str, section: str, generate: Callable[[], Awaitable[str]]) -> asyncio.Task:
+        """Start (or join) generation of a section and store the result"""
+        key = (normalize_equipment(equipment), section)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_and_store(equipment, section, generate))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._refresh_done(key, done))
+        return task
+    
+    def _refresh_done(self, key: Tuple[str, str], task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Background refreshes have no awaiting caller; failures were already logged
+        if not task.cancelled():
+            task.exception()
+    
+    async def _generate_and_store(self, equipment: str, section: str, generate: Callable[[], Awaitable[str]]) -> str:
+        try:
+            content = await generate()
+        except Exception as e:
+            self.stats["refresh_failures"] += 1
+            logger.warning(f"Could not generate {section} for {equipment}: {e}")
+            raise
+        
+        if content:
+            await asyncio.to_thread(self.set, equipment, section, content)
+            self.stats["refreshes"] += 1
+        return content
+    
+    async def prewarm(
+        self,
+        equipment_names: List[str],
+        sections: List[str] = None,
+        concurrency: int = 2,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """Generate and store sections ahead of time; existing fresh entries are kept unless force"""
+        sections = sections or list(SECTION_PROMPTS)
+        semaphore = asyncio.Semaphore(concurrency)
+        summary = {"generated": 0, "skipped": 0, "failed": 0}
+        
+        async def warm(equipment: str, section: str):
+            cached = await asyncio.to_thread(self.get, equipment, section)
+            if cached is not None and cached[1] and not force:
+                summary["skipped"] += 1
+                return
+            async with semaphore:
+                try:
+                    await self._refresh(
+                        equipment,
+                        section,
+                        lambda: generate_section(equipment, section, RequestPriority.BACKGROUND)
+                    )
+                    summary["generated"] += 1
+                    logger.info(f"Prewarmed {section} for {equipment}")
+                except Exception:
+                    summary["failed"] += 1
+        
+        await asyncio.gather(*(warm(equipment, section) for equipment in equipment_names for section in sections))
+        return summary
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        try:
+            with self._connect() as conn:
+                stats["entries"] = conn.execute(
+                    "SELECT COUNT(*) FROM equipment_sections WHERE version = ?",
+                    (self.config.version,)
+                ).fetchone()[0]
+        except Exception as e:
+            logger.debug(f"Could not count equipment cache entries: {e}")
+        return stats
+
+async def _prewarm(args) -> Dict[str, Any]:
+    await llm_manager.initialize()
+    try:
+        return await EquipmentKnowledgeCache().prewarm(args.equipment, args.sections, args.concurrency, args.force)
+    finally:
+        await llm_manager.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the equipment knowledge cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    prewarm = subparsers.add_parser("prewarm", help="Generate sections for equipment ahead of time")
+    prewarm.add_argument("equipment", nargs="+")
+    prewarm.add_argument("--sections", nargs="+", choices=list(SECTION_PROMPTS))
+    prewarm.add_argument("--concurrency", type=int, default=2)
+    prewarm.add_argument("--force", action="store_true", help="Regenerate entries that are still fresh")
+    
+    clear = subparsers.add_parser("clear", help="Remove cached sections")
+    clear.add_argument("equipment", nargs="?")
+    
+    subparsers.add_parser("stats", help="Show cache statistics")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "prewarm":
+        print(asyncio.run(_prewarm(args)))
+    elif args.command == "clear":
+        print(f"Removed {EquipmentKnowledgeCache().invalidate(args.equipment)} sections")
+    else:
+        print(EquipmentKnowledgeCache().get_stats())
+
+if __name__ == "__main__":
+    main()
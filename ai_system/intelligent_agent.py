@@ -5,27 +5,97 @@ without requiring explicit definitions in code
 """
 
 import asyncio
+import copy
+import functools
+import hashlib
 import json
 import logging
+import sqlite3
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 try:
-    from .config import config
+    from .config import ConversationStoreConfig, config
+    from .equipment_cache import EquipmentKnowledgeCache, generate_section
+    from .intent_matcher import IntentMatcher
     from .llm_manager import llm_manager
+    from .llm_scheduler import RequestPriority
     from .mcp_manager import mcp_manager
-    from .rag_memory import RAGMemorySystem
+    from .prompt_builder import estimate_tokens
+    from .rag_memory import MemoryWriteQueue, rag_memory, with_embedding_scope
+    from .response_cache import LRUTTLCache, ResponseCache
 except ImportError:
-    from config import config
+    from config import ConversationStoreConfig, config
+    from equipment_cache import EquipmentKnowledgeCache, generate_section
+    from intent_matcher import IntentMatcher
     from llm_manager import llm_manager
+    from llm_scheduler import RequestPriority
     from mcp_manager import mcp_manager
-    from rag_memory import RAGMemorySystem
+    from prompt_builder import estimate_tokens
+    from rag_memory import MemoryWriteQueue, rag_memory, with_embedding_scope
+    from response_cache import LRUTTLCache, ResponseCache
 
 logger = logging.getLogger(__name__)
 
+# Shared prefix of every intent-analysis prompt; keep it free of per-request values
+INTENT_ANALYSIS_INSTRUCTIONS = """You are an intelligent AI agent that understands user intent and context. 
+Analyze the user's input and determine their intent, considering the conversation context.
+
+Available System Capabilities:
+- Web search and comprehensive information retrieval
+- Technical documentation and troubleshooting guides
+- Manufacturer support and service information
+- Navigation and location services  
+- Stock market and financial data
+- File system operations
+- Image and photo search
+- Communication and messaging
+- Entertainment recommendations
+- Productivity tools
+- Learning and education assistance
+- Industrial equipment troubleshooting
+- Robotic systems support
+- Maintenance and repair guidance
+
+SPECIAL FOCUS for Technical/Industrial Equipment:
+When users ask about equipment problems (like robotic arms, industrial machines, technical devices):
+- Prioritize comprehensive troubleshooting information
+- Include multiple information sources (manuals, support, forums, videos)
+- Provide step-by-step diagnostic procedures
+- Include safety considerations
+- Suggest professional support contacts
+- Look for common issues and solutions
+- Include preventive maintenance advice
+
+Your task: Understand what the user wants to accomplish and provide a comprehensive analysis.
+
+Respond with a compact JSON object containing:
+{
+    "intent_category": "one of: navigation, search, information, control, communication, entertainment, productivity, learning, technical_support, unknown",
+    "confidence": 0.0-1.0,
+    "primary_action": "what the user wants to do, in a few words",
+    "entities": {"key": "extracted entities"},
+    "context_clues": ["relevant context from conversation"],
+    "suggested_tools": ["tools that could help"],
+    "execution_steps": [{"step": 1, "action": "first thing to do", "tool": "tool_name"}]
+}
+Use at most 3 execution steps and keep every string short.
+
+Be intelligent and consider:
+- Is this a follow-up to previous conversation?
+- What tools would be most helpful?
+- Are there implicit requests (e.g., "I'm hungry" might mean "find restaurants")?
+- Cultural and language context (English/Chinese)
+- Time of day and typical user behavior patterns
+- For technical issues: What level of detail is needed?
+- For equipment problems: What type of comprehensive information should be gathered?
+"""
+
 class IntentCategory(Enum):
     """Categories of user intents the system can handle"""
     NAVIGATION = "navigation"
@@ -39,6 +109,61 @@ class IntentCategory(Enum):
     TECHNICAL_SUPPORT = "technical_support"
     UNKNOWN = "unknown"
 
+# JSON schema passed to Ollama's structured output so the reply always parses
+INTENT_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent_category": {"type": "string", "enum": [category.value for category in IntentCategory]},
+        "confidence": {"type": "number"},
+        "primary_action": {"type": "string"},
+        "entities": {"type": "object"},
+        "context_clues": {"type": "array", "items": {"type": "string"}},
+        "suggested_tools": {"type": "array", "items": {"type": "string"}},
+        "execution_steps": {
+            "type": "array",
+            "maxItems": 3,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "step": {"type": "integer"},
+                    "action": {"type": "string"},
+                    "tool": {"type": "string"}
+                },
+                "required": ["step", "action", "tool"]
+            }
+        }
+    },
+    "required": ["intent_category", "confidence", "primary_action", "entities", "suggested_tools", "execution_steps"]
+}
+
+# Enough for the compact schema above; longer replies are cut off rather than waited for
+INTENT_MAX_TOKENS = 256
+
+# Categories whose pattern matches are trusted without asking the LLM
+FAST_PATH_CATEGORIES = {IntentCategory.NAVIGATION, IntentCategory.SEARCH, IntentCategory.INFORMATION}
+# Two categories scoring closer than this are ambiguous and go to the LLM
+FAST_PATH_MARGIN = 0.05
+# Any match for these vetoes the fast path: sending an equipment fault to a
+# web search costs far more than one LLM call
+FAST_PATH_VETO_CATEGORIES = {IntentCategory.TECHNICAL_SUPPORT}
+# Entities that only make sense with conversation context
+CONTEXT_DEPENDENT_ENTITIES = {
+    "it", "this", "that", "there", "here", "them", "him", "her", "me", "one",
+    "you", "yours", "yourself", "these", "those",
+    "它", "這個", "那個", "這裡", "那裡", "這", "那", "你", "妳", "您", "這些", "那些"
+}
+# ... and longer entities that start with a possessive or demonstrative, e.g. "your name"
+CONTEXT_DEPENDENT_PREFIXES = (
+    "your ", "my ", "this ", "that ", "these ", "those ", "his ", "her ", "its ", "their ", "our ",
+    "你的", "妳的", "您的", "我的", "這個", "那個", "這些", "那些"
+)
+MULTI_INTENT_MARKERS = (" and then ", " and also ", " then ", "然後", "並且", "接著", "順便")
+# Receives {"section": name, "content": str, "status": "complete" | "error" | "timed_out"}
+SectionCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+IMAGE_KEYWORDS = ("image", "photo", "picture", "照片", "圖片", "相片")
+STOCK_KEYWORDS = ("stock", "price", "quote", "股價", "股票", "價格")
+
 @dataclass
 class UserIntent:
     """Represents understood user intent"""
@@ -50,16 +175,172 @@ class UserIntent:
     suggested_tools: List[str]
     execution_plan: List[Dict[str, Any]]
 
+class HistoryEntry:
+    """One compact conversation turn; results are summarized, not stored"""
+    __slots__ = ("timestamp", "type", "text", "intent", "action")
+    
+    def __init__(self, type: str, text: str, intent: str = None, action: str = None, timestamp: str = None):
+        self.timestamp = timestamp or datetime.now().isoformat()
+        self.type = type
+        self.text = text
+        self.intent = intent
+        self.action = action
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def _new_history() -> Deque[HistoryEntry]:
+    return deque(maxlen=config.max_conversation_history)
+
 @dataclass
 class ConversationContext:
     """Maintains conversation context and history"""
     user_id: str
     session_id: str
-    history: List[Dict[str, Any]]
-    current_topic: Optional[str]
-    user_preferences: Dict[str, Any]
-    last_action: Optional[str]
-    context_embeddings: Optional[List[float]]
+    history: Deque[HistoryEntry] = field(default_factory=_new_history)
+    current_topic: Optional[str] = None
+    user_preferences: Dict[str, Any] = field(default_factory=dict)
+    last_action: Optional[str] = None
+    context_embeddings: Optional[List[float]] = None
+    last_active: float = field(default_factory=time.monotonic)
+    
+    def add_turn(self, type: str, text: str, intent: str = None, action: str = None):
+        """Append a turn, truncating its text to the configured summary length"""
+        limit = config.conversation_store_config.history_text_chars
+        if text and len(text) > limit:
+            text = text[:limit].rstrip() + "..."
+        self.history.append(HistoryEntry(type, text or "", intent, action))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "history": [entry.to_dict() for entry in self.history],
+            "current_topic": self.current_topic,
+            "user_preferences": self.user_preferences,
+            "last_action": self.last_action
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationContext":
+        context = cls(
+            user_id=data["user_id"],
+            session_id=data["session_id"],
+            current_topic=data.get("current_topic"),
+            user_preferences=data.get("user_preferences") or {},
+            last_action=data.get("last_action")
+        )
+        context.history.extend(HistoryEntry(**entry) for entry in data.get("history", []))
+        return context
+
+class ConversationStore:
+    """Per-user conversation contexts with LRU and idle eviction
+    
+    Contexts untouched for idle_seconds, or the least recently active ones
+    beyond max_active_users, are evicted. With spill enabled they are
+    written to SQLite and restored transparently on the user's next turn.
+    """
+    
+    def __init__(self, store_config: ConversationStoreConfig = None):
+        self.config = store_config or config.conversation_store_config
+        self._contexts: "OrderedDict[str, ConversationContext]" = OrderedDict()
+        self._spill_ready = False
+        self.stats = {"evicted": 0, "spilled": 0, "restored": 0}
+    
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._contexts
+    
+    def __getitem__(self, user_id: str) -> ConversationContext:
+        return self._contexts[user_id]
+    
+    def __len__(self) -> int:
+        return len(self._contexts)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._contexts)
+    
+    def get_or_create(self, user_id: str) -> ConversationContext:
+        """Return the user's context, restoring or creating it, and mark it active"""
+        context = self._contexts.get(user_id)
+        if context is None:
+            context = self._restore(user_id) or ConversationContext(
+                user_id=user_id,
+                session_id=f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            )
+            self._contexts[user_id] = context
+        else:
+            self._contexts.move_to_end(user_id)
+        
+        context.last_active = time.monotonic()
+        self.evict()
+        return context
+    
+    def pop(self, user_id: str) -> Optional[ConversationContext]:
+        return self._contexts.pop(user_id, None)
+    
+    def evict(self) -> int:
+        """Evict idle users and any beyond the size limit, oldest first"""
+        cutoff = time.monotonic() - self.config.idle_seconds
+        evicted = 0
+        # Most recently active users are at the end, so stop at the first live one
+        while self._contexts:
+            user_id, context = next(iter(self._contexts.items()))
+            if len(self._contexts) <= self.config.max_active_users and context.last_active > cutoff:
+                break
+            del self._contexts[user_id]
+            self._spill(context)
+            evicted += 1
+        
+        self.stats["evicted"] += evicted
+        return evicted
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.config.spill_db_path)
+        if not self._spill_ready:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_contexts (
+                    user_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at TEXT
+                )
+            ''')
+            conn.commit()
+            self._spill_ready = True
+        return conn
+    
+    def _spill(self, context: ConversationContext):
+        if not self.config.spill_enabled:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO conversation_contexts (user_id, data, updated_at) VALUES (?, ?, ?)",
+                    (context.user_id, json.dumps(context.to_dict(), ensure_ascii=False, default=str), datetime.now().isoformat())
+                )
+            self.stats["spilled"] += 1
+        except Exception as e:
+            logger.warning(f"Could not spill conversation context for {context.user_id}: {e}")
+    
+    def _restore(self, user_id: str) -> Optional[ConversationContext]:
+        if not self.config.spill_enabled:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT data FROM conversation_contexts WHERE user_id = ?",
+                    (user_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("DELETE FROM conversation_contexts WHERE user_id = ?", (user_id,))
+            self.stats["restored"] += 1
+            return ConversationContext.from_dict(json.loads(row[0]))
+        except Exception as e:
+            logger.warning(f"Could not restore conversation context for {user_id}: {e}")
+            return None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, active_users=len(self._contexts))
 
 class IntelligentAgent:
     """
@@ -68,18 +349,40 @@ class IntelligentAgent:
     """
     
     def __init__(self):
-        self.rag_memory = RAGMemorySystem()
-        self.conversation_contexts: Dict[str, ConversationContext] = {}
+        # Shared with the orchestrator; one embedding model per process
+        self.rag_memory = rag_memory
+        self._memory_acquired = False
+        self.learning_writer = MemoryWriteQueue(self.rag_memory)
+        self.equipment_cache = EquipmentKnowledgeCache()
+        self.conversation_contexts = ConversationStore()
         self.intent_patterns = self._initialize_intent_patterns()
+        self.intent_matcher = IntentMatcher(self.intent_patterns)
         self.tool_capabilities = {}
-        self.learning_data = []
+        self.learning_data = deque(maxlen=config.conversation_store_config.max_learning_records)
+        self.intent_stats = {
+            "llm_calls": 0,
+            "parse_failures": 0,  # no usable JSON at all; the fallback intent was returned
+            "errors": 0,  # request failed or the reply did not fit UserIntent
+            "regex_recoveries": 0,  # JSON had to be cut out of surrounding text
+            "generated_tokens": 0,
+            "fast_path_hits": 0,  # intents resolved from patterns alone
+            "fast_path_rejected": 0,  # a pattern matched but was too weak or ambiguous
+            "cache_hits": 0  # repeated commands answered from intent_cache
+        }
+        self.intent_cache = LRUTTLCache(
+            max_entries=config.intent_cache_config.max_entries,
+            ttl_seconds=config.intent_cache_config.ttl_seconds
+        )
         
     async def initialize(self):
         """Initialize the intelligent agent"""
         logger.info("Initializing Intelligent Agent...")
         
         # Initialize dependencies
-        await self.rag_memory.initialize()
+        if not self._memory_acquired:
+            await self.rag_memory.acquire()
+            self._memory_acquired = True
+        self.learning_writer.reopen()
         
         # Load tool capabilities
         await self._discover_tool_capabilities()
@@ -194,22 +497,30 @@ class IntelligentAgent:
         """Load previously learned conversation patterns"""
         try:
             # Query RAG memory for learned patterns
-            learned_patterns = await self.rag_memory.query(
+            learned_patterns = await self.rag_memory.search_similar(
                 "conversation patterns intent recognition user behavior",
-                k=10
+                max_results=10
             )
             
-            # Process and integrate learned patterns
+            # Learned patterns are stored with their regex and category in metadata
+            added = 0
             for result in learned_patterns:
-                content = result.get('content', '')
-                if 'intent_pattern' in content:
-                    # Parse and add to pattern database
-                    # This would be more sophisticated in practice
-                    pass
+                metadata = result.get('metadata') or {}
+                if metadata.get('type') == 'intent_pattern' and metadata.get('pattern'):
+                    category = metadata.get('intent_category', IntentCategory.UNKNOWN.value)
+                    if category not in self.intent_patterns:
+                        continue
+                    if metadata['pattern'] not in self.intent_patterns[category]:
+                        self.intent_patterns[category].append(metadata['pattern'])
+                    added += self.intent_matcher.add_patterns(category, [metadata['pattern']])
+            
+            if added:
+                logger.info(f"Loaded {added} learned intent patterns")
                     
         except Exception as e:
             logger.debug(f"No learned patterns found or error loading: {e}")
     
+    @with_embedding_scope
     async def understand_intent(
         self,
         user_input: str,
@@ -231,26 +542,38 @@ class IntelligentAgent:
         if context:
             conv_context.context_embeddings = context.get('embeddings')
         
+        # Repeats in the same conversation state reuse the earlier intent; the
+        # key is taken before this input changes the history
+        cache_key = self._intent_cache_key(user_input, conv_context)
+        
         # Add current input to history
-        conv_context.history.append({
-            "timestamp": datetime.now().isoformat(),
-            "user_input": user_input,
-            "type": "user"
-        })
+        conv_context.add_turn("user", user_input)
         
-        # Step 1: Pattern-based intent recognition
-        pattern_intent = await self._match_intent_patterns(user_input)
+        if cache_key:
+            cached = self.intent_cache.get(cache_key)
+            if cached is not None:
+                # Already analysed and learned from; skip the LLM and the memory write
+                self.intent_stats["cache_hits"] += 1
+                intent = copy.deepcopy(cached)
+                intent.context["original_input"] = user_input
+                return intent
         
-        # Step 2: LLM-based sophisticated understanding
-        llm_intent = await self._llm_intent_analysis(
-            user_input,
-            conv_context,
-            pattern_intent
-        )
+        # Step 1: Pattern-based intent recognition; a strong, unambiguous
+        # match is used directly and skips the LLM round trip
+        intent = self._fast_path_intent(user_input)
+        
+        # Step 2: LLM-based sophisticated understanding for everything else
+        if intent is None:
+            pattern_intent = await self._match_intent_patterns(user_input)
+            intent = await self._llm_intent_analysis(
+                user_input,
+                conv_context,
+                pattern_intent
+            )
         
         # Step 3: Context-aware enhancement
         enhanced_intent = await self._enhance_with_context(
-            llm_intent,
+            intent,
             conv_context,
             user_input  # Pass original input for context
         )
@@ -258,20 +581,134 @@ class IntelligentAgent:
         # Step 4: Learn from this interaction
         await self._learn_from_interaction(user_input, enhanced_intent)
         
+        # Fallback intents are not cached so the next attempt asks the LLM again
+        if cache_key and enhanced_intent.category != IntentCategory.UNKNOWN:
+            self.intent_cache.set(cache_key, copy.deepcopy(enhanced_intent))
+        
         return enhanced_intent
     
+    def _intent_cache_key(self, user_input: str, conv_context: ConversationContext) -> Optional[str]:
+        """Cache key scoped to the user and the state that can change the intent"""
+        if not config.intent_cache_config.enabled:
+            return None
+        
+        text = ResponseCache.normalize_text(user_input)
+        if not text:
+            return None
+        
+        payload = json.dumps(
+            [text, conv_context.last_action, conv_context.user_preferences],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return f"{conv_context.user_id}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+    
+    def clear_intent_cache(self, user_id: str = None) -> int:
+        """Drop cached intents for one user, or for everyone"""
+        if user_id is None:
+            removed = len(self.intent_cache)
+            self.intent_cache.clear()
+            return removed
+        
+        prefix = f"{user_id}:"
+        keys = [key for key, _ in self.intent_cache.items() if key.startswith(prefix)]
+        for key in keys:
+            self.intent_cache.pop(key)
+        return len(keys)
+    
     async def _match_intent_patterns(self, user_input: str) -> Optional[Tuple[IntentCategory, Dict[str, Any]]]:
         """Match user input against known patterns"""
+        match = self.intent_matcher.match_first(user_input)
+        if match:
+            category_name, entities = match
+            return IntentCategory(category_name), entities
+        
+        return None
+    
+    def _score_intent_patterns(self, user_input: str) -> List[Tuple[float, IntentCategory, Dict[str, Any], str]]:
+        """Score every matching pattern, best first
+        
+        A match scores higher when it starts at the beginning of the input,
+        covers more of it, and is more specific (more of the match is fixed
+        pattern text rather than captured entity). Matches whose entities
+        fail validation score zero.
+        """
+        scored = []
+        for match in self.intent_matcher.match_all(user_input):
+            score = match.score if self._valid_fast_path_entities(match.entities) else 0.0
+            scored.append((score, IntentCategory(match.category), match.entities, match.pattern))
+        
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+    
+    def _valid_fast_path_entities(self, entities: Dict[str, Any]) -> bool:
+        """Entities must be present, short and not refer back to earlier turns"""
+        if not entities:
+            return False
+        
+        for value in entities.values():
+            value = (value or "").strip(" ?？!！.。,，")
+            if not value or len(value) > 80:
+                return False
+            if len(value) < 2 and not re.search(r'[\u4e00-\u9fff]', value):
+                return False
+            if value.lower() in CONTEXT_DEPENDENT_ENTITIES or value.lower().startswith(CONTEXT_DEPENDENT_PREFIXES):
+                return False
+        
+        return True
+    
+    def _fast_path_intent(self, user_input: str) -> Optional[UserIntent]:
+        """Build an intent straight from patterns when the match is unambiguous"""
         user_input_lower = user_input.lower().strip()
+        if len(user_input_lower) > 120 or any(marker in user_input_lower for marker in MULTI_INTENT_MARKERS):
+            return None
         
-        for category_name, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                match = re.search(pattern, user_input_lower, re.IGNORECASE)
-                if match:
-                    entities = {f"entity_{i}": group for i, group in enumerate(match.groups())}
-                    return IntentCategory(category_name), entities
+        scored = self._score_intent_patterns(user_input)
+        if not scored:
+            return None
         
-        return None
+        score, category, entities, pattern = scored[0]
+        runner_up = next((item for item in scored[1:] if item[1] != category), None)
+        
+        if (
+            category not in FAST_PATH_CATEGORIES
+            or score < config.intent_fast_path_threshold
+            or (runner_up and score - runner_up[0] < FAST_PATH_MARGIN)
+            or any(item[1] in FAST_PATH_VETO_CATEGORIES for item in scored)
+        ):
+            self.intent_stats["fast_path_rejected"] += 1
+            return None
+        
+        entities = {key: (value or "").strip(" ?？!！.。,，") for key, value in entities.items()}
+        target = entities.get("entity_0", "")
+        
+        # Action strings follow what the executors look for
+        if category == IntentCategory.NAVIGATION:
+            action, tool = f"navigate to {target}", "web-search"
+        elif category == IntentCategory.SEARCH:
+            kind = "images" if any(keyword in user_input_lower for keyword in IMAGE_KEYWORDS) else "web"
+            action, tool = f"search {kind} for {target}", "web-search"
+        elif any(keyword in user_input_lower for keyword in STOCK_KEYWORDS):
+            # Greedy patterns leave "stock" on the end of "tsmc stock price"
+            target = re.sub(r'\s+(?:stock|shares?)$', '', target)
+            entities["entity_0"] = target
+            action, tool = f"get stock price for {target}", "stock-checker"
+        else:
+            action, tool = f"get information about {target}", "web-search"
+        
+        self.intent_stats["fast_path_hits"] += 1
+        logger.info(f"Fast-path intent {category.value} ({score}): {action}")
+        
+        return UserIntent(
+            category=category,
+            action=action,
+            entities=entities,
+            confidence=score,
+            context={"context_clues": [], "fast_path": True, "pattern": pattern},
+            suggested_tools=[tool],
+            execution_plan=[{"step": 1, "action": action, "tool": tool}]
+        )
     
     async def _llm_intent_analysis(
         self,
@@ -282,90 +719,36 @@ class IntelligentAgent:
         """Use LLM for sophisticated intent understanding"""
         
         # Build context-aware prompt
-        history_summary = self._summarize_conversation_history(conv_context.history[-5:])
+        history_summary = self._summarize_conversation_history(list(conv_context.history)[-5:])
         
-        analysis_prompt = f"""You are an intelligent AI agent that understands user intent and context. 
-Analyze the user's input and determine their intent, considering the conversation context.
-
-User Input: "{user_input}"
-
+        # Fixed instructions first and the per-request details last, so the
+        # server can reuse the KV cache for the shared prefix
+        analysis_prompt = INTENT_ANALYSIS_INSTRUCTIONS + f"""
 Recent Conversation History:
 {history_summary}
 
-Available System Capabilities:
-- Web search and comprehensive information retrieval
-- Technical documentation and troubleshooting guides
-- Manufacturer support and service information
-- Navigation and location services  
-- Stock market and financial data
-- File system operations
-- Image and photo search
-- Communication and messaging
-- Entertainment recommendations
-- Productivity tools
-- Learning and education assistance
-- Industrial equipment troubleshooting
-- Robotic systems support
-- Maintenance and repair guidance
-
 Pattern Recognition Result: {pattern_result if pattern_result else "No clear pattern match"}
 
-SPECIAL FOCUS for Technical/Industrial Equipment:
-When users ask about equipment problems (like robotic arms, industrial machines, technical devices):
-- Prioritize comprehensive troubleshooting information
-- Include multiple information sources (manuals, support, forums, videos)
-- Provide step-by-step diagnostic procedures
-- Include safety considerations
-- Suggest professional support contacts
-- Look for common issues and solutions
-- Include preventive maintenance advice
-
-Your task: Understand what the user wants to accomplish and provide a comprehensive analysis.
-
-Respond with a JSON object containing:
-{{
-    "intent_category": "one of: navigation, search, information, control, communication, entertainment, productivity, learning, technical_support, unknown",
-    "confidence": 0.0-1.0,
-    "primary_action": "what the user wants to do",
-    "entities": {{"key": "extracted entities"}},
-    "context_clues": ["relevant context from conversation"],
-    "suggested_tools": ["tools that could help"],
-    "execution_steps": [
-        {{"step": 1, "action": "first thing to do", "tool": "tool_name"}},
-        {{"step": 2, "action": "next thing to do", "tool": "tool_name"}},
-        {{"step": 3, "action": "additional comprehensive search", "tool": "tool_name"}}
-    ],
-    "user_goal": "ultimate goal the user is trying to achieve",
-    "requires_clarification": true/false,
-    "clarification_questions": ["questions if clarification needed"],
-    "information_depth": "basic/detailed/comprehensive",
-    "search_keywords": ["additional search terms for comprehensive results"]
-}}
-
-Be intelligent and consider:
-- Is this a follow-up to previous conversation?
-- What tools would be most helpful?
-- Are there implicit requests (e.g., "I'm hungry" might mean "find restaurants")?
-- Cultural and language context (English/Chinese)
-- Time of day and typical user behavior patterns
-- For technical issues: What level of detail is needed?
-- For equipment problems: What type of comprehensive information should be gathered?
+User Input: "{user_input}"
 
 Respond with ONLY the JSON object."""
 
         try:
-            # Get LLM analysis
+            # Get LLM analysis, constrained to the intent schema
+            self.intent_stats["llm_calls"] += 1
             response = await llm_manager.generate_response(
                 prompt=analysis_prompt,
                 model_name="llama3.2",
-                temperature=0.3
+                temperature=0.3,
+                max_tokens=INTENT_MAX_TOKENS,
+                priority=RequestPriority.INTERACTIVE,
+                deadline=config.interactive_queue_deadline,
+                format=INTENT_RESPONSE_SCHEMA
             )
+            self.intent_stats["generated_tokens"] += estimate_tokens(response)
             
-            # Parse JSON response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                analysis_data = json.loads(json_match.group())
-                
+            analysis_data = self._parse_intent_json(response)
+            if analysis_data is not None:
                 return UserIntent(
                     category=IntentCategory(analysis_data.get("intent_category", "unknown")),
                     action=analysis_data.get("primary_action", "process user request"),
@@ -378,6 +761,7 @@ Respond with ONLY the JSON object."""
                 
         except Exception as e:
             logger.error(f"Error in LLM intent analysis: {e}")
+            self.intent_stats["errors"] += 1
         
         # Fallback intent
         return UserIntent(
@@ -390,6 +774,52 @@ Respond with ONLY the JSON object."""
             execution_plan=[{"step": 1, "action": "search for information", "tool": "web-search"}]
         )
     
+    def _parse_intent_json(self, response: str) -> Optional[Dict[str, Any]]:
+        """Parse the intent reply, cutting JSON out of stray text only if needed"""
+        try:
+            return json.loads(response)
+        except json.JSONDecodeError:
+            pass
+        
+        # Older Ollama versions ignore the schema and may wrap the JSON in prose
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if json_match:
+            try:
+                data = json.loads(json_match.group())
+                self.intent_stats["regex_recoveries"] += 1
+                return data
+            except json.JSONDecodeError:
+                pass
+        
+        logger.warning(f"Could not parse intent analysis response: {response[:200]}")
+        self.intent_stats["parse_failures"] += 1
+        return None
+    
+    def get_intent_stats(self) -> Dict[str, Any]:
+        """LLM intent-analysis counters and parse-failure rate"""
+        stats = dict(self.intent_stats)
+        calls = stats["llm_calls"]
+        stats["parse_failure_rate"] = round(stats["parse_failures"] / calls, 3) if calls else 0.0
+        stats["avg_generated_tokens"] = round(stats["generated_tokens"] / calls, 1) if calls else 0.0
+        resolved = stats["fast_path_hits"] + calls
+        stats["fast_path_rate"] = round(stats["fast_path_hits"] / resolved, 3) if resolved else 0.0
+        stats["intent_cache"] = dict(self.intent_cache.stats, entries=len(self.intent_cache))
+        stats["learning_queue"] = self.learning_writer.get_stats()
+        stats["conversation_store"] = self.conversation_contexts.get_stats()
+        stats["equipment_cache"] = self.equipment_cache.get_stats()
+        return stats
+    
+    async def shutdown(self):
+        """Write out queued learning records and release shared memory
+        
+        Whoever created the agent calls this before exiting (see
+        simple_intelligent_chatbot.shutdown_components).
+        """
+        await self.learning_writer.close()
+        if self._memory_acquired:
+            self._memory_acquired = False
+            await self.rag_memory.release()
+    
     async def _enhance_with_context(
         self,
         intent: UserIntent,
@@ -437,7 +867,7 @@ Respond with ONLY the JSON object."""
         
         self.learning_data.append(interaction_data)
         
-        # Store in RAG memory for future reference
+        # Queue for RAG memory; written in batches off the request path
         try:
             memory_content = f"""
             User Input Pattern: {user_input}
@@ -449,7 +879,7 @@ Respond with ONLY the JSON object."""
             This interaction shows user intent patterns for future reference.
             """
             
-            await self.rag_memory.add_document(
+            await self.learning_writer.enqueue(
                 content=memory_content,
                 metadata={
                     "type": "interaction_pattern",
@@ -460,39 +890,39 @@ Respond with ONLY the JSON object."""
             )
             
         except Exception as e:
-            logger.debug(f"Could not store interaction in memory: {e}")
+            logger.debug(f"Could not queue interaction for memory: {e}")
     
     def _get_conversation_context(self, user_id: str) -> ConversationContext:
         """Get or create conversation context for user"""
-        if user_id not in self.conversation_contexts:
-            self.conversation_contexts[user_id] = ConversationContext(
-                user_id=user_id,
-                session_id=f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                history=[],
-                current_topic=None,
-                user_preferences={},
-                last_action=None,
-                context_embeddings=None
-            )
-        return self.conversation_contexts[user_id]
+        return self.conversation_contexts.get_or_create(user_id)
     
-    def _summarize_conversation_history(self, history: List[Dict]) -> str:
+    def _summarize_conversation_history(self, history: List[HistoryEntry]) -> str:
         """Summarize recent conversation history"""
         if not history:
             return "No previous conversation."
         
         summary_lines = []
         for entry in history[-3:]:  # Last 3 entries
-            if entry.get("type") == "user":
-                summary_lines.append(f"User: {entry.get('user_input', '')}")
-            elif entry.get("type") == "agent":
-                summary_lines.append(f"Agent: {entry.get('response', '')}")
+            if entry.type == "user":
+                summary_lines.append(f"User: {entry.text}")
+            elif entry.type == "agent":
+                summary_lines.append(f"Agent: {entry.text}")
         
         return "\n".join(summary_lines) if summary_lines else "No previous conversation."
     
-    async def execute_intent(self, intent: UserIntent, user_id: str = "default") -> Dict[str, Any]:
+    @with_embedding_scope
+    async def execute_intent(
+        self,
+        intent: UserIntent,
+        user_id: str = "default",
+        on_section: Optional[SectionCallback] = None
+    ) -> Dict[str, Any]:
         """
         Execute the understood intent using appropriate tools and actions
+        
+        Technical-support answers are assembled from sections fetched
+        concurrently; on_section, if given, is awaited with each one as it
+        completes so clients can show partial results early.
         """
         
         conv_context = self._get_conversation_context(user_id)
@@ -516,7 +946,7 @@ Respond with ONLY the JSON object."""
             elif intent.category == IntentCategory.CONTROL:
                 result = await self._execute_control_action(intent)
             elif intent.category == IntentCategory.TECHNICAL_SUPPORT:
-                result = await self._execute_technical_support(intent)
+                result = await self._execute_technical_support(intent, on_section)
             else:
                 # Generic execution using suggested tools
                 result = await self._execute_generic_action(intent)
@@ -526,13 +956,12 @@ Respond with ONLY the JSON object."""
             
             # Update conversation context
             conv_context.last_action = intent.action
-            conv_context.history.append({
-                "timestamp": datetime.now().isoformat(),
-                "type": "agent",
-                "intent": intent.category.value,
-                "action": intent.action,
-                "result": execution_result
-            })
+            conv_context.add_turn(
+                "agent",
+                execution_result.get("response_message") or intent.action,
+                intent=intent.category.value,
+                action=intent.action
+            )
             
         except Exception as e:
             logger.error(f"Error executing intent: {e}")
@@ -747,7 +1176,11 @@ Respond with ONLY the JSON object."""
             }
         }
     
-    async def _execute_technical_support(self, intent: UserIntent) -> Dict[str, Any]:
+    async def _execute_technical_support(
+        self,
+        intent: UserIntent,
+        on_section: Optional[SectionCallback] = None
+    ) -> Dict[str, Any]:
         """Execute technical support by actually searching for specific equipment information"""
         equipment = intent.entities.get("entity_0", "equipment")
         original_query = intent.context.get("original_input", equipment)
@@ -761,11 +1194,11 @@ Respond with ONLY the JSON object."""
         try:
             if is_usage_request:
                 # Search for usage/manual information
-                search_results = await self._search_equipment_manual(equipment, original_query)
+                search_results = await self._search_equipment_manual(equipment, original_query, on_section)
                 response_data = f"UR10 機械手臂使用說明:\n\n{search_results}"
             else:
                 # Search for troubleshooting information
-                search_results = await self._search_equipment_troubleshooting(equipment, original_query)
+                search_results = await self._search_equipment_troubleshooting(equipment, original_query, on_section)
                 response_data = f"{equipment} 故障排除資訊:\n\n{search_results}"
             
             return {
@@ -797,92 +1230,137 @@ Respond with ONLY the JSON object."""
                 }
             }
     
-    async def _search_equipment_manual(self, equipment: str, original_query: str) -> str:
+    async def _search_equipment_manual(
+        self,
+        equipment: str,
+        original_query: str,
+        on_section: Optional[SectionCallback] = None
+    ) -> str:
         """Search for equipment usage manual and instructions"""
         try:
-            # Search in RAG memory first
-            memory_results = await self.rag_memory.search_similar(f"{equipment} 使用說明 操作手冊", max_results=3)
-            
-            manual_info = []
-            
-            if memory_results:
-                manual_info.append("=== 已知資訊 ===")
-                for result in memory_results:
-                    manual_info.append(f"• {result.get('content', '')[:200]}...")
-            
-            # Generate comprehensive usage guide using LLM
-            usage_prompt = f"""
-            請提供 {equipment} 的詳細使用說明。包括：
-            
-            1. 基本操作步驟
-            2. 安全注意事項  
-            3. 常用功能介紹
-            4. 維護保養要點
-            5. 常見問題解決
-            
-            請用繁體中文回答，內容要實用且詳細。
-            """
-            
-            from llm_manager import llm_manager
-            usage_guide = await llm_manager.generate_response(
-                prompt=usage_prompt,
-                model_name="llama3.2",
-                temperature=0.3
+            # Memory search and generation are independent, so run them together
+            return await self._gather_sections(
+                {
+                    "memory": self._memory_section(f"{equipment} 使用說明 操作手冊", "=== 已知資訊 ==="),
+                    "guide": self._guide_section(equipment, "manual", "\n=== 使用說明 ===")
+                },
+                on_section,
+                timeout_text=f"\n=== 使用說明 ===\n正在查找 {equipment} 使用說明，請稍候系統處理..."
             )
             
-            manual_info.append("\n=== 使用說明 ===")
-            manual_info.append(usage_guide)
-            
-            return "\n".join(manual_info)
-            
         except Exception as e:
             logger.error(f"Error searching manual: {e}")
             return f"正在查找 {equipment} 使用說明，請稍候系統處理..."
     
-    async def _search_equipment_troubleshooting(self, equipment: str, original_query: str) -> str:
+    async def _search_equipment_troubleshooting(
+        self,
+        equipment: str,
+        original_query: str,
+        on_section: Optional[SectionCallback] = None
+    ) -> str:
         """Search for equipment troubleshooting information"""
         try:
-            # Search in RAG memory for troubleshooting info
-            memory_results = await self.rag_memory.search_similar(f"{equipment} 故障 維修 問題", max_results=3)
-            
-            troubleshoot_info = []
-            
-            if memory_results:
-                troubleshoot_info.append("=== 故障排除資訊 ===")
-                for result in memory_results:
-                    troubleshoot_info.append(f"• {result.get('content', '')[:200]}...")
-            
-            # Generate troubleshooting guide
-            troubleshoot_prompt = f"""
-            {equipment} 出現問題，請提供故障排除指南：
-            
-            1. 常見故障現象及原因
-            2. 診斷步驟
-            3. 解決方法
-            4. 預防措施
-            5. 何時需要專業維修
-            
-            請用繁體中文回答，提供實用的解決方案。
-            """
-            
-            from llm_manager import llm_manager
-            troubleshoot_guide = await llm_manager.generate_response(
-                prompt=troubleshoot_prompt,
-                model_name="llama3.2", 
-                temperature=0.3
+            # Safety steps are available at once; memory and the guide follow
+            return await self._gather_sections(
+                {
+                    "immediate_steps": self._immediate_steps_section(equipment),
+                    "memory": self._memory_section(f"{equipment} 故障 維修 問題", "=== 故障排除資訊 ==="),
+                    "guide": self._guide_section(equipment, "troubleshooting", "\n=== 故障排除指南 ===")
+                },
+                on_section,
+                timeout_text=f"\n=== 故障排除指南 ===\n正在查找 {equipment} 故障排除資訊，請稍候..."
             )
             
-            troubleshoot_info.append("\n=== 故障排除指南 ===")
-            troubleshoot_info.append(troubleshoot_guide)
-            
-            return "\n".join(troubleshoot_info)
-            
         except Exception as e:
             logger.error(f"Error searching troubleshooting: {e}")
             return f"正在查找 {equipment} 故障排除資訊，請稍候..."
     
+    async def _immediate_steps_section(self, equipment: str) -> str:
+        steps = self._create_fallback_autonomous_plan(equipment)["immediate_diagnostic_steps"]
+        return "\n".join(["=== 立即處理步驟 ==="] + [f"{i}. {step}" for i, step in enumerate(steps, 1)])
+    
+    async def _memory_section(self, query: str, header: str) -> str:
+        memory_results = await self.rag_memory.search_similar(query, max_results=3)
+        if not memory_results:
+            return ""
+        return "\n".join([header] + [f"• {result.get('content', '')[:200]}..." for result in memory_results])
+    
+    async def _guide_section(self, equipment: str, section: str, header: str) -> str:
+        # Served from the equipment cache; stale guides are regenerated in the background
+        guide = await self.equipment_cache.fetch(
+            equipment,
+            section,
+            lambda priority: generate_section(equipment, section, priority)
+        )
+        return f"{header}\n{guide}"
+    
+    async def _gather_sections(
+        self,
+        sections: Dict[str, Awaitable[str]],
+        on_section: Optional[SectionCallback],
+        timeout_text: str = ""
+    ) -> str:
+        """Run section coroutines concurrently and join them in the given order
+        
+        Each section is reported to on_section as it finishes. Sections still
+        running at config.technical_support_deadline are cancelled; a failed
+        or cancelled guide is replaced by timeout_text.
+        """
+        tasks = {asyncio.ensure_future(coro): name for name, coro in sections.items()}
+        results: Dict[str, str] = {}
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.technical_support_deadline
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - loop.time()),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        results[name] = task.result()
+                        status = "complete"
+                    except Exception as e:
+                        logger.error(f"Technical support section {name} failed: {e}")
+                        status = "error"
+                    await self._emit_section(on_section, name, results.get(name, ""), status)
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        for task in pending:
+            logger.warning(f"Technical support section {tasks[task]} missed the {config.technical_support_deadline}s deadline")
+            await self._emit_section(on_section, tasks[task], "", "timed_out")
+        
+        if "guide" in sections and "guide" not in results:
+            results["guide"] = timeout_text
+        
+        return "\n".join(results[name] for name in sections if results.get(name))
+    
+    async def _emit_section(self, on_section: Optional[SectionCallback], name: str, content: str, status: str):
+        if on_section is None:
+            return
+        try:
+            await on_section({"section": name, "content": content, "status": status})
+        except Exception as e:
+            # A disconnected client must not abort the request
+            logger.warning(f"Section callback failed for {name}: {e}")
+    
     def _create_fallback_autonomous_plan(self, equipment: str) -> Dict[str, Any]:
         """Create a fallback autonomous plan when LLM analysis fails"""
+        # The plan only depends on the name; callers get their own copy to modify
+        return copy.deepcopy(self._build_fallback_autonomous_plan(equipment))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _build_fallback_autonomous_plan(equipment: str) -> Dict[str, Any]:
         equipment_upper = equipment.upper()
         
         # Smart equipment detection
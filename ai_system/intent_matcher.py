@@ -0,0 +1,256 @@
+"""
+Intent Pattern Matcher
+Single-pass matching of many intent regexes behind a keyword prefilter
+"""
+
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PatternMatch:
+    """One pattern that matched the input"""
+    category: str
+    pattern: str
+    score: float
+    entities: Dict[str, str] = field(default_factory=dict)
+    start: int = 0
+    end: int = 0
+
+class _CompiledPattern:
+    __slots__ = ("index", "category", "pattern", "regex", "literals")
+    
+    def __init__(self, index: int, category: str, pattern: str, literals: Optional[Set[str]]):
+        self.index = index
+        self.category = category
+        self.pattern = pattern
+        self.regex = re.compile(pattern, re.IGNORECASE)
+        self.literals = literals
+
+class _AhoCorasick:
+    """Minimal Aho-Corasick automaton reporting which keywords occur in a text"""
+    
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+        
+        for keyword in keywords:
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                node = next_node
+            self._output[node].add(keyword)
+        
+        # Breadth-first so every failure link points at a shallower node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] |= self._output[self._fail[child]]
+    
+    def find(self, text: str) -> Set[str]:
+        found = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found |= output[node]
+        return found
+
+def _required_literals(items) -> Optional[Set[str]]:
+    """Strings of which every match of the parsed pattern must contain one
+    
+    Walks a parsed regex and keeps the most selective candidate: a run of
+    consecutive literal characters, or the union of literals required by
+    each branch of an alternation. None means no such set could be derived
+    and the pattern has to be tried on every input.
+    """
+    candidates: List[Set[str]] = []
+    run: List[str] = []
+    
+    def end_run():
+        if run:
+            candidates.append({"".join(run)})
+            run.clear()
+    
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            run.append(chr(av).lower())
+            continue
+        
+        end_run()
+        if op == sre_constants.SUBPATTERN:
+            inner = _required_literals(av[-1])
+        elif op == sre_constants.BRANCH:
+            inner = set()
+            for branch in av[1]:
+                branch_literals = _required_literals(branch)
+                if branch_literals is None:
+                    inner = None
+                    break
+                inner |= branch_literals
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            inner = _required_literals(av[2])
+        else:
+            inner = None
+        if inner:
+            candidates.append(inner)
+    end_run()
+    
+    if not candidates:
+        return None
+    # The shortest keyword in a set bounds how selective the set is
+    return max(candidates, key=lambda literals: min(len(literal) for literal in literals))
+
+def _extract_literals(pattern: str) -> Optional[Set[str]]:
+    try:
+        return _required_literals(sre_parse.parse(pattern))
+    except Exception as e:
+        logger.debug(f"Could not extract literals from {pattern!r}: {e}")
+        return None
+
+def score_match(match: "re.Match", text: str) -> float:
+    """Score a match by anchoring, coverage of the input and specificity
+    
+    Specificity is the share of the match that is fixed pattern text
+    rather than captured entity.
+    """
+    span = match.end() - match.start()
+    if not text or span == 0:
+        return 0.0
+    captured = sum(len(group) for group in match.groups() if group)
+    anchored = 1.0 if match.start() == 0 else 0.0
+    coverage = span / len(text)
+    specificity = 1.0 - captured / span
+    return round(0.4 * anchored + 0.3 * coverage + 0.3 * specificity, 3)
+
+class IntentMatcher:
+    """Matches input against every intent pattern in one pass
+    
+    Patterns are compiled once. For each pattern the literal text any match
+    must contain is extracted, and all of those keywords go into one
+    Aho-Corasick automaton. A single scan of the input yields the keywords
+    present, so only patterns whose keyword occurred (plus the few with no
+    extractable keyword) run their regex.
+    
+    Usage:
+        matcher = IntentMatcher(agent.intent_patterns)
+        matcher.match_all("navigate to taipei 101")  # every match, best first
+        matcher.match_first("我要去台北車站")         # first in pattern order
+        matcher.add_patterns("navigation", [r"head to (.+)"])
+    """
+    
+    def __init__(self, patterns: Dict[str, List[str]] = None):
+        self._patterns: List[_CompiledPattern] = []
+        self._by_keyword: Dict[str, List[_CompiledPattern]] = {}
+        self._unfiltered: List[_CompiledPattern] = []
+        self._automaton: Optional[_AhoCorasick] = None
+        for category, category_patterns in (patterns or {}).items():
+            self.add_patterns(category, category_patterns)
+    
+    def add_patterns(self, category: str, patterns: Iterable[str]) -> int:
+        """Add patterns for a category, skipping duplicates and invalid regexes"""
+        known = {(compiled.category, compiled.pattern) for compiled in self._patterns}
+        added = 0
+        for pattern in patterns:
+            if (category, pattern) in known:
+                continue
+            try:
+                compiled = _CompiledPattern(len(self._patterns), category, pattern, _extract_literals(pattern))
+            except re.error as e:
+                logger.warning(f"Skipping invalid intent pattern {pattern!r}: {e}")
+                continue
+            
+            self._patterns.append(compiled)
+            known.add((category, pattern))
+            if compiled.literals:
+                for literal in compiled.literals:
+                    self._by_keyword.setdefault(literal, []).append(compiled)
+            else:
+                self._unfiltered.append(compiled)
+            added += 1
+        
+        if added:
+            self._automaton = None  # rebuilt on the next match
+        return added
+    
+    def __len__(self) -> int:
+        return len(self._patterns)
+    
+    def _candidates(self, text: str) -> List[_CompiledPattern]:
+        """Patterns that can possibly match text, in the order they were added"""
+        if self._automaton is None:
+            self._automaton = _AhoCorasick(self._by_keyword)
+        
+        candidates = {compiled.index: compiled for compiled in self._unfiltered}
+        for keyword in self._automaton.find(text):
+            for compiled in self._by_keyword[keyword]:
+                candidates[compiled.index] = compiled
+        return [candidates[index] for index in sorted(candidates)]
+    
+    def match_all(self, user_input: str) -> List[PatternMatch]:
+        """Every matching pattern with its score, best first"""
+        text = user_input.lower().strip()
+        if not text:
+            return []
+        
+        matches = []
+        for compiled in self._candidates(text):
+            match = compiled.regex.search(text)
+            if not match or match.end() == match.start():
+                continue
+            matches.append(PatternMatch(
+                category=compiled.category,
+                pattern=compiled.pattern,
+                score=score_match(match, text),
+                entities={f"entity_{i}": group for i, group in enumerate(match.groups())},
+                start=match.start(),
+                end=match.end()
+            ))
+        
+        # Stable sort keeps pattern order among equal scores
+        matches.sort(key=lambda match: match.score, reverse=True)
+        return matches
+    
+    def match_first(self, user_input: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Category and entities of the first pattern, in insertion order, that matches"""
+        text = user_input.lower().strip()
+        for compiled in self._candidates(text):
+            match = compiled.regex.search(text)
+            if match:
+                return compiled.category, {f"entity_{i}": group for i, group in enumerate(match.groups())}
+        return None
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "patterns": len(self._patterns),
+            "keywords": len(self._by_keyword),
+            "unfiltered_patterns": len(self._unfiltered)
+        }
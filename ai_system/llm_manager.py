@@ -6,38 +6,251 @@ Handles communication with local language models via Ollama and other backends
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, AsyncGenerator, Any
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, AsyncGenerator, AsyncIterator, Any, Callable, Union
 import aiohttp
 from dataclasses import asdict
 
 try:
-    from .config import LLMConfig, config
+    from .config import LLMConfig, HTTPPoolConfig, config
+    from .response_cache import LRUTTLCache, ResponseCache
+    from .llm_scheduler import LLMScheduler, RequestPriority
+    from .load_balancer import EndpointBalancer, EndpointState
+    from .prompt_builder import PromptBuilder
 except ImportError:
-    from config import LLMConfig, config
+    from config import LLMConfig, HTTPPoolConfig, config
+    from response_cache import LRUTTLCache, ResponseCache
+    from llm_scheduler import LLMScheduler, RequestPriority
+    from load_balancer import EndpointBalancer, EndpointState
+    from prompt_builder import PromptBuilder
 
 logger = logging.getLogger(__name__)
 
 class LLMManager:
     """Manages local LLM interactions"""
     
-    def __init__(self):
+    def __init__(self, pool_config: HTTPPoolConfig = None):
         self.active_models: Dict[str, bool] = {}
         self.model_stats: Dict[str, Dict] = {}
+        self.pool_config = pool_config or config.http_pool_config
+        # One long-lived session (and connection pool) per endpoint, and the loop it belongs to
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._session_loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        # Set once requests arrive on more than one event loop
+        self._short_lived_loops = False
+        self.response_cache = ResponseCache()
+        # Ollama context tokens from /api/generate, per conversation
+        self._generate_contexts = LRUTTLCache(max_entries=256, ttl_seconds=config.generate_context_ttl)
+        self.scheduler = LLMScheduler()
+        # Requests for a model are spread over all of its endpoints
+        self.balancer = EndpointBalancer()
+        # Model registry state: loaded once, refreshed in the background
+        self._registry_loaded = False
+        self._registry_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._pull_tasks: Dict[str, asyncio.Task] = {}
         
     async def initialize(self):
         """Initialize the LLM manager"""
         logger.info("Initializing LLM Manager...")
         await self._check_ollama_status()
         await self._load_available_models()
+        await self.warm_up_models()
+        self._start_background_refresh()
+    
+    async def warm_up_models(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Load configured models into Ollama so the first real request is not cold
+        
+        On each endpoint models are warmed one at a time so they do not
+        compete for memory bandwidth while loading; separate endpoints are
+        warmed in parallel. Models an endpoint does not have are skipped.
+        """
+        per_endpoint: Dict[str, List[LLMConfig]] = {}
+        for llm_config in config.llm_configs.values():
+            if not llm_config.warm_up:
+                continue
+            if llm_config.model_name not in self.active_models:
+                logger.info(f"Skipping warm-up for {llm_config.model_name}: not available")
+                continue
+            for endpoint in llm_config.get_endpoints():
+                if llm_config.model_name in self.balancer.get_state(endpoint).models:
+                    per_endpoint.setdefault(endpoint, []).append(llm_config)
+        
+        async def warm_endpoint(endpoint: str, llm_configs: List[LLMConfig]):
+            return [(llm_config.model_name, endpoint, await self._warm_up_model(llm_config, endpoint))
+                    for llm_config in llm_configs]
+        
+        results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for batch in await asyncio.gather(*(
+            warm_endpoint(endpoint, llm_configs) for endpoint, llm_configs in per_endpoint.items()
+        )):
+            for model_name, endpoint, warm_up in batch:
+                results.setdefault(model_name, {})[endpoint] = warm_up
+        return results
+    
+    async def _warm_up_model(self, llm_config: LLMConfig, endpoint: str = None) -> Dict[str, Any]:
+        """Send a one-token prompt to one endpoint and record load and warm-up timings"""
+        request_data = {
+            "model": llm_config.model_name,
+            "prompt": "hi",
+            "stream": False,
+            "keep_alive": llm_config.keep_alive,
+            "options": {"num_predict": 1}
+        }
+        
+        start = time.perf_counter()
+        try:
+            async with self._slot(llm_config, RequestPriority.BACKGROUND, None):
+                with self._endpoint(llm_config, endpoint) as endpoint:
+                    session = await self._get_session(endpoint)
+                    async with session.post(
+                        f"{endpoint}/api/generate",
+                        json=request_data
+                    ) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            raise Exception(f"LLM API error: {response.status} - {error_text}")
+                        data = await response.json()
+        except Exception as e:
+            logger.warning(f"Warm-up failed for {llm_config.model_name} on {endpoint}: {e}")
+            return {"success": False, "error": str(e)}
+        
+        # Ollama reports durations in nanoseconds
+        warm_up = {
+            "success": True,
+            "load_ms": round(data.get("load_duration", 0) / 1e6, 1),
+            "server_total_ms": round(data.get("total_duration", 0) / 1e6, 1),
+            "wall_ms": round((time.perf_counter() - start) * 1000, 1),
+            "keep_alive": llm_config.keep_alive,
+            "warmed_at": datetime.now().isoformat()
+        }
+        self.model_stats.setdefault(llm_config.model_name, {}).setdefault("warm_up", {})[endpoint] = warm_up
+        logger.info(
+            f"Warmed up {llm_config.model_name} on {endpoint}: load {warm_up['load_ms']} ms, "
+            f"total {warm_up['wall_ms']} ms, keep_alive {llm_config.keep_alive}"
+        )
+        return warm_up
+    
+    def _start_background_refresh(self):
+        """Start the periodic /api/tags refresh and health probes if not already running"""
+        if not self._refresh_task or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_models_loop())
+        if len(self.balancer.endpoints) > 1 and (not self._health_task or self._health_task.done()):
+            self._health_task = asyncio.create_task(self._health_check_loop())
+    
+    async def _refresh_models_loop(self):
+        """Keep the model registry in sync with Ollama"""
+        while True:
+            await asyncio.sleep(config.model_refresh_interval)
+            await self._load_available_models()
+    
+    async def _health_check_loop(self):
+        """Probe every endpoint so failed backends are ejected and recovered ones re-admitted"""
+        while True:
+            await asyncio.sleep(config.load_balancer_config.probe_interval)
+            results = await asyncio.gather(*(self._probe_endpoint(state) for state in self.balancer.endpoints))
+            if any(results):
+                self._sync_active_models()
+    
+    async def _get_session(self, endpoint: str) -> aiohttp.ClientSession:
+        """Get the pooled HTTP session for an endpoint, creating it on first use
+        
+        Sessions are bound to the loop they were created on. Callers such as
+        the Streamlit app run each request on a fresh loop via asyncio.run();
+        the first time that happens the old session is closed and, from then
+        on, connections are not kept alive past the request, since no loop
+        would be left to close them.
+        """
+        session = self._sessions.get(endpoint)
+        loop = asyncio.get_running_loop()
+        
+        if session is not None and self._session_loops.get(endpoint) is not loop:
+            self._short_lived_loops = True
+            await self._retire_session(session, self._session_loops[endpoint])
+            session = None
+        elif session is not None and session.closed:
+            session = None
+        
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_config.limit,
+                limit_per_host=self.pool_config.limit_per_host,
+                ttl_dns_cache=self.pool_config.ttl_dns_cache,
+                use_dns_cache=True,
+                keepalive_timeout=None if self._short_lived_loops else self.pool_config.keepalive_timeout,
+                force_close=self._short_lived_loops
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.pool_config.total_timeout,
+                connect=self.pool_config.connect_timeout
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._sessions[endpoint] = session
+            self._session_loops[endpoint] = loop
+            logger.debug(f"Created pooled HTTP session for {endpoint}")
+        
+        return session
+    
+    async def _retire_session(self, session: aiohttp.ClientSession, loop: asyncio.AbstractEventLoop):
+        """Close a session that belongs to another event loop"""
+        if session.closed:
+            return
+        if loop.is_running():
+            # Still serving another thread; close it there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        
+        # Its loop will not run again. Detaching marks the session closed;
+        # closing the connector here drops its idle connections, whose
+        # sockets are released along with their transports.
+        connector = session.connector
+        session.detach()
+        if connector is not None:
+            try:
+                await connector.close()
+            except Exception as e:
+                logger.debug(f"Error closing connector of a previous event loop: {e}")
+    
+    async def shutdown(self):
+        """Stop background tasks and close all pooled HTTP sessions"""
+        tasks = [task for task in [self._refresh_task, self._health_task, *self._pull_tasks.values()]
+                 if task and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refresh_task = None
+        self._health_task = None
+        self._pull_tasks.clear()
+        
+        sessions = [(session, self._session_loops.get(endpoint)) for endpoint, session in self._sessions.items()]
+        self._sessions.clear()
+        self._session_loops.clear()
+        
+        loop = asyncio.get_running_loop()
+        for session, owner in sessions:
+            try:
+                if owner is loop:
+                    if not session.closed:
+                        await session.close()
+                else:
+                    await self._retire_session(session, owner)
+            except Exception as e:
+                logger.warning(f"Error closing HTTP session: {e}")
+        
+        logger.info("LLM Manager shutdown complete")
         
     async def _check_ollama_status(self) -> bool:
         """Check if Ollama is running"""
+        endpoint = config.get_llm_config().endpoint
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get("http://localhost:11434/api/tags") as response:
-                    if response.status == 200:
-                        logger.info("Ollama is running")
-                        return True
+            session = await self._get_session(endpoint)
+            async with session.get(f"{endpoint}/api/tags") as response:
+                if response.status == 200:
+                    logger.info("Ollama is running")
+                    return True
         except Exception as e:
             logger.warning(f"Ollama not accessible: {e}")
             logger.info("Starting Ollama...")
@@ -52,55 +265,146 @@ class LLMManager:
         
         return False
     
-    async def _load_available_models(self):
-        """Load list of available models from Ollama"""
+    async def _load_available_models(self) -> bool:
+        """Load list of available models from every Ollama endpoint"""
+        for llm_config in config.llm_configs.values():
+            self.balancer.register(llm_config.get_endpoints())
+        
+        results = await asyncio.gather(*(self._probe_endpoint(state) for state in self.balancer.endpoints))
+        if not any(results):
+            return False
+        
+        self._sync_active_models()
+        self._registry_loaded = True
+        logger.info(f"Found {len(self.active_models)} available models: {list(self.active_models.keys())}")
+        return True
+    
+    async def _probe_endpoint(self, state: EndpointState) -> bool:
+        """Fetch /api/tags from one endpoint, recording its models and health"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get("http://localhost:11434/api/tags") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        models = data.get("models", [])
-                        for model in models:
-                            model_name = model["name"].split(":")[0]
-                            self.active_models[model_name] = True
-                            self.model_stats[model_name] = {
-                                "size": model.get("size", 0),
-                                "modified_at": model.get("modified_at", ""),
-                                "digest": model.get("digest", "")
-                            }
-                        logger.info(f"Found {len(models)} available models: {list(self.active_models.keys())}")
+            session = await self._get_session(state.url)
+            async with session.get(
+                f"{state.url}/api/tags",
+                timeout=aiohttp.ClientTimeout(total=config.load_balancer_config.probe_timeout)
+            ) as response:
+                if response.status != 200:
+                    raise Exception(f"Ollama tags error: {response.status}")
+                data = await response.json()
         except Exception as e:
-            logger.error(f"Error loading models: {e}")
+            logger.error(f"Error loading models from {state.url}: {e}")
+            self.balancer.record_failure(state, e)
+            return False
+        
+        models = data.get("models", [])
+        state.models = set()
+        for model in models:
+            model_name = model["name"].split(":")[0]
+            state.models.add(model_name)
+            self.model_stats.setdefault(model_name, {}).update({
+                "size": model.get("size", 0),
+                "modified_at": model.get("modified_at", ""),
+                "digest": model.get("digest", "")
+            })
+        self.balancer.record_success(state)
+        return True
+    
+    def _sync_active_models(self):
+        """Swap in the models served by healthy endpoints so removed models disappear"""
+        self.active_models = {model_name: True for model_name in sorted(self.balancer.models_available())}
+    
+    async def _ensure_registry_loaded(self):
+        """Load the model registry once for callers that skipped initialize()"""
+        if self._registry_loaded:
+            return
+        
+        if self._registry_lock is None:
+            self._registry_lock = asyncio.Lock()
+        
+        async with self._registry_lock:
+            if not self._registry_loaded:
+                await self._load_available_models()
     
     async def ensure_model_available(self, model_name: str) -> bool:
-        """Ensure a model is available, pull if necessary"""
+        """Check whether a model is available without blocking on a pull
+        
+        Missing models are pulled in the background; this returns False
+        immediately so the caller can fail fast or use a fallback model.
+        """
+        await self._ensure_registry_loaded()
+        
         if model_name in self.active_models:
             return True
-            
-        logger.info(f"Pulling model {model_name}...")
+        
+        self._schedule_pull(model_name)
+        return False
+    
+    def _schedule_pull(self, model_name: str):
+        """Start a background pull for a model unless one is already running"""
+        task = self._pull_tasks.get(model_name)
+        if task and not task.done():
+            return
+        self._pull_tasks[model_name] = asyncio.create_task(self.pull_model(model_name))
+    
+    def _is_pulling(self, model_name: str) -> bool:
+        task = self._pull_tasks.get(model_name)
+        return bool(task and not task.done())
+    
+    async def pull_model(self, model_name: str) -> bool:
+        """Pull a model from the Ollama registry onto each endpoint that lacks it"""
+        endpoints = [
+            endpoint for endpoint in config.get_llm_config(model_name).get_endpoints()
+            if model_name not in self.balancer.get_state(endpoint).models
+        ]
+        results = await asyncio.gather(*(self._pull_to_endpoint(model_name, endpoint) for endpoint in endpoints))
+        return any(results)
+    
+    async def _pull_to_endpoint(self, model_name: str, endpoint: str) -> bool:
+        """Pull a model onto one endpoint"""
+        logger.info(f"Pulling model {model_name} on {endpoint}...")
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "http://localhost:11434/api/pull",
-                    json={"name": model_name}
-                ) as response:
-                    if response.status == 200:
-                        async for line in response.content:
-                            if line:
-                                try:
-                                    status = json.loads(line.decode())
-                                    if status.get("status") == "success":
-                                        self.active_models[model_name] = True
-                                        logger.info(f"Successfully pulled {model_name}")
-                                        return True
-                                except json.JSONDecodeError:
-                                    continue
+            session = await self._get_session(endpoint)
+            async with session.post(
+                f"{endpoint}/api/pull",
+                json={"name": model_name},
+                timeout=aiohttp.ClientTimeout(total=None)  # pulls can take a long time
+            ) as response:
+                if response.status == 200:
+                    async for line in response.content:
+                        if line:
+                            try:
+                                status = json.loads(line.decode())
+                                if status.get("status") == "success":
+                                    self.balancer.get_state(endpoint).models.add(model_name)
+                                    self.active_models[model_name] = True
+                                    logger.info(f"Successfully pulled {model_name} on {endpoint}")
+                                    return True
+                            except json.JSONDecodeError:
+                                continue
         except Exception as e:
-            logger.error(f"Error pulling model {model_name}: {e}")
+            logger.error(f"Error pulling model {model_name} on {endpoint}: {e}")
             return False
         
         return False
     
+    async def _resolve_model(self, model_name: str = None) -> LLMConfig:
+        """Pick the config to serve a request, falling back while a model is pulled"""
+        llm_config = config.get_llm_config(model_name)
+        
+        if await self.ensure_model_available(llm_config.model_name):
+            return llm_config
+        
+        fallback_name = config.fallback_llm
+        if fallback_name and fallback_name != llm_config.model_name:
+            fallback_config = config.get_llm_config(fallback_name)
+            if fallback_config.model_name in self.active_models:
+                logger.warning(
+                    f"Model {llm_config.model_name} not available yet, "
+                    f"using fallback {fallback_config.model_name}"
+                )
+                return fallback_config
+        
+        raise Exception(f"Model {llm_config.model_name} not available (pull started in background)")
+    
     async def generate_response(
         self, 
         prompt: str, 
@@ -108,21 +412,116 @@ class LLMManager:
         system_prompt: str = None,
         temperature: float = None,
         max_tokens: int = None,
-        stream: bool = False
+        stream: bool = False,
+        priority: RequestPriority = RequestPriority.NORMAL,
+        deadline: float = None,
+        context_key: str = None,
+        format: Union[str, Dict[str, Any]] = None
     ) -> str:
-        """Generate response from LLM"""
+        """Generate response from LLM
         
-        llm_config = config.get_llm_config(model_name)
+        With stream=True the awaited result is an async iterator of tokens
+        (see stream_generate) instead of the full completion text. Requests
+        are admitted by the scheduler in priority order; deadline is how many
+        seconds the request may wait in the queue before it is dropped.
+        
+        With a context_key, the context tokens Ollama returns are kept and sent
+        back on the next call with the same key, so the prompt only needs the
+        new turn and the server does not re-prefill the conversation. The
+        system prompt is only sent on the first turn.
+        
+        format constrains the output: "json" for any JSON value, or a JSON
+        schema dict for Ollama's structured outputs.
+        """
+        
+        if stream:
+            return self.stream_generate(
+                prompt=prompt,
+                model_name=model_name,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                priority=priority,
+                deadline=deadline,
+                context_key=context_key,
+                format=format
+            )
+        
+        llm_config = await self._resolve_model(model_name)
+        
+        request_data = self._build_generate_request(
+            llm_config, prompt, system_prompt, temperature, max_tokens, stream=False, format=format
+        )
+        preferred_endpoint = self._attach_generate_context(request_data, llm_config, context_key)
+        
+        try:
+            async with self._slot(llm_config, priority, deadline):
+                with self._endpoint(llm_config, preferred_endpoint) as endpoint:
+                    session = await self._get_session(endpoint)
+                    async with session.post(
+                        f"{endpoint}/api/generate",
+                        json=request_data
+                    ) as response:
+                        if response.status == 200:
+                            data = await response.json()
+                            self._store_generate_context(context_key, llm_config, endpoint, data)
+                            return data.get("response", "")
+                        else:
+                            error_text = await response.text()
+                            raise Exception(f"LLM API error: {response.status} - {error_text}")
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            raise
+    
+    async def stream_generate(
+        self,
+        prompt: str,
+        model_name: str = None,
+        system_prompt: str = None,
+        temperature: float = None,
+        max_tokens: int = None,
+        priority: RequestPriority = RequestPriority.NORMAL,
+        deadline: float = None,
+        context_key: str = None,
+        format: Union[str, Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Stream tokens from /api/generate as they are produced"""
         
-        # Ensure model is available
-        if not await self.ensure_model_available(llm_config.model_name):
-            raise Exception(f"Model {llm_config.model_name} not available")
+        llm_config = await self._resolve_model(model_name)
         
-        # Prepare request
+        request_data = self._build_generate_request(
+            llm_config, prompt, system_prompt, temperature, max_tokens, stream=True, format=format
+        )
+        preferred_endpoint = self._attach_generate_context(request_data, llm_config, context_key)
+        
+        async for token in self._stream_request(
+            llm_config,
+            "/api/generate",
+            request_data,
+            lambda data: data.get("response"),
+            priority,
+            deadline,
+            on_done=lambda data, endpoint: self._store_generate_context(context_key, llm_config, endpoint, data),
+            endpoint=preferred_endpoint
+        ):
+            yield token
+    
+    def _build_generate_request(
+        self,
+        llm_config: LLMConfig,
+        prompt: str,
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        format: Union[str, Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Build the request body for /api/generate"""
         request_data = {
             "model": llm_config.model_name,
             "prompt": prompt,
             "stream": stream,
+            "keep_alive": llm_config.keep_alive,
             "options": {
                 "temperature": temperature or llm_config.temperature,
                 "num_predict": max_tokens or llm_config.max_tokens
@@ -132,34 +531,144 @@ class LLMManager:
         if system_prompt:
             request_data["system"] = system_prompt
         
+        if format:
+            request_data["format"] = format
+        
+        return request_data
+    
+    def has_generate_context(self, context_key: str, model_name: str = None) -> bool:
+        """Whether a follow-up call with context_key will reuse stored context tokens"""
+        entry = self._generate_contexts.get(context_key) if context_key else None
+        return bool(entry) and entry["model"] == config.get_llm_config(model_name).model_name
+    
+    def clear_generate_context(self, context_key: str):
+        """Forget the context tokens kept for a conversation"""
+        self._generate_contexts.pop(context_key)
+    
+    def _attach_generate_context(
+        self,
+        request_data: Dict[str, Any],
+        llm_config: LLMConfig,
+        context_key: Optional[str]
+    ) -> Optional[str]:
+        """Add stored context tokens to a generate request
+        
+        Returns the endpoint that produced them if it is still usable; its KV
+        cache already holds the conversation.
+        """
+        entry = self._generate_contexts.get(context_key) if context_key else None
+        if not entry or entry["model"] != llm_config.model_name:
+            return None
+        
+        request_data["context"] = entry["context"]
+        # The system prompt is already part of the context
+        request_data.pop("system", None)
+        
+        endpoint = entry["endpoint"]
+        if endpoint in llm_config.get_endpoints() and self.balancer.get_state(endpoint).healthy:
+            return endpoint
+        return None
+    
+    def _store_generate_context(
+        self,
+        context_key: Optional[str],
+        llm_config: LLMConfig,
+        endpoint: str,
+        data: Dict[str, Any]
+    ):
+        """Keep the context tokens from a finished generate response"""
+        if not context_key or not data.get("context"):
+            return
+        
+        context = data["context"]
+        if len(context) > llm_config.context_length - llm_config.max_tokens:
+            # Ollama would truncate it anyway; start the conversation afresh
+            logger.info(f"Context for {context_key} reached {len(context)} tokens, starting a new one")
+            self._generate_contexts.pop(context_key)
+            return
+        
+        self._generate_contexts.set(context_key, {
+            "model": llm_config.model_name,
+            "endpoint": endpoint,
+            "context": context
+        })
+    
+    def _slot(self, llm_config: LLMConfig, priority: RequestPriority, deadline: float):
+        """Scheduler slot for one request against a model"""
+        return self.scheduler.slot(
+            llm_config.model_name,
+            priority=priority,
+            deadline=deadline,
+            limit=llm_config.max_concurrent_requests * len(llm_config.get_endpoints())
+        )
+    
+    @contextmanager
+    def _endpoint(self, llm_config: LLMConfig, endpoint: str = None):
+        """Pick the least-loaded healthy endpoint (or use endpoint) and track the request on it"""
+        if endpoint:
+            state = self.balancer.get_state(endpoint)
+        else:
+            state = self.balancer.pick(llm_config.get_endpoints(), llm_config.model_name)
+        with self.balancer.track(state):
+            yield state.url
+    
+    async def _stream_request(
+        self,
+        llm_config: LLMConfig,
+        path: str,
+        request_data: Dict[str, Any],
+        extract_token: Callable[[Dict[str, Any]], Optional[str]],
+        priority: RequestPriority = RequestPriority.NORMAL,
+        deadline: float = None,
+        on_done: Callable[[Dict[str, Any], str], None] = None,
+        endpoint: str = None
+    ) -> AsyncIterator[str]:
+        """POST a streaming request and yield tokens while the response is open
+        
+        The scheduler slot and the endpoint are held until the stream is
+        exhausted or closed. on_done is called with the final chunk and the
+        endpoint that served it.
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{llm_config.endpoint}/api/generate",
-                    json=request_data
-                ) as response:
-                    if response.status == 200:
-                        if stream:
-                            return self._handle_stream_response(response)
-                        else:
-                            data = await response.json()
-                            return data.get("response", "")
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"LLM API error: {response.status} - {error_text}")
+            async with self._slot(llm_config, priority, deadline):
+                with self._endpoint(llm_config, endpoint) as endpoint:
+                    session = await self._get_session(endpoint)
+                    async with session.post(f"{endpoint}{path}", json=request_data) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            raise Exception(f"LLM API error: {response.status} - {error_text}")
+                        
+                        async for token in self._handle_stream_response(
+                            response,
+                            extract_token,
+                            (lambda data: on_done(data, endpoint)) if on_done else None
+                        ):
+                            yield token
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
+            logger.error(f"Error streaming from {path}: {e}")
             raise
     
-    async def _handle_stream_response(self, response) -> AsyncGenerator[str, None]:
+    async def _handle_stream_response(
+        self,
+        response,
+        extract_token: Callable[[Dict[str, Any]], Optional[str]] = None,
+        on_done: Callable[[Dict[str, Any]], None] = None
+    ) -> AsyncGenerator[str, None]:
         """Handle streaming response from LLM"""
+        extract_token = extract_token or (lambda data: data.get("response"))
+        
         async for line in response.content:
             if line:
                 try:
                     data = json.loads(line.decode())
-                    if "response" in data:
-                        yield data["response"]
+                    if data.get("error"):
+                        raise Exception(f"LLM stream error: {data['error']}")
+                    token = extract_token(data)
+                    if token:
+                        yield token
                     if data.get("done", False):
+                        if on_done:
+                            on_done(data)
                         break
                 except json.JSONDecodeError:
                     continue
@@ -169,40 +678,140 @@ class LLMManager:
         messages: List[Dict[str, str]],
         model_name: str = None,
         temperature: float = None,
-        max_tokens: int = None
+        max_tokens: int = None,
+        stream: bool = False,
+        use_cache: bool = True,
+        priority: RequestPriority = RequestPriority.NORMAL,
+        deadline: float = None,
+        cache_query: str = None,
+        cache_context: str = None
     ) -> str:
-        """Chat completion with conversation history"""
+        """Chat completion with conversation history
         
-        llm_config = config.get_llm_config(model_name)
+        With stream=True the awaited result is an async iterator of tokens
+        (see stream_chat) instead of the full message content. Identical (or,
+        with an embedding model attached, near-identical) requests are served
+        from the response cache unless use_cache is False. cache_query and
+        cache_context, when the final message wraps the user's words in
+        other text, are what the cache matches on instead (see
+        ResponseCache). priority and deadline are passed to the scheduler as
+        in generate_response.
+        """
         
-        if not await self.ensure_model_available(llm_config.model_name):
-            raise Exception(f"Model {llm_config.model_name} not available")
+        if stream:
+            return self.stream_chat(
+                messages=messages,
+                model_name=model_name,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+                priority=priority,
+                deadline=deadline,
+                cache_query=cache_query,
+                cache_context=cache_context
+            )
         
-        request_data = {
+        llm_config = await self._resolve_model(model_name)
+        
+        request_data = self._build_chat_request(
+            llm_config, messages, temperature, max_tokens, stream=False
+        )
+        
+        if use_cache:
+            cached = await self.response_cache.lookup(
+                llm_config.model_name, messages, request_data["options"], cache_query, cache_context
+            )
+            if cached is not None:
+                return cached
+        
+        try:
+            async with self._slot(llm_config, priority, deadline):
+                with self._endpoint(llm_config) as endpoint:
+                    session = await self._get_session(endpoint)
+                    async with session.post(
+                        f"{endpoint}/api/chat",
+                        json=request_data
+                    ) as response:
+                        if response.status == 200:
+                            data = await response.json()
+                            content = data.get("message", {}).get("content", "")
+                        else:
+                            error_text = await response.text()
+                            raise Exception(f"Chat API error: {response.status} - {error_text}")
+            
+            if use_cache:
+                await self.response_cache.store(
+                    llm_config.model_name, messages, request_data["options"], content, cache_query, cache_context
+                )
+            return content
+        except Exception as e:
+            logger.error(f"Error in chat completion: {e}")
+            raise
+    
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        model_name: str = None,
+        temperature: float = None,
+        max_tokens: int = None,
+        use_cache: bool = True,
+        priority: RequestPriority = RequestPriority.NORMAL,
+        deadline: float = None,
+        cache_query: str = None,
+        cache_context: str = None
+    ) -> AsyncIterator[str]:
+        """Stream assistant tokens from /api/chat as they are produced"""
+        
+        llm_config = await self._resolve_model(model_name)
+        
+        request_data = self._build_chat_request(
+            llm_config, messages, temperature, max_tokens, stream=True
+        )
+        
+        if use_cache:
+            cached = await self.response_cache.lookup(
+                llm_config.model_name, messages, request_data["options"], cache_query, cache_context
+            )
+            if cached is not None:
+                yield cached
+                return
+        
+        tokens = []
+        async for token in self._stream_request(
+            llm_config,
+            "/api/chat",
+            request_data,
+            lambda data: data.get("message", {}).get("content"),
+            priority,
+            deadline
+        ):
+            tokens.append(token)
+            yield token
+        
+        if use_cache:
+            await self.response_cache.store(
+                llm_config.model_name, messages, request_data["options"], "".join(tokens), cache_query, cache_context
+            )
+    
+    def _build_chat_request(
+        self,
+        llm_config: LLMConfig,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        stream: bool
+    ) -> Dict[str, Any]:
+        """Build the request body for /api/chat"""
+        return {
             "model": llm_config.model_name,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
+            "keep_alive": llm_config.keep_alive,
             "options": {
                 "temperature": temperature or llm_config.temperature,
                 "num_predict": max_tokens or llm_config.max_tokens
             }
         }
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{llm_config.endpoint}/api/chat",
-                    json=request_data
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("message", {}).get("content", "")
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"Chat API error: {response.status} - {error_text}")
-        except Exception as e:
-            logger.error(f"Error in chat completion: {e}")
-            raise
     
     async def get_model_info(self, model_name: str = None) -> Dict[str, Any]:
         """Get information about a model"""
@@ -212,11 +821,15 @@ class LLMManager:
             "name": llm_config.model_name,
             "type": llm_config.model_type,
             "endpoint": llm_config.endpoint,
+            "endpoints": self.balancer.get_stats(llm_config.get_endpoints()),
             "context_length": llm_config.context_length,
             "temperature": llm_config.temperature,
             "max_tokens": llm_config.max_tokens,
+            "keep_alive": llm_config.keep_alive,
             "available": llm_config.model_name in self.active_models,
-            "stats": self.model_stats.get(llm_config.model_name, {})
+            "pulling": self._is_pulling(llm_config.model_name),
+            "stats": self.model_stats.get(llm_config.model_name, {}),
+            "scheduler": self.scheduler.get_stats().get(llm_config.model_name, {})
         }
         
         return model_info
@@ -233,42 +846,64 @@ class LLMManager:
         self,
         prompt: str,
         context: Dict[str, Any] = None,
-        system_prompt: str = None
+        system_prompt: str = None,
+        model_name: str = None
     ) -> str:
-        """Enhance prompt with contextual information for better understanding"""
+        """Enhance prompt with contextual information for better understanding
         
-        enhanced_parts = []
+        Context is fitted to the model's context window; the oldest
+        conversation entries are dropped first, then tools and preferences.
+        The fixed system context and instructions come first so requests
+        share a cacheable prefix.
+        """
+        
+        builder = PromptBuilder.for_model(config.get_llm_config(model_name))
         
         # Add system context
         if system_prompt:
-            enhanced_parts.append(f"System Context: {system_prompt}")
+            builder.add("system", f"System Context: {system_prompt}", required=True)
         
         # Add conversational context
+        history = []
         if context:
-            if context.get("conversation_history"):
-                enhanced_parts.append("Recent Conversation:")
-                for entry in context["conversation_history"][-3:]:
-                    enhanced_parts.append(f"- {entry}")
+            history = context.get("conversation_history", [])[-3:]
+            for i, entry in enumerate(history):
+                builder.add(f"history_{i}", f"- {entry}", priority=1, min_tokens=8)
             
             if context.get("user_preferences"):
-                enhanced_parts.append("User Preferences:")
-                for key, value in context["user_preferences"].items():
-                    enhanced_parts.append(f"- {key}: {value}")
+                builder.add("user_preferences", "User Preferences:\n\n" + "\n\n".join(
+                    f"- {key}: {value}" for key, value in context["user_preferences"].items()
+                ), priority=2)
             
             if context.get("current_task"):
-                enhanced_parts.append(f"Current Task Context: {context['current_task']}")
+                builder.add("current_task", f"Current Task Context: {context['current_task']}", priority=4)
             
             if context.get("available_tools"):
-                enhanced_parts.append(f"Available Tools: {', '.join(context['available_tools'])}")
+                builder.add("available_tools", f"Available Tools: {', '.join(context['available_tools'])}", priority=3)
         
         # Add the main prompt
-        enhanced_parts.append("User Request:")
-        enhanced_parts.append(prompt)
+        builder.add("prompt", f"User Request:\n\n{prompt}", required=True)
         
         # Add intelligent context instruction
-        enhanced_parts.append("\nInstructions: You are an intelligent AI agent. Consider all provided context to give the most helpful and accurate response. If the user's intent isn't completely clear, use the context to make reasonable inferences about what they want to accomplish.")
+        builder.add("instructions", "Instructions: You are an intelligent AI agent. Consider all provided context to give the most helpful and accurate response. If the user's intent isn't completely clear, use the context to make reasonable inferences about what they want to accomplish.", required=True)
+        
+        builder.build()
+        logger.debug(f"Contextual prompt tokens: {builder.report()}")
         
-        return "\n\n".join(enhanced_parts)
+        history_parts = [builder.text(f"history_{i}") for i in range(len(history))]
+        history_parts = [part for part in history_parts if part]
+        
+        enhanced_parts = [builder.text("system"), builder.text("instructions")]
+        if history_parts:
+            enhanced_parts += ["Recent Conversation:", *history_parts]
+        enhanced_parts += [
+            builder.text("user_preferences"),
+            builder.text("current_task"),
+            builder.text("available_tools"),
+            builder.text("prompt")
+        ]
+        
+        return "\n\n".join(part for part in enhanced_parts if part)
     
     async def generate_contextual_response(
         self,
@@ -276,7 +911,8 @@ class LLMManager:
         conversation_history: List[str] = None,
         user_preferences: Dict[str, Any] = None,
         available_tools: List[str] = None,
-        model_name: str = None
+        model_name: str = None,
+        priority: RequestPriority = RequestPriority.NORMAL
     ) -> str:
         """Generate a contextually aware response"""
         
@@ -294,13 +930,15 @@ class LLMManager:
         enhanced_prompt = self._enhance_prompt_with_context(
             prompt=user_input,
             context=context,
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            model_name=model_name
         )
         
         return await self.generate_response(
             prompt=enhanced_prompt,
             model_name=model_name,
-            temperature=0.7
+            temperature=0.7,
+            priority=priority
         )
 
 # Global LLM manager instance
@@ -0,0 +1,160 @@
+"""
+LLM Request Scheduler
+Per-model concurrency limits and priority queueing for Ollama requests
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class RequestPriority(IntEnum):
+    """Scheduling classes; lower values are served first"""
+    INTERACTIVE = 0  # voice commands and chat a user is waiting on
+    NORMAL = 1
+    BACKGROUND = 2  # learning, summarization, prewarming
+
+class _ModelQueue:
+    """Slots and waiters for a single model"""
+    
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self.waiters: List[list] = []  # heap of [priority, seq, future]
+        self.queued = {priority: 0 for priority in RequestPriority}
+        self.stats = {
+            "granted": 0,
+            "expired": 0,
+            "cancelled": 0,
+            "max_queue_depth": 0,
+            "total_wait": 0.0
+        }
+    
+    @property
+    def depth(self) -> int:
+        return sum(self.queued.values())
+
+class LLMScheduler:
+    """Admits LLM requests per model in priority order
+    
+    Each model has a concurrency cap. Requests beyond the cap wait in a
+    priority queue (FIFO within a priority). A request that is still
+    queued when its deadline passes is removed and raises
+    asyncio.TimeoutError without ever reaching the backend.
+    """
+    
+    def __init__(self, default_limit: int = 2):
+        self.default_limit = default_limit
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._sequence = itertools.count()
+    
+    def set_limit(self, model_name: str, limit: int):
+        """Change the concurrency cap for a model"""
+        queue = self._get_queue(model_name, limit)
+        queue.limit = max(1, limit)
+        # A raised cap can admit waiters straight away
+        while queue.active < queue.limit and self._grant_next(queue):
+            pass
+    
+    @asynccontextmanager
+    async def slot(
+        self,
+        model_name: str,
+        priority: RequestPriority = RequestPriority.NORMAL,
+        deadline: Optional[float] = None,
+        limit: Optional[int] = None
+    ):
+        """Hold one of the model's slots for the duration of the block
+        
+        deadline is the number of seconds the request may wait in the queue.
+        """
+        queue = self._get_queue(model_name, limit)
+        await self._acquire(queue, priority, deadline)
+        try:
+            yield
+        finally:
+            self._release(queue)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and wait metrics per model"""
+        stats = {}
+        for model_name, queue in self._queues.items():
+            granted = queue.stats["granted"]
+            stats[model_name] = {
+                "limit": queue.limit,
+                "active": queue.active,
+                "queue_depth": queue.depth,
+                "queued_by_priority": {priority.name.lower(): count for priority, count in queue.queued.items()},
+                "max_queue_depth": queue.stats["max_queue_depth"],
+                "granted": granted,
+                "expired": queue.stats["expired"],
+                "cancelled": queue.stats["cancelled"],
+                "avg_wait_ms": round(queue.stats["total_wait"] / granted * 1000, 2) if granted else 0.0
+            }
+        return stats
+    
+    def _get_queue(self, model_name: str, limit: Optional[int]) -> _ModelQueue:
+        queue = self._queues.get(model_name)
+        if queue is None:
+            queue = _ModelQueue(limit or self.default_limit)
+            self._queues[model_name] = queue
+        return queue
+    
+    async def _acquire(self, queue: _ModelQueue, priority: RequestPriority, deadline: Optional[float]):
+        start = time.monotonic()
+        
+        if queue.active < queue.limit and not queue.depth:
+            queue.active += 1
+            queue.stats["granted"] += 1
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        entry = [int(priority), next(self._sequence), future]
+        heapq.heappush(queue.waiters, entry)
+        queue.queued[priority] += 1
+        queue.stats["max_queue_depth"] = max(queue.stats["max_queue_depth"], queue.depth)
+        
+        try:
+            await asyncio.wait_for(future, deadline)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller gave up; pass it on
+                self._release(queue)
+            else:
+                future.cancel()
+                queue.queued[priority] -= 1
+            
+            if isinstance(e, asyncio.TimeoutError):
+                queue.stats["expired"] += 1
+                raise asyncio.TimeoutError(
+                    f"LLM request expired after waiting {time.monotonic() - start:.2f}s in queue"
+                ) from None
+            
+            queue.stats["cancelled"] += 1
+            raise
+        
+        queue.stats["total_wait"] += time.monotonic() - start
+    
+    def _release(self, queue: _ModelQueue):
+        queue.active -= 1
+        if queue.active < queue.limit:
+            self._grant_next(queue)
+    
+    def _grant_next(self, queue: _ModelQueue) -> bool:
+        """Hand a free slot to the highest-priority live waiter"""
+        while queue.waiters:
+            priority, _, future = heapq.heappop(queue.waiters)
+            if future.done():
+                continue  # cancelled or expired while queued
+            queue.queued[RequestPriority(priority)] -= 1
+            queue.active += 1
+            queue.stats["granted"] += 1
+            future.set_result(None)
+            return True
+        return False
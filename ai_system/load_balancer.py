@@ -0,0 +1,136 @@
+"""
+LLM Endpoint Load Balancer
+Least-outstanding-requests balancing with health tracking across Ollama backends
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+try:
+    from .config import LoadBalancerConfig, config
+except ImportError:
+    from config import LoadBalancerConfig, config
+
+logger = logging.getLogger(__name__)
+
+# Errors that say something about the backend rather than the request
+ENDPOINT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError, OSError)
+
+class EndpointState:
+    """Health and load bookkeeping for one backend"""
+    
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.models: Set[str] = set()
+        self.total_requests = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+    
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+class EndpointBalancer:
+    """Routes requests to the healthy endpoint with the fewest requests in flight
+    
+    Endpoints that fail failure_threshold times in a row, on requests or on
+    health probes, are ejected for ejection_seconds. A successful probe
+    admits them again straight away. If every candidate is ejected, the
+    least-loaded one is still used rather than failing the request outright.
+    """
+    
+    def __init__(self, lb_config: LoadBalancerConfig = None):
+        self.config = lb_config or config.load_balancer_config
+        self._endpoints: Dict[str, EndpointState] = {}
+    
+    def register(self, urls: Iterable[str]):
+        for url in urls:
+            if url not in self._endpoints:
+                self._endpoints[url] = EndpointState(url)
+    
+    def get_state(self, url: str) -> EndpointState:
+        self.register([url])
+        return self._endpoints[url]
+    
+    @property
+    def endpoints(self) -> List[EndpointState]:
+        return list(self._endpoints.values())
+    
+    def pick(self, urls: List[str], model_name: str = None) -> EndpointState:
+        """Choose an endpoint among urls for a request"""
+        self.register(urls)
+        candidates = [self._endpoints[url] for url in urls]
+        
+        healthy = [state for state in candidates if state.healthy] or candidates
+        if model_name:
+            # Prefer backends known to have the model; fall back to any healthy one
+            healthy = [state for state in healthy if model_name in state.models] or healthy
+        
+        # Ties go to the endpoint that has served the fewest requests so idle
+        # backends share sequential traffic too
+        return min(healthy, key=lambda state: (state.outstanding, state.total_requests))
+    
+    @contextmanager
+    def track(self, state: EndpointState):
+        """Count a request against an endpoint and record its outcome"""
+        state.outstanding += 1
+        state.total_requests += 1
+        try:
+            yield state
+        except ENDPOINT_ERRORS as e:
+            self.record_failure(state, e)
+            raise
+        else:
+            self.record_success(state)
+        finally:
+            state.outstanding -= 1
+    
+    def record_success(self, state: EndpointState):
+        if not state.healthy:
+            logger.info(f"Re-admitting LLM endpoint {state.url}")
+        state.consecutive_failures = 0
+        state.ejected_until = 0.0
+    
+    def record_failure(self, state: EndpointState, error: Exception):
+        state.consecutive_failures += 1
+        state.total_failures += 1
+        state.last_error = str(error) or type(error).__name__
+        
+        if state.consecutive_failures >= self.config.failure_threshold:
+            if state.healthy:
+                logger.warning(
+                    f"Ejecting LLM endpoint {state.url} for {self.config.ejection_seconds}s "
+                    f"after {state.consecutive_failures} failures: {state.last_error}"
+                )
+            state.ejected_until = time.monotonic() + self.config.ejection_seconds
+    
+    def models_available(self) -> Set[str]:
+        """Models served by at least one healthy endpoint"""
+        models = set()
+        for state in self._endpoints.values():
+            if state.healthy:
+                models |= state.models
+        return models
+    
+    def get_stats(self, urls: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        states = [self._endpoints[url] for url in urls if url in self._endpoints] if urls else self.endpoints
+        return {
+            state.url: {
+                "healthy": state.healthy,
+                "outstanding": state.outstanding,
+                "consecutive_failures": state.consecutive_failures,
+                "total_requests": state.total_requests,
+                "total_failures": state.total_failures,
+                "models": sorted(state.models),
+                "last_error": state.last_error
+            }
+            for state in states
+        }
@@ -0,0 +1,97 @@
+"""
+Event Loop Monitor
+Measures how late the asyncio event loop wakes up, i.e. how long blocking
+work keeps every other coroutine (WebSockets, RTSP callbacks, HTTP
+requests) waiting
+"""
+
+import asyncio
+import logging
+import statistics
+from collections import deque
+from typing import Any, Dict, Optional
+
+try:
+    from .config import config
+except ImportError:
+    from config import config
+
+logger = logging.getLogger(__name__)
+
+class EventLoopMonitor:
+    """Probe task that sleeps for a fixed interval and records the overshoot
+    
+    A responsive loop wakes the probe within a millisecond or so. Anything
+    that runs on the loop without yielding shows up directly as lag.
+    """
+    
+    def __init__(self, interval: float = None, warn_threshold: float = None, max_samples: int = 1000):
+        self.interval = interval or config.loop_monitor_interval
+        self.warn_threshold = warn_threshold or config.loop_lag_warning
+        self.samples = deque(maxlen=max_samples)
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Start probing the running loop; repeated calls are ignored"""
+        if not self.running:
+            self._task = asyncio.create_task(self._probe())
+    
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    def reset(self):
+        self.samples.clear()
+        self.stalls = 0
+        self.max_lag = 0.0
+    
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - expected))
+    
+    def record(self, lag: float):
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.warn_threshold:
+            self.stalls += 1
+            logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Lag percentiles over the recent samples, in milliseconds"""
+        stats: Dict[str, Any] = {
+            "running": self.running,
+            "samples": len(self.samples),
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag * 1000, 2)
+        }
+        if self.samples:
+            ordered = sorted(self.samples)
+            
+            def percentile(p: float) -> float:
+                return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+            
+            stats.update({
+                "mean_lag_ms": round(statistics.mean(ordered) * 1000, 2),
+                "p50_lag_ms": percentile(0.50),
+                "p95_lag_ms": percentile(0.95),
+                "p99_lag_ms": percentile(0.99)
+            })
+        return stats
+
+# Global monitor for the main event loop
+loop_monitor = EventLoopMonitor()
@@ -0,0 +1,267 @@
+"""
+Ollama Stub Server
+Minimal fake Ollama HTTP server for benchmarking without a real model
+
+Implements /api/tags, /api/generate, /api/chat and /api/pull. Latency is
+modelled as a one-off load time per model, a time to first token (prefill)
+and a per-token delay, and responses carry Ollama-style timing fields.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import List
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+class OllamaStubServer:
+    """Serves canned Ollama API responses with a configurable delay"""
+    
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 11435,
+        models: List[str] = None,
+        response_text: str = "This is a stub response.",
+        latency: float = 0.0,
+        token_latency: float = 0.0,
+        first_token_latency: float = 0.0,
+        load_latency: float = 0.0,
+        pull_latency: float = 0.0
+    ):
+        self.host = host
+        self.port = port
+        self.models = list(models or ["llama3.2", "codellama", "mistral"])
+        self.response_text = response_text
+        self.latency = latency
+        self.token_latency = token_latency
+        self.first_token_latency = first_token_latency  # prefill time before the first token
+        self.load_latency = load_latency  # paid once per model, like loading weights
+        self.pull_latency = pull_latency  # total time a pull takes
+        self.request_count = 0
+        self._loaded_models = set()
+        self._runner = None
+    
+    @property
+    def endpoint(self) -> str:
+        """Base URL of the running server"""
+        return f"http://{self.host}:{self.port}"
+    
+    def create_app(self) -> web.Application:
+        """Create the aiohttp application with Ollama-compatible routes"""
+        app = web.Application()
+        app.router.add_get("/api/tags", self._handle_tags)
+        app.router.add_post("/api/generate", self._handle_generate)
+        app.router.add_post("/api/chat", self._handle_chat)
+        app.router.add_post("/api/pull", self._handle_pull)
+        return app
+    
+    async def start(self):
+        """Start serving in the current event loop"""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Ollama stub server listening on {self.endpoint}")
+    
+    async def stop(self):
+        """Stop the server"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _handle_tags(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        return web.json_response({
+            "models": [
+                {
+                    "name": f"{model}:latest",
+                    "size": 0,
+                    "modified_at": datetime.now().isoformat(),
+                    "digest": "stub"
+                }
+                for model in self.models
+            ]
+        })
+    
+    async def _handle_generate(self, request: web.Request) -> web.StreamResponse:
+        self.request_count += 1
+        data = await request.json()
+        # Fake context tokens: the previous context plus one id per word
+        # of this turn, so clients can exercise context reuse
+        context = list(data.get("context") or []) + [
+            len(word) for word in f"{data.get('prompt', '')} {self.response_text}".split()
+        ]
+        return await self._respond(
+            request,
+            data,
+            lambda text, done: {"response": text, "done": done, **({"context": context} if done else {})}
+        )
+    
+    async def _handle_chat(self, request: web.Request) -> web.StreamResponse:
+        self.request_count += 1
+        data = await request.json()
+        return await self._respond(
+            request,
+            data,
+            lambda text, done: {"message": {"role": "assistant", "content": text}, "done": done}
+        )
+    
+    async def _handle_pull(self, request: web.Request) -> web.StreamResponse:
+        self.request_count += 1
+        data = await request.json()
+        model_name = (data.get("model") or data.get("name") or "").split(":")[0]
+        
+        statuses = [{"status": "pulling manifest"}]
+        statuses += [
+            {"status": "downloading stub", "digest": "stub", "total": 100, "completed": completed}
+            for completed in (0, 25, 50, 75, 100)
+        ]
+        statuses += [{"status": "verifying sha256 digest"}, {"status": "writing manifest"}, {"status": "success"}]
+        
+        if not data.get("stream", True):
+            await asyncio.sleep(self.pull_latency)
+            self._add_model(model_name)
+            return web.json_response({"status": "success"})
+        
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for status in statuses:
+            if self.pull_latency:
+                await asyncio.sleep(self.pull_latency / len(statuses))
+            if status["status"] == "success":
+                self._add_model(model_name)
+            await response.write((json.dumps(status) + "\n").encode())
+        await response.write_eof()
+        return response
+    
+    def _add_model(self, model_name: str):
+        if model_name and model_name not in self.models:
+            self.models.append(model_name)
+    
+    async def _respond(self, request: web.Request, data: dict, make_body) -> web.StreamResponse:
+        """Send either a single JSON body or newline-delimited JSON chunks"""
+        start = time.perf_counter()
+        model_name = data.get("model")
+        if model_name not in self.models and (model_name or "").split(":")[0] not in self.models:
+            return web.json_response({"error": f"model '{model_name}' not found"}, status=404)
+        
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        load_duration = 0.0
+        if model_name not in self._loaded_models:
+            self._loaded_models.add(model_name)
+            load_duration = self.load_latency
+            await asyncio.sleep(load_duration)
+        
+        if self.first_token_latency:
+            await asyncio.sleep(self.first_token_latency)
+        
+        base = {"model": model_name, "created_at": datetime.now().isoformat()}
+        text = self._format_text(data.get("format"))
+        tokens = self._tokens(text)
+        
+        def timings() -> dict:
+            # Ollama reports durations in nanoseconds
+            return {
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+                "load_duration": int(load_duration * 1e9),
+                "prompt_eval_count": len(json.dumps(data.get("messages") or data.get("prompt", ""))) // 4,
+                "prompt_eval_duration": int(self.first_token_latency * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(self.token_latency * len(tokens) * 1e9)
+            }
+        
+        if not data.get("stream", True):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency * len(tokens))
+            return web.json_response({**base, **make_body(text, True), **timings()})
+        
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for token in tokens:
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            await response.write((json.dumps({**base, **make_body(token, False)}) + "\n").encode())
+        await response.write((json.dumps({**base, **make_body("", True), **timings()}) + "\n").encode())
+        await response.write_eof()
+        return response
+    
+    def _tokens(self, text: str = None) -> List[str]:
+        """Split the canned response into word-sized tokens"""
+        words = (text if text is not None else self.response_text).split(" ")
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+    
+    def _format_text(self, response_format) -> str:
+        """Canned response honouring the request's structured-output format"""
+        if not response_format:
+            return self.response_text
+        if response_format == "json":
+            return json.dumps({"response": self.response_text})
+        return json.dumps(self._schema_instance(response_format))
+    
+    def _schema_instance(self, schema: dict):
+        """Smallest value that satisfies a (simple) JSON schema"""
+        if "enum" in schema:
+            return schema["enum"][0]
+        schema_type = schema.get("type")
+        if schema_type == "object":
+            properties = schema.get("properties", {})
+            return {key: self._schema_instance(properties.get(key, {})) for key in schema.get("required", [])}
+        if schema_type == "array":
+            return []
+        if schema_type == "string":
+            return self.response_text.split(" ")[0]
+        if schema_type == "integer":
+            return 1
+        if schema_type == "number":
+            return 0.5
+        if schema_type == "boolean":
+            return False
+        return None
+
+async def _serve_forever(server: OllamaStubServer):
+    await server.start()
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each completion")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds to wait per generated token")
+    parser.add_argument("--first-token-latency", type=float, default=0.0, help="Seconds of prefill before the first token")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Seconds to load a model on its first request")
+    parser.add_argument("--pull-latency", type=float, default=0.0, help="Seconds a model pull takes")
+    parser.add_argument("--models", nargs="+", default=None, help="Models reported by /api/tags")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    server = OllamaStubServer(
+        host=args.host,
+        port=args.port,
+        models=args.models,
+        latency=args.latency,
+        token_latency=args.token_latency,
+        first_token_latency=args.first_token_latency,
+        load_latency=args.load_latency,
+        pull_latency=args.pull_latency
+    )
+    
+    try:
+        asyncio.run(_serve_forever(server))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
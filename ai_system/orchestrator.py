@@ -4,26 +4,52 @@ Main orchestrator that coordinates LLMs, MCP tools, and RAG memory
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
 import uuid
 
 try:
     from .config import config
     from .llm_manager import llm_manager
+    from .llm_scheduler import RequestPriority
+    from .loop_monitor import loop_monitor
     from .mcp_manager import mcp_manager
-    from .rag_memory import rag_memory
+    from .prompt_builder import PromptBuilder, MESSAGE_OVERHEAD_TOKENS, estimate_messages_tokens
+    from .rag_memory import rag_memory, with_embedding_scope
 except ImportError:
     from config import config
     from llm_manager import llm_manager
+    from llm_scheduler import RequestPriority
+    from loop_monitor import loop_monitor
     from mcp_manager import mcp_manager
-    from rag_memory import rag_memory
+    from prompt_builder import PromptBuilder, MESSAGE_OVERHEAD_TOKENS, estimate_messages_tokens
+    from rag_memory import rag_memory, with_embedding_scope
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Static system prompt shared by every session; keep per-request values out of it
+ORCHESTRATOR_SYSTEM_PROMPT = """You are an advanced AI assistant with access to local language models, various tools via Model Context Protocol (MCP), and a long-term memory system.
+
+CAPABILITIES:
+1. Access to local LLMs for reasoning and generation
+2. MCP tools for various tasks (filesystem, web search, stock data, etc.)
+3. RAG-based long-term memory for context retrieval
+4. Conversation history and context management
+
+INSTRUCTIONS:
+- Provide helpful, accurate, and contextual responses
+- Use memory context when relevant
+- Suggest or mention tools when they would be useful
+- Be conversational and maintain context across the session
+- If you need to use a tool, mention it clearly in your response
+
+Each user message starts with the memory context and tools available for it, followed by the user's query.
+"""
+
 class ConversationSession:
     """Represents a conversation session with memory and context"""
     
@@ -68,7 +94,14 @@ class AIOrchestrator:
             # Initialize all components
             await llm_manager.initialize()
             await mcp_manager.initialize()
-            await rag_memory.initialize()
+            await rag_memory.acquire()
+            
+            # Embed response-cache queries through RAG memory's encode cache and batching
+            if rag_memory.embedding_model is not None:
+                llm_manager.response_cache.set_encoder(rag_memory)
+            
+            # Watch for blocking work stalling the event loop
+            loop_monitor.start()
             
             self.system_initialized = True
             logger.info("AI System initialized successfully!")
@@ -88,6 +121,7 @@ class AIOrchestrator:
         logger.info(f"Created new session: {session.session_id}")
         return session.session_id
     
+    @with_embedding_scope
     async def process_query(
         self,
         query: str,
@@ -95,9 +129,16 @@ class AIOrchestrator:
         model_name: str = None,
         use_tools: bool = True,
         use_memory: bool = True,
-        temperature: float = None
+        temperature: float = None,
+        token_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Process a user query with full AI capabilities"""
+        """Process a user query with full AI capabilities
+        
+        If token_callback is given, responses are streamed and the callback is
+        awaited with {"stage": "initial" | "final", "token": str} for every
+        token as it arrives. The "final" stage replaces the initial text once
+        tool results have been incorporated.
+        """
         
         if not self.system_initialized:
             await self.initialize()
@@ -126,18 +167,24 @@ class AIOrchestrator:
                 available_tools = await self._get_relevant_tools(query)
             
             # Step 3: Build enhanced prompt with context
-            enhanced_prompt = await self._build_enhanced_prompt(
+            enhanced_prompt, prompt_report = await self._build_enhanced_prompt(
                 query, 
                 session, 
                 relevant_context, 
-                available_tools
+                available_tools,
+                model_name
             )
             
             # Step 4: Generate initial response
-            initial_response = await llm_manager.chat_completion(
-                messages=enhanced_prompt,
-                model_name=model_name,
-                temperature=temperature
+            initial_response = await self._complete(
+                enhanced_prompt,
+                model_name,
+                temperature,
+                token_callback,
+                stage="initial",
+                context_key=session_id if config.reuse_generate_context else None,
+                cache_query=query,
+                cache_context=self._cache_context(enhanced_prompt, relevant_context, available_tools)
             )
             
             # Step 5: Execute tools if mentioned in response
@@ -154,7 +201,9 @@ class AIOrchestrator:
                     initial_response,
                     tool_results,
                     model_name,
-                    temperature
+                    temperature,
+                    token_callback,
+                    context_key=session_id if config.reuse_generate_context else None
                 )
             
             # Step 7: Add assistant message to session and memory
@@ -177,6 +226,7 @@ class AIOrchestrator:
                 "context_used": relevant_context,
                 "tools_executed": tool_results,
                 "model_used": model_name or config.default_llm,
+                "prompt_tokens": prompt_report,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -230,59 +280,89 @@ class AIOrchestrator:
         query: str,
         session: ConversationSession,
         relevant_context: List[Dict[str, Any]],
-        available_tools: List[Dict[str, Any]]
-    ) -> List[Dict[str, str]]:
-        """Build an enhanced prompt with context and tool information"""
-        
-        messages = []
-        
-        # System prompt
-        system_prompt = f"""You are an advanced AI assistant with access to local language models, various tools via Model Context Protocol (MCP), and a long-term memory system.
-
-Current time: {datetime.now().isoformat()}
-Session ID: {session.session_id}
-
-CAPABILITIES:
-1. Access to local LLMs for reasoning and generation
-2. MCP tools for various tasks (filesystem, web search, stock data, etc.)
-3. RAG-based long-term memory for context retrieval
-4. Conversation history and context management
-
-MEMORY CONTEXT:
-"""
-        
+        available_tools: List[Dict[str, Any]],
+        model_name: str = None
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Build an enhanced prompt with context and tool information
+        
+        The prompt is fitted to the model's context window: older history is
+        dropped first, then memory snippets and tool descriptions are cut
+        down. Returns the messages and a per-section token report.
+        """
+        
+        builder = PromptBuilder.for_model(config.get_llm_config(model_name))
+        
+        # The system prompt only changes with the date, so the server can reuse
+        # the KV cache for it and the history before it. The date lives here
+        # rather than in the final user message, which must depend on nothing
+        # but this turn's query and context for the response cache to match it.
+        system_prompt = f"{ORCHESTRATOR_SYSTEM_PROMPT}\nToday's date: {datetime.now().strftime('%Y-%m-%d')}\n"
+        builder.add("system", system_prompt, required=True, overhead=MESSAGE_OVERHEAD_TOKENS)
+        
+        memory_context = "MEMORY CONTEXT:\n"
         if relevant_context:
-            system_prompt += "Relevant information from memory:\n"
+            memory_context += "Relevant information from memory:\n"
             for i, doc in enumerate(relevant_context[:3], 1):
-                system_prompt += f"{i}. {doc['content'][:200]}...\n"
+                memory_context += f"{i}. {doc['content'][:200]}...\n"
         else:
-            system_prompt += "No relevant context found in memory.\n"
+            memory_context += "No relevant context found in memory.\n"
+        builder.add("memory", memory_context, priority=2)
         
+        tools_context = ""
         if available_tools:
-            system_prompt += f"\nAVAILABLE TOOLS:\n"
+            tools_context += f"\nAVAILABLE TOOLS:\n"
             for tool in available_tools:
-                system_prompt += f"- {tool['name']} ({tool['server']}): {tool['description']}\n"
-            system_prompt += "\nYou can mention tools in your response and I will execute them for you.\n"
-        
-        system_prompt += """
-INSTRUCTIONS:
-- Provide helpful, accurate, and contextual responses
-- Use memory context when relevant
-- Suggest or mention tools when they would be useful
-- Be conversational and maintain context across the session
-- If you need to use a tool, mention it clearly in your response
-"""
-        
-        messages.append({"role": "system", "content": system_prompt})
-        
-        # Add recent conversation history
-        recent_history = session.get_recent_history(max_messages=6)
-        messages.extend(recent_history[:-1])  # Exclude the current query
-        
-        # Add current query
-        messages.append({"role": "user", "content": query})
-        
-        return messages
+                tools_context += f"- {tool['name']} ({tool['server']}): {tool['description']}\n"
+            tools_context += "\nYou can mention tools in your response and I will execute them for you.\n"
+        builder.add("tools", tools_context, priority=3)
+        
+        # Recent conversation history, oldest first so it is the first to go
+        recent_history = session.get_recent_history(max_messages=6)[:-1]  # Exclude the current query
+        for i, message in enumerate(recent_history):
+            builder.add(f"history_{i}", message["content"], priority=1, overhead=MESSAGE_OVERHEAD_TOKENS)
+        
+        request_context = f"""
+USER QUERY:
+{query}"""
+        builder.add("query", request_context, required=True, overhead=MESSAGE_OVERHEAD_TOKENS)
+        builder.build()
+        
+        messages = [{"role": "system", "content": builder.text("system")}]
+        
+        for i, message in enumerate(recent_history):
+            content = builder.text(f"history_{i}")
+            if content:
+                messages.append({"role": message["role"], "content": content})
+        
+        # Add current query with this turn's memory and tool context
+        messages.append({
+            "role": "user",
+            "content": builder.text("memory") + builder.text("tools") + builder.text("query")
+        })
+        
+        return messages, builder.report()
+    
+    @staticmethod
+    def _cache_context(
+        messages: List[Dict[str, str]],
+        relevant_context: List[Dict[str, Any]],
+        available_tools: List[Dict[str, Any]]
+    ) -> str:
+        """Hash of what shapes the answer besides the query: prior turns, retrieved memory and tools
+        
+        Stored conversation messages are left out: every answered query is
+        written back to memory, so including them would change the key the
+        next time the same question is asked.
+        """
+        payload = json.dumps([
+            [(message["role"], message["content"]) for message in messages[1:-1]],
+            [
+                doc["content"] for doc in relevant_context[:3]
+                if doc.get("metadata", {}).get("type") != "conversation_message"
+            ],
+            sorted(tool["name"] for tool in available_tools)
+        ], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
     
     async def _execute_mentioned_tools(
         self,
@@ -370,7 +450,9 @@ INSTRUCTIONS:
         initial_response: str,
         tool_results: List[Dict[str, Any]],
         model_name: str = None,
-        temperature: float = None
+        temperature: float = None,
+        token_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        context_key: str = None
     ) -> str:
         """Generate final response incorporating tool results"""
         
@@ -382,19 +464,138 @@ INSTRUCTIONS:
             else:
                 tool_context += f"- {result['name']}: {json.dumps(result['result'], indent=2)}\n"
         
+        # Tool output can be large; cut it to whatever room the prompt has left
+        builder = PromptBuilder.for_model(config.get_llm_config(model_name))
+        builder.budget_tokens -= estimate_messages_tokens(original_prompt)
+        builder.add("initial_response", initial_response, required=True, overhead=MESSAGE_OVERHEAD_TOKENS)
+        builder.add("tool_results", tool_context, overhead=MESSAGE_OVERHEAD_TOKENS)
+        builder.build()
+        
         final_prompt = original_prompt + [
             {"role": "assistant", "content": initial_response},
-            {"role": "user", "content": f"{tool_context}\nPlease provide a comprehensive response incorporating these tool results."}
+            {"role": "user", "content": f"{builder.text('tool_results')}\nPlease provide a comprehensive response incorporating these tool results."}
         ]
         
-        final_response = await llm_manager.chat_completion(
-            messages=final_prompt,
-            model_name=model_name,
-            temperature=temperature
+        final_response = await self._complete(
+            final_prompt,
+            model_name,
+            temperature,
+            token_callback,
+            stage="final",
+            context_key=context_key
         )
         
         return final_response
     
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        model_name: str,
+        temperature: float,
+        token_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        stage: str,
+        context_key: str = None,
+        cache_query: str = None,
+        cache_context: str = None
+    ) -> str:
+        """Run a chat completion, forwarding tokens to the callback when streaming
+        
+        With a context_key the turn goes through /api/generate and reuses the
+        conversation's context tokens (see config.reuse_generate_context).
+        cache_query and cache_context are what the response cache matches on.
+        """
+        if context_key is not None:
+            return await self._complete_with_context(
+                messages, model_name, temperature, token_callback, stage, context_key
+            )
+        
+        if token_callback is None:
+            return await llm_manager.chat_completion(
+                messages=messages,
+                model_name=model_name,
+                temperature=temperature,
+                priority=RequestPriority.INTERACTIVE,
+                deadline=config.interactive_queue_deadline,
+                cache_query=cache_query,
+                cache_context=cache_context
+            )
+        
+        return await self._forward_tokens(
+            llm_manager.stream_chat(
+                messages=messages,
+                model_name=model_name,
+                temperature=temperature,
+                priority=RequestPriority.INTERACTIVE,
+                deadline=config.interactive_queue_deadline,
+                cache_query=cache_query,
+                cache_context=cache_context
+            ),
+            token_callback,
+            stage
+        )
+    
+    async def _complete_with_context(
+        self,
+        messages: List[Dict[str, str]],
+        model_name: str,
+        temperature: float,
+        token_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        stage: str,
+        context_key: str
+    ) -> str:
+        """Generate a turn on top of the conversation's Ollama context tokens
+        
+        Follow-up turns only send the newest message; the history is already
+        in the context. Without stored context (first turn, expired or reset)
+        the system prompt and history are sent as a transcript.
+        """
+        system_prompt = messages[0]["content"] if messages and messages[0]["role"] == "system" else None
+        turns = messages[1:] if system_prompt is not None else messages
+        
+        if llm_manager.has_generate_context(context_key, model_name):
+            turns = turns[-1:]
+        
+        if len(turns) == 1:
+            prompt = turns[0]["content"]
+        else:
+            prompt = "\n\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+        
+        response = await llm_manager.generate_response(
+            prompt=prompt,
+            model_name=model_name,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            stream=token_callback is not None,
+            priority=RequestPriority.INTERACTIVE,
+            deadline=config.interactive_queue_deadline,
+            context_key=context_key
+        )
+        
+        if token_callback is None:
+            return response
+        return await self._forward_tokens(response, token_callback, stage)
+    
+    async def _forward_tokens(
+        self,
+        token_stream: AsyncIterator[str],
+        token_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        stage: str
+    ) -> str:
+        """Collect a token stream, forwarding each token to the callback"""
+        tokens = []
+        async for token in token_stream:
+            tokens.append(token)
+            if token_callback is None:
+                continue
+            try:
+                await token_callback({"stage": stage, "token": token})
+            except Exception as e:
+                # A disconnected client must not abort generation; stop forwarding
+                logger.warning(f"Token callback failed, no longer streaming: {e}")
+                token_callback = None
+        
+        return "".join(tokens)
+    
     async def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get information about a session"""
         if session_id not in self.active_sessions:
@@ -429,6 +630,8 @@ INSTRUCTIONS:
                 session.used_tools.clear()
                 logger.info(f"Cleared active session data for {session_id}")
             
+            llm_manager.clear_generate_context(session_id)
+            
             # Clear from persistent memory
             cleared = await rag_memory.clear_conversation_history(session_id)
             
@@ -457,7 +660,9 @@ INSTRUCTIONS:
                 "components": {
                     "llm_manager": {
                         "available_models": len(llm_models),
-                        "models": [model["name"] for model in llm_models if model["available"]]
+                        "models": [model["name"] for model in llm_models if model["available"]],
+                        "response_cache": llm_manager.response_cache.get_stats(),
+                        "scheduler": llm_manager.scheduler.get_stats()
                     },
                     "mcp_manager": {
                         "total_servers": len(mcp_status),
@@ -466,6 +671,7 @@ INSTRUCTIONS:
                     },
                     "rag_memory": memory_stats
                 },
+                "event_loop": loop_monitor.get_stats(),
                 "active_sessions": len(self.active_sessions)
             }
             
@@ -485,6 +691,21 @@ INSTRUCTIONS:
         except Exception as e:
             logger.error(f"Error during MCP shutdown: {e}")
         
+        try:
+            # Close pooled LLM connections
+            await llm_manager.shutdown()
+        except Exception as e:
+            logger.error(f"Error during LLM manager shutdown: {e}")
+        
+        try:
+            # Let go of the shared memory system; closed once no component uses it
+            if self.system_initialized:
+                await rag_memory.release()
+        except Exception as e:
+            logger.error(f"Error during RAG memory shutdown: {e}")
+        
+        await loop_monitor.stop()
+        
         try:
             # Clear active sessions
             self.active_sessions.clear()
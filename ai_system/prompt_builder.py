@@ -0,0 +1,162 @@
+"""
+Prompt Builder
+Token-budgeted prompt assembly so prompts stay within a model's context window
+"""
+
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    from .config import LLMConfig
+except ImportError:
+    from config import LLMConfig
+
+logger = logging.getLogger(__name__)
+
+# CJK ideographs, kana, hangul and full-width forms are roughly one token each
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separator tokens added per chat message
+TRUNCATION_MARKER = "..."
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: one per CJK character, one per ~4 other characters"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """Token estimate for a chat message list"""
+    return sum(estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+@dataclass
+class PromptSection:
+    """A named piece of a prompt competing for the token budget
+    
+    Sections with a lower priority are cut first; among equal priorities
+    the one added first (e.g. the oldest history message) goes first.
+    Required sections are never cut.
+    """
+    name: str
+    content: str
+    priority: int = 0
+    required: bool = False
+    min_tokens: int = 32  # below this a section is dropped rather than truncated
+    overhead: int = 0  # fixed tokens the section costs while present
+    original_tokens: int = 0
+    status: str = "kept"
+    
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.content) + self.overhead if self.content else 0
+
+class PromptBuilder:
+    """Fits prompt sections into a token budget
+    
+    Usage:
+        builder = PromptBuilder.for_model(llm_config)
+        builder.add("system", system_text, required=True)
+        builder.add("memory", memory_text, priority=2)
+        builder.build()
+        builder.text("memory")  # possibly truncated, "" if dropped
+        builder.report()        # tokens used per section
+    """
+    
+    def __init__(self, budget_tokens: int):
+        self.budget_tokens = max(0, budget_tokens)
+        self._sections: Dict[str, PromptSection] = {}
+    
+    @classmethod
+    def for_model(cls, llm_config: LLMConfig, max_tokens: Optional[int] = None) -> "PromptBuilder":
+        """Budget is the context window minus the tokens reserved for the reply"""
+        return cls(llm_config.context_length - (max_tokens or llm_config.max_tokens))
+    
+    def add(
+        self,
+        name: str,
+        content: str,
+        priority: int = 0,
+        required: bool = False,
+        min_tokens: int = 32,
+        overhead: int = 0
+    ) -> PromptSection:
+        section = PromptSection(
+            name=name,
+            content=content or "",
+            priority=priority,
+            required=required,
+            min_tokens=min_tokens,
+            overhead=overhead
+        )
+        section.original_tokens = section.tokens
+        self._sections[name] = section
+        return section
+    
+    @property
+    def total_tokens(self) -> int:
+        return sum(section.tokens for section in self._sections.values())
+    
+    def build(self) -> "PromptBuilder":
+        """Truncate or drop the lowest-value sections until the prompt fits"""
+        overflow = self.total_tokens - self.budget_tokens
+        if overflow <= 0:
+            return self
+        
+        candidates = [section for section in self._sections.values() if not section.required]
+        # Stable sort keeps insertion order within a priority
+        for section in sorted(candidates, key=lambda section: section.priority):
+            if overflow <= 0:
+                break
+            if not section.content:
+                continue
+            
+            before = section.tokens
+            target = before - section.overhead - overflow
+            if target >= section.min_tokens:
+                section.content = self._truncate(section.content, target)
+                section.status = "truncated"
+            else:
+                section.content = ""
+                section.status = "dropped"
+            overflow -= before - section.tokens
+        
+        if overflow > 0:
+            logger.warning(
+                f"Required prompt sections exceed the budget by {overflow} tokens "
+                f"({self.total_tokens}/{self.budget_tokens})"
+            )
+        return self
+    
+    def text(self, name: str) -> str:
+        section = self._sections.get(name)
+        return section.content if section else ""
+    
+    def report(self) -> Dict[str, Any]:
+        """Token usage per section, for logging and API responses"""
+        return {
+            "budget": self.budget_tokens,
+            "total_tokens": self.total_tokens,
+            "over_budget": self.total_tokens > self.budget_tokens,
+            "sections": {
+                name: {
+                    "tokens": section.tokens,
+                    "original_tokens": section.original_tokens,
+                    "status": section.status
+                }
+                for name, section in self._sections.items()
+            }
+        }
+    
+    @staticmethod
+    def _truncate(text: str, max_tokens: int) -> str:
+        """Keep the head of text within max_tokens, marking the cut"""
+        limit = max(0, max_tokens - estimate_tokens(TRUNCATION_MARKER))
+        # Start from a proportional guess and shrink until the estimate fits
+        end = int(len(text) * limit / max(1, estimate_tokens(text)))
+        while end > 0 and estimate_tokens(text[:end]) > limit:
+            end -= max(1, end // 20)
+        return text[:end].rstrip() + TRUNCATION_MARKER
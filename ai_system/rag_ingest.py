@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+RAG Bulk Ingestion
+Streams large document sets into RAG memory
+
+Documents are read and chunked in a pipeline. Chunks are embedded in large
+batches by worker processes, each holding its own copy of the embedding
+model, while earlier batches are being written. Every batch is one Chroma
+add and one SQLite transaction. Progress is checkpointed after each batch,
+so an interrupted run resumes where it stopped.
+
+Accepts .txt and .md files (one document each) and .jsonl files with one
+{"content": ..., "metadata": {...}, "doc_id": ...} record per line;
+directories are searched recursively. Extract PDFs to text first.
+Ingesting a file again replaces everything previously ingested from it.
+
+    python rag_ingest.py manuals/ --type equipment_manual --workers 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .config import config
+    from .rag_memory import Document, RAGMemorySystem, rag_memory
+except ImportError:
+    from config import config
+    from rag_memory import Document, RAGMemorySystem, rag_memory
+
+logger = logging.getLogger(__name__)
+
+TEXT_SUFFIXES = {".txt", ".md"}
+RECORD_SUFFIXES = {".jsonl"}
+
+# Embedding model of each worker process
+_worker_model = None
+
+def _init_worker(model_name: str):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=64, show_progress_bar=False))
+
+def _document_id(source: str, index: int) -> str:
+    # Stable across runs, so re-ingesting a source overwrites its documents in place
+    return "doc_" + hashlib.sha1(f"{source}#{index}".encode("utf-8")).hexdigest()[:16]
+
+def find_sources(paths: List[str]) -> List[Path]:
+    """Ingestible files under the given paths, in a stable order"""
+    sources = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            sources.extend(sorted(
+                child for child in path.rglob("*")
+                if child.is_file() and child.suffix.lower() in TEXT_SUFFIXES | RECORD_SUFFIXES
+            ))
+        else:
+            sources.append(path)
+    return sources
+
+def iter_records(sources: List[Path], doc_type: str) -> Iterator[Dict[str, Any]]:
+    """Document dicts for RAGMemorySystem.prepare_documents(), read lazily
+    
+    The first record of each file carries "replaces_source", the file
+    whose earlier documents must be deleted before it is written.
+    """
+    for source in sources:
+        first = {"replaces_source": str(source)}
+        if source.suffix.lower() in RECORD_SUFFIXES:
+            with open(source, encoding="utf-8") as f:
+                for line_number, line in enumerate(f):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    metadata = {"type": doc_type, "source": str(source), **record.get("metadata", {})}
+                    yield {
+                        "content": record["content"],
+                        "metadata": metadata,
+                        "doc_id": record.get("doc_id") or _document_id(str(source), line_number),
+                        **first
+                    }
+                    first = {}
+            if first:
+                # Nothing left in the file; still clear what it held before
+                yield {"content": "", "doc_id": _document_id(str(source), 0), **first}
+        else:
+            yield {
+                "content": source.read_text(encoding="utf-8", errors="replace"),
+                "metadata": {"type": doc_type, "source": str(source), "title": source.stem},
+                "doc_id": _document_id(str(source), 0),
+                **first
+            }
+
+@dataclass
+class IngestCheckpoint:
+    """Records of the input stream already written, saved after each batch"""
+    inputs: str  # digest of the source list, so a checkpoint is never applied to other inputs
+    records_done: int = 0
+    documents: int = 0
+    chunks: int = 0
+    completed: bool = False
+    
+    @classmethod
+    def load(cls, path: Path, sources: List[Path]) -> "IngestCheckpoint":
+        inputs = hashlib.sha1("\n".join(map(str, sources)).encode("utf-8")).hexdigest()
+        if not path.exists():
+            return cls(inputs=inputs)
+        checkpoint = cls(**json.loads(path.read_text()))
+        if checkpoint.inputs != inputs:
+            raise Exception(f"Checkpoint {path} belongs to different inputs; pass --restart to discard it")
+        return checkpoint
+    
+    def save(self, path: Path):
+        # Replace atomically so a crash never leaves a partial checkpoint
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(asdict(self)))
+        os.replace(tmp_path, path)
+
+@dataclass
+class IngestProgress:
+    documents: int = 0
+    chunks: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    
+    def report(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "documents": self.documents,
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 1),
+            "docs_per_sec": round(self.documents / elapsed, 1) if elapsed else 0.0,
+            "chunks_per_sec": round(self.chunks / elapsed, 1) if elapsed else 0.0
+        }
+
+class BulkIngester:
+    """Pipelines chunking, multi-process encoding and batched writes
+    
+    Up to max_in_flight batches are being encoded at once; batches are
+    written strictly in input order so the checkpoint is always a prefix of
+    the input stream.
+    """
+    
+    def __init__(
+        self,
+        memory: RAGMemorySystem,
+        workers: int = 2,
+        batch_docs: int = 64,
+        max_in_flight: int = None
+    ):
+        self.memory = memory
+        self.workers = workers
+        self.batch_docs = batch_docs
+        self.max_in_flight = max_in_flight or max(2, workers * 2)
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    def __enter__(self) -> "BulkIngester":
+        if self.workers > 0:
+            # spawn: the parent already runs executor threads, which fork would copy mid-state
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory.config.embedding_model,)
+            )
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+    
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._pool is None:
+            return await self.memory.encode_async(texts)
+        
+        # One slice per worker so a single batch keeps every process busy
+        loop = asyncio.get_running_loop()
+        size = -(-len(texts) // self.workers)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self._pool, _encode_in_worker, texts[start:start + size])
+            for start in range(0, len(texts), size)
+        ))
+        return np.concatenate(parts)
+    
+    async def ingest(
+        self,
+        records: Iterator[Dict[str, Any]],
+        checkpoint: IngestCheckpoint,
+        checkpoint_path: Path
+    ) -> Dict[str, Any]:
+        progress = IngestProgress()
+        in_flight: Deque[Tuple[int, List[str], List[Tuple[Document, List[str]]], asyncio.Future]] = deque()
+        
+        async def write_oldest():
+            record_count, replaced_sources, batch, encoding = in_flight.popleft()
+            if replaced_sources:
+                # Records of an earlier run that a shorter file no longer has
+                await self.memory.delete_sources(replaced_sources)
+            if batch:
+                await self.memory.write_documents(batch, await encoding)
+            chunk_count = sum(len(chunks) for _, chunks in batch)
+            
+            checkpoint.records_done += record_count
+            checkpoint.documents += len(batch)
+            checkpoint.chunks += chunk_count
+            checkpoint.save(checkpoint_path)
+            
+            progress.documents += len(batch)
+            progress.chunks += chunk_count
+            report = progress.report()
+            logger.info(
+                f"Ingested {checkpoint.documents} documents ({checkpoint.chunks} chunks), "
+                f"{report['docs_per_sec']} docs/sec"
+            )
+        
+        records = itertools.islice(records, checkpoint.records_done, None)
+        try:
+            while True:
+                batch_records = list(itertools.islice(records, self.batch_docs))
+                if not batch_records:
+                    break
+                
+                batch = self.memory.prepare_documents(batch_records)
+                texts = [chunk for _, chunks in batch for chunk in chunks]
+                encoding = asyncio.ensure_future(self._encode(texts)) if texts else None
+                replaced_sources = [record["replaces_source"] for record in batch_records if "replaces_source" in record]
+                in_flight.append((len(batch_records), replaced_sources, batch, encoding))
+                
+                if len(in_flight) >= self.max_in_flight:
+                    await write_oldest()
+            
+            while in_flight:
+                await write_oldest()
+        finally:
+            for _, _, _, encoding in in_flight:
+                if encoding is not None:
+                    encoding.cancel()
+        
+        checkpoint.completed = True
+        checkpoint.save(checkpoint_path)
+        return progress.report()
+
+async def _ingest(args) -> Dict[str, Any]:
+    sources = find_sources(args.paths)
+    checkpoint_path = Path(args.checkpoint)
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    checkpoint = IngestCheckpoint.load(checkpoint_path, sources)
+    if checkpoint.completed:
+        logger.info(f"Checkpoint {checkpoint_path} is complete; pass --restart to ingest again")
+        return {"documents": 0, "chunks": 0}
+    if checkpoint.records_done:
+        logger.info(f"Resuming after {checkpoint.records_done} records")
+    
+    memory = await rag_memory.acquire()
+    try:
+        with BulkIngester(memory, args.workers, args.batch_docs) as ingester:
+            return await ingester.ingest(iter_records(sources, args.type), checkpoint, checkpoint_path)
+    finally:
+        await memory.release()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load documents into RAG memory")
+    parser.add_argument("paths", nargs="+", help="Files or directories to ingest")
+    parser.add_argument("--type", default="document", help="Metadata type stored with each document")
+    parser.add_argument("--workers", type=int, default=2, help="Encoding processes; 0 encodes in this process")
+    parser.add_argument("--batch-docs", type=int, default=64, help="Documents per encode and write batch")
+    parser.add_argument("--checkpoint", default=str(config.data_dir / "ingest_checkpoint.json"))
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and start over")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(_ingest(args)))
+
+if __name__ == "__main__":
+    main()
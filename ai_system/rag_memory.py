@@ -4,24 +4,41 @@ Implements Retrieval-Augmented Generation for long-term memory
 """
 
 import asyncio
+import contextvars
+import functools
+import hashlib
 import json
 import logging
-import sqlite3
+import random
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
 
 try:
-    from .config import RAGConfig, config
+    from .config import MemoryWriteQueueConfig, RAGConfig, config
+    from .sqlite_pool import SQLitePool
+    from .vector_store import VectorStore, create_vector_store
 except ImportError:
-    from config import RAGConfig, config
+    from config import MemoryWriteQueueConfig, RAGConfig, config
+    from sqlite_pool import SQLitePool
+    from vector_store import VectorStore, create_vector_store
 
 logger = logging.getLogger(__name__)
 
+CHROMA_MAX_BATCH = 4096
+
+# Vectors encoded during the current request, shared by every component that
+# handles it; None outside an embedding_scope()
+_request_embeddings: contextvars.ContextVar[Optional[Dict[str, np.ndarray]]] = contextvars.ContextVar(
+    "request_embeddings", default=None
+)
+
 class Document:
     """Represents a document in the memory system"""
     
@@ -48,111 +65,436 @@ class Document:
             "created_at": self.created_at
         }
 
+# Embedding models and vector stores are loaded once per process and shared
+# by every RAGMemorySystem using them: key -> [object, reference count]
+_shared_resources: Dict[Tuple[str, str], List[Any]] = {}
+_shared_lock = threading.Lock()
+
+def _acquire_shared(kind: str, key: str, factory) -> Any:
+    with _shared_lock:
+        entry = _shared_resources.get((kind, key))
+        if entry is None:
+            entry = [factory(), 0]
+            _shared_resources[(kind, key)] = entry
+        else:
+            logger.info(f"Reusing loaded {kind}: {key}")
+        entry[1] += 1
+        return entry[0]
+
+def _release_shared(kind: str, key: str) -> Any:
+    """Drop a reference; returns the object once its last user has released it"""
+    with _shared_lock:
+        entry = _shared_resources.get((kind, key))
+        if entry is None:
+            return None
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _shared_resources[(kind, key)]
+            logger.info(f"Released {kind}: {key}")
+            return entry[0]
+        return None
+
+def with_embedding_scope(func):
+    """Run an async request handler inside RAGMemorySystem.embedding_scope()"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with RAGMemorySystem.embedding_scope():
+            return await func(*args, **kwargs)
+    return wrapper
+
 class RAGMemorySystem:
-    """RAG-based long-term memory system"""
+    """RAG-based long-term memory system
+    
+    Components should use the module-level rag_memory and call acquire() /
+    release() rather than constructing their own: initialization runs once
+    and the system is closed when the last user releases it. Instances that
+    are constructed separately still share the embedding model and vector
+    store for the same model name, backend and path.
+    
+    Nothing blocking runs on the event loop. The embedding model runs on
+    its own thread, where concurrent encode_async() callers are batched
+    into one model call. Chroma and SQLite work runs on a single database
+    thread, which also serializes writes, over a persistent WAL-mode
+    SQLite connection (see SQLitePool).
+    """
     
     def __init__(self, rag_config: RAGConfig = None):
         self.config = rag_config or config.rag_config
         self.embedding_model = None
-        self.vector_db = None
+        self.vector_store: Optional[VectorStore] = None
         self.metadata_db_path = Path(self.config.vector_db_path) / "metadata.db"
+        self.metadata_db = SQLitePool(
+            self.metadata_db_path,
+            cache_mb=self.config.sqlite_cache_mb,
+            mmap_mb=self.config.sqlite_mmap_mb,
+            synchronous=self.config.sqlite_synchronous
+        )
         self.collection_name = "memory_documents"
+        self.initialized = False
+        self._refcount = 0
+        self._init_lock: Optional[asyncio.Lock] = None
+        self._embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._embedding_lock = threading.Lock()
+        self.embedding_stats = {"encode_calls": 0, "texts_encoded": 0, "request_hits": 0, "cache_hits": 0}
+        # Started by initialize() and shut down by close()
+        self._encode_executor: Optional[ThreadPoolExecutor] = None
+        self._db_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_encodes: List[Tuple[List[str], asyncio.Future]] = []
+        self._pending_texts = 0
+        self._encode_timer: Optional[asyncio.TimerHandle] = None
+        self._encode_loop: Optional[asyncio.AbstractEventLoop] = None
+        # doc_id -> [retrievals not yet written, last retrieval time]
+        self._pending_access: Dict[str, List[Any]] = {}
+        self._access_timer: Optional[asyncio.TimerHandle] = None
+        self._access_flush: Optional[asyncio.Task] = None
+        self._access_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._access_inline = False
         
     async def initialize(self):
-        """Initialize the RAG memory system"""
-        logger.info("Initializing RAG Memory System...")
-        
-        # Create directories
-        Path(self.config.vector_db_path).mkdir(parents=True, exist_ok=True)
-        
-        # Initialize embedding model
-        await self._load_embedding_model()
+        """Initialize the RAG memory system; later calls return immediately"""
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
         
-        # Initialize vector database
-        await self._initialize_vector_db()
-        
-        # Initialize metadata database
-        await self._initialize_metadata_db()
+        async with self._init_lock:
+            if self.initialized:
+                return
+            
+            logger.info("Initializing RAG Memory System...")
+            self._start_executors()
+            
+            # Create directories
+            Path(self.config.vector_db_path).mkdir(parents=True, exist_ok=True)
+            
+            # Initialize embedding model
+            await self._load_embedding_model()
+            
+            # Initialize vector database
+            await self._initialize_vector_db()
+            
+            # Initialize metadata database
+            await self._initialize_metadata_db()
+            
+            self.initialized = True
+            logger.info("RAG Memory System initialized successfully")
+    
+    async def acquire(self) -> "RAGMemorySystem":
+        """Register a user of this memory system, initializing it on first use"""
+        await self.initialize()
+        self._refcount += 1
+        return self
+    
+    async def release(self):
+        """Drop a user; the last one to leave closes the system"""
+        if self._refcount <= 0:
+            return
+        self._refcount -= 1
+        if self._refcount == 0:
+            await self.close()
+    
+    async def close(self):
+        """Release the shared model and vector store"""
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
         
-        logger.info("RAG Memory System initialized successfully")
+        async with self._init_lock:
+            if not self.initialized:
+                return
+            
+            if self._access_flush is not None and not self._access_flush.done() and self._access_loop is asyncio.get_running_loop():
+                await self._access_flush
+            await self.flush_access_stats()
+            self.embedding_model = None
+            self.vector_store = None
+            await self._run_db(self.metadata_db.close)
+            _release_shared("embedding model", self.config.embedding_model)
+            released_store = _release_shared("vector database", self._vector_store_key())
+            if released_store is not None:
+                await self._run_db(released_store.close)
+            await self._stop_executors()
+            self.initialized = False
+            logger.info("RAG Memory System closed")
+    
+    def _start_executors(self):
+        if self._encode_executor is None:
+            self._encode_executor = ThreadPoolExecutor(
+                max_workers=self.config.encode_workers,
+                thread_name_prefix="rag-encode"
+            )
+        if self._db_executor is None:
+            self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-db")
+    
+    async def _stop_executors(self):
+        """Let queued work finish, then end the worker threads"""
+        executors = [self._encode_executor, self._db_executor]
+        self._encode_executor = self._db_executor = None
+        for executor in executors:
+            if executor is not None:
+                await asyncio.to_thread(executor.shutdown)
     
     async def _load_embedding_model(self):
         """Load the sentence transformer model for embeddings"""
         try:
-            self.embedding_model = SentenceTransformer(self.config.embedding_model)
+            self.embedding_model = await asyncio.get_running_loop().run_in_executor(
+                self._encode_executor,
+                _acquire_shared,
+                "embedding model",
+                self.config.embedding_model,
+                lambda: SentenceTransformer(self.config.embedding_model)
+            )
             logger.info(f"Loaded embedding model: {self.config.embedding_model}")
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             raise
     
     async def _initialize_vector_db(self):
-        """Initialize ChromaDB vector database"""
+        """Open the configured vector store (Chroma or FAISS)"""
         try:
-            # Initialize ChromaDB client
-            self.vector_db = chromadb.PersistentClient(
-                path=self.config.vector_db_path,
-                settings=Settings(anonymized_telemetry=False)
+            self.vector_store = await self._run_db(
+                _acquire_shared,
+                "vector database",
+                self._vector_store_key(),
+                lambda: create_vector_store(self.config, self.collection_name)
             )
-            
-            # Get or create collection
-            try:
-                self.collection = self.vector_db.get_collection(self.collection_name)
-                logger.info(f"Found existing collection: {self.collection_name}")
-            except:
-                self.collection = self.vector_db.create_collection(
-                    name=self.collection_name,
-                    metadata={"description": "Long-term memory documents"}
-                )
-                logger.info(f"Created new collection: {self.collection_name}")
-                
+            logger.info(f"Opened {self.config.vector_backend} vector store")
         except Exception as e:
             logger.error(f"Failed to initialize vector database: {e}")
             raise
     
+    def _vector_store_key(self) -> str:
+        return f"{self.config.vector_backend}:{Path(self.config.vector_db_path).resolve()}"
+    
     async def _initialize_metadata_db(self):
         """Initialize SQLite database for metadata"""
         try:
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS documents (
-                        doc_id TEXT PRIMARY KEY,
-                        content TEXT NOT NULL,
-                        metadata TEXT,
-                        created_at TEXT,
-                        updated_at TEXT,
-                        access_count INTEGER DEFAULT 0,
-                        last_accessed TEXT
-                    )
-                ''')
-                
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS conversations (
-                        conversation_id TEXT PRIMARY KEY,
-                        title TEXT,
-                        created_at TEXT,
-                        updated_at TEXT,
-                        message_count INTEGER DEFAULT 0
-                    )
-                ''')
-                
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS conversation_messages (
-                        message_id TEXT PRIMARY KEY,
-                        conversation_id TEXT,
-                        role TEXT,
-                        content TEXT,
-                        timestamp TEXT,
-                        FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id)
-                    )
-                ''')
-                
-                conn.commit()
-                logger.info("Metadata database initialized")
-                
+            await self._run_db(self._create_metadata_tables)
         except Exception as e:
             logger.error(f"Failed to initialize metadata database: {e}")
             raise
     
+    def _create_metadata_tables(self):
+        with self.metadata_db.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    metadata TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    access_count INTEGER DEFAULT 0,
+                    last_accessed TEXT
+                )
+            ''')
+            
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversations (
+                    conversation_id TEXT PRIMARY KEY,
+                    title TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    message_count INTEGER DEFAULT 0
+                )
+            ''')
+            
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_messages (
+                    message_id TEXT PRIMARY KEY,
+                    conversation_id TEXT,
+                    role TEXT,
+                    content TEXT,
+                    timestamp TEXT,
+                    FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id)
+                )
+            ''')
+            
+            # Conversation history lookups and retention cleanup
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_messages_conversation_time
+                ON conversation_messages (conversation_id, timestamp)
+            ''')
+            
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_documents_created_access
+                ON documents (created_at, access_count)
+            ''')
+            
+            conn.commit()
+            logger.info("Metadata database initialized")
+    
+    async def _run_db(self, fn, *args, **kwargs):
+        """Run blocking Chroma or SQLite work on the database thread"""
+        if self._db_executor is None:
+            raise Exception("RAG memory system is not initialized")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db_executor,
+            functools.partial(fn, *args, **kwargs)
+        )
+    
+    @staticmethod
+    @contextmanager
+    def embedding_scope() -> Iterator[Dict[str, np.ndarray]]:
+        """Share encoded vectors for the rest of this request
+        
+        Nested scopes reuse the outer one, so wrapping both an entry point
+        and the helpers it calls is harmless.
+        """
+        scope = _request_embeddings.get()
+        if scope is not None:
+            yield scope
+            return
+        
+        token = _request_embeddings.set({})
+        try:
+            yield _request_embeddings.get()
+        finally:
+            _request_embeddings.reset(token)
+    
+    def _embedding_key(self, text: str) -> str:
+        # The tokenizer ignores whitespace differences, so the key does too
+        normalized = " ".join(text.split())
+        return hashlib.sha1(f"{self.config.embedding_model}\0{normalized}".encode("utf-8")).hexdigest()
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, reusing vectors from this request and recent ones
+        
+        Only texts not seen before are passed to the model, in one call.
+        Blocks while the model runs: coroutines should use encode_async().
+        Safe to call from executor threads; there only the process-wide
+        cache applies.
+        """
+        scope = _request_embeddings.get()
+        vectors, missing = self._lookup_embeddings(texts, scope)
+        if missing:
+            encoded = self.embedding_model.encode([texts[positions[0]] for positions in missing.values()])
+            with self._embedding_lock:
+                self.embedding_stats["encode_calls"] += 1
+            self._store_embeddings(missing, encoded, vectors, scope)
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        """encode() without blocking the event loop
+        
+        Texts missing from the caches wait up to encode_batch_window seconds
+        for other callers, or until encode_batch_size texts are queued, and
+        are then embedded together in one model call on the encode thread.
+        """
+        scope = _request_embeddings.get()
+        vectors, missing = self._lookup_embeddings(texts, scope)
+        if missing:
+            loop = asyncio.get_running_loop()
+            if self._encode_loop is not loop:
+                self._bind_encode_loop(loop)
+            future = loop.create_future()
+            self._pending_encodes.append(([texts[positions[0]] for positions in missing.values()], future))
+            self._pending_texts += len(missing)
+            if self._pending_texts >= self.config.encode_batch_size:
+                self._flush_encodes()
+            elif self._encode_timer is None:
+                self._encode_timer = loop.call_later(self.config.encode_batch_window, self._flush_encodes)
+            self._store_embeddings(missing, await future, vectors, scope)
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    
+    def _bind_encode_loop(self, loop: asyncio.AbstractEventLoop):
+        """Drop the batch queued on a previous event loop
+        
+        Its timer never fires once that loop stops (e.g. a finished
+        asyncio.run()), and would otherwise keep later batches from
+        scheduling their own. Callers still waiting there are cancelled.
+        """
+        stale_loop, self._encode_loop = self._encode_loop, loop
+        if self._encode_timer is not None:
+            self._encode_timer.cancel()
+            self._encode_timer = None
+        pending, self._pending_encodes = self._pending_encodes, []
+        self._pending_texts = 0
+        for _, future in pending:
+            if not future.done() and not stale_loop.is_closed():
+                stale_loop.call_soon_threadsafe(future.cancel)
+    
+    def _flush_encodes(self):
+        """Send every queued encode_async() text to the model in one call"""
+        if self._encode_timer is not None:
+            self._encode_timer.cancel()
+            self._encode_timer = None
+        # Callers that gave up (or whose loop finished) need no embedding
+        pending = [item for item in self._pending_encodes if not item[1].done()]
+        self._pending_encodes = []
+        self._pending_texts = 0
+        if not pending:
+            return
+        
+        texts = [text for batch_texts, _ in pending for text in batch_texts]
+        encoding = asyncio.get_running_loop().run_in_executor(self._encode_executor, self.embedding_model.encode, texts)
+        encoding.add_done_callback(functools.partial(self._encodes_done, pending))
+        with self._embedding_lock:
+            self.embedding_stats["encode_calls"] += 1
+    
+    @staticmethod
+    def _encodes_done(pending: List[Tuple[List[str], asyncio.Future]], encoding: asyncio.Future):
+        error = None if encoding.cancelled() else encoding.exception()
+        offset = 0
+        for batch_texts, future in pending:
+            # Callers that gave up have cancelled their future
+            if not future.done():
+                if encoding.cancelled():
+                    future.cancel()
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(encoding.result()[offset:offset + len(batch_texts)])
+            offset += len(batch_texts)
+    
+    def _lookup_embeddings(
+        self,
+        texts: List[str],
+        scope: Optional[Dict[str, np.ndarray]]
+    ) -> Tuple[List[Optional[np.ndarray]], Dict[str, List[int]]]:
+        """Cached vector per text, and the positions of each text still to encode by key"""
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._embedding_lock:
+            for i, text in enumerate(texts):
+                key = self._embedding_key(text)
+                if scope is not None and key in scope:
+                    vectors[i] = scope[key]
+                    self.embedding_stats["request_hits"] += 1
+                elif key in self._embedding_cache:
+                    self._embedding_cache.move_to_end(key)
+                    vectors[i] = self._embedding_cache[key]
+                    self.embedding_stats["cache_hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+        return vectors, missing
+    
+    def _store_embeddings(
+        self,
+        missing: Dict[str, List[int]],
+        encoded,
+        vectors: List[Optional[np.ndarray]],
+        scope: Optional[Dict[str, np.ndarray]]
+    ):
+        """Fill in newly encoded vectors and remember them"""
+        with self._embedding_lock:
+            self.embedding_stats["texts_encoded"] += len(missing)
+            for (key, positions), vector in zip(missing.items(), encoded):
+                vector = np.asarray(vector)
+                for i in positions:
+                    vectors[i] = vector
+                self._embedding_cache[key] = vector
+                self._embedding_cache.move_to_end(key)
+                if scope is not None:
+                    scope[key] = vector
+            while len(self._embedding_cache) > self.config.embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+    
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """Encode counts and how many encodes the caches saved"""
+        stats = dict(self.embedding_stats)
+        stats["encodes_saved"] = stats["request_hits"] + stats["cache_hits"]
+        requested = stats["encodes_saved"] + stats["texts_encoded"]
+        stats["hit_rate"] = round(stats["encodes_saved"] / requested, 3) if requested else 0.0
+        stats["cached_vectors"] = len(self._embedding_cache)
+        return stats
+    
     def _chunk_text(self, text: str) -> List[str]:
         """Split text into chunks for processing"""
         words = text.split()
@@ -175,51 +517,114 @@ class RAGMemorySystem:
             chunks = self._chunk_text(content)
             
             # Generate embeddings for chunks
-            embeddings = self.embedding_model.encode(chunks)
+            embeddings = await self.encode_async(chunks)
             
-            # Prepare data for vector database
-            chunk_ids = [f"{document.doc_id}_chunk_{i}" for i in range(len(chunks))]
-            chunk_metadata = [
-                {
+            # Add to vector and metadata databases
+            await self._run_db(self._write_documents_sync, [(document, chunks)], embeddings)
+            
+            logger.info(f"Added document {document.doc_id} with {len(chunks)} chunks")
+            return document.doc_id
+            
+        except Exception as e:
+            logger.error(f"Failed to add document: {e}")
+            raise
+    
+    async def add_documents(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """Add several documents with one encode call and one transaction
+        
+        Each item is a dict with "content" and optional "metadata" and
+        "doc_id". The embedding and database work runs off the event loop.
+        For large corpora see rag_ingest.py, which encodes in worker
+        processes and checkpoints its progress.
+        """
+        batch = self.prepare_documents(documents)
+        if not batch:
+            return []
+        
+        try:
+            embeddings = await self.encode_async([chunk for _, chunks in batch for chunk in chunks])
+            await self.write_documents(batch, embeddings)
+            logger.info(f"Added {len(batch)} documents in one batch")
+            return [document.doc_id for document, _ in batch]
+        
+        except Exception as e:
+            logger.error(f"Failed to add document batch: {e}")
+            raise
+    
+    def prepare_documents(self, documents: Iterable[Dict[str, Any]]) -> List[Tuple[Document, List[str]]]:
+        """Chunk document dicts for write_documents(); empty documents are dropped"""
+        batch: Dict[str, Tuple[Document, List[str]]] = {}
+        for item in documents:
+            document = Document(item["content"], item.get("metadata"), item.get("doc_id"))
+            chunks = self._chunk_text(document.content)
+            if chunks:
+                # Identical ids in one Chroma add are rejected; the last one wins
+                batch[document.doc_id] = (document, chunks)
+        return list(batch.values())
+    
+    async def write_documents(self, batch: List[Tuple[Document, List[str]]], embeddings: np.ndarray):
+        """Store prepared documents with one embedding per chunk, in chunk order"""
+        await self._run_db(self._write_documents_sync, batch, embeddings)
+    
+    def _write_documents_sync(self, batch: List[Tuple[Document, List[str]]], embeddings: np.ndarray):
+        """Store chunked documents and their chunk embeddings, in order
+        
+        A document that is already stored is replaced, including any
+        chunks beyond its new chunk count.
+        """
+        doc_ids = [document.doc_id for document, _ in batch]
+        stored = []
+        with self.metadata_db.connection() as conn:
+            # Stay under SQLite's limit on bound parameters
+            for start in range(0, len(doc_ids), 500):
+                part = doc_ids[start:start + 500]
+                stored.extend(row[0] for row in conn.execute(
+                    f"SELECT doc_id FROM documents WHERE doc_id IN ({','.join('?' * len(part))})",
+                    part
+                ))
+        for doc_id in stored:
+            self.vector_store.delete(self.vector_store.get_ids(where={"doc_id": doc_id}))
+        
+        chunk_ids, chunk_texts, chunk_metadata = [], [], []
+        for document, chunks in batch:
+            for i, chunk in enumerate(chunks):
+                chunk_ids.append(f"{document.doc_id}_chunk_{i}")
+                chunk_texts.append(chunk)
+                chunk_metadata.append({
                     "doc_id": document.doc_id,
                     "chunk_index": i,
                     "total_chunks": len(chunks),
                     **document.metadata
-                }
-                for i in range(len(chunks))
-            ]
-            
-            # Add to vector database
-            self.collection.add(
-                ids=chunk_ids,
-                documents=chunks,
-                metadatas=chunk_metadata,
-                embeddings=embeddings.tolist()
+                })
+        
+        # Chroma rejects adds above its maximum batch size
+        for start in range(0, len(chunk_ids), CHROMA_MAX_BATCH):
+            end = start + CHROMA_MAX_BATCH
+            self.vector_store.add(
+                ids=chunk_ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=chunk_texts[start:end],
+                metadatas=chunk_metadata[start:end]
             )
-            
-            # Add to metadata database
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                conn.execute(
-                    '''INSERT OR REPLACE INTO documents 
-                       (doc_id, content, metadata, created_at, updated_at, access_count, last_accessed)
-                       VALUES (?, ?, ?, ?, ?, 0, ?)''',
+        
+        with self.metadata_db.connection() as conn:
+            conn.executemany(
+                '''INSERT OR REPLACE INTO documents 
+                   (doc_id, content, metadata, created_at, updated_at, access_count, last_accessed)
+                   VALUES (?, ?, ?, ?, ?, 0, ?)''',
+                [
                     (
                         document.doc_id,
-                        content,
-                        json.dumps(metadata or {}),
+                        document.content,
+                        json.dumps(document.metadata),
                         document.created_at,
                         document.created_at,
                         document.created_at
                     )
-                )
-                conn.commit()
-            
-            logger.info(f"Added document {document.doc_id} with {len(chunks)} chunks")
-            return document.doc_id
-            
-        except Exception as e:
-            logger.error(f"Failed to add document: {e}")
-            raise
+                    for document, _ in batch
+                ]
+            )
+            conn.commit()
     
     async def search_similar(self, query: str, max_results: int = None) -> List[Dict[str, Any]]:
         """Search for similar documents using vector similarity"""
@@ -227,11 +632,12 @@ class RAGMemorySystem:
             max_results = max_results or self.config.max_retrieved_docs
             
             # Generate query embedding
-            query_embedding = self.embedding_model.encode([query])
+            query_embedding = await self.encode_async([query])
             
             # Search in vector database
-            results = self.collection.query(
-                query_embeddings=query_embedding.tolist(),
+            results = await self._run_db(
+                self.vector_store.query,
+                query_embeddings=query_embedding,
                 n_results=max_results
             )
             
@@ -255,8 +661,7 @@ class RAGMemorySystem:
                         })
             
             # Update access statistics
-            for doc in similar_docs:
-                await self._update_access_stats(doc["doc_id"])
+            await self._record_access(doc["doc_id"] for doc in similar_docs)
             
             logger.info(f"Found {len(similar_docs)} similar documents for query")
             return similar_docs
@@ -265,68 +670,111 @@ class RAGMemorySystem:
             logger.error(f"Failed to search similar documents: {e}")
             return []
     
-    async def _update_access_stats(self, doc_id: str):
-        """Update document access statistics"""
+    async def _record_access(self, doc_ids: Iterable[str]):
+        """Count retrievals in memory; they are written in one batch later
+        
+        Counts are written every access_flush_interval seconds, or sooner
+        once access_flush_max_docs documents are pending, so retrieval
+        never waits on a commit. Until then access_count lags slightly.
+        Once a second event loop shows up, as when every request runs under
+        its own asyncio.run(), a timer may never fire, so counts are written
+        before the search returns instead.
+        """
+        now = datetime.now().isoformat()
+        for doc_id in doc_ids:
+            entry = self._pending_access.setdefault(doc_id, [0, now])
+            entry[0] += 1
+            entry[1] = now
+        
+        if not self._pending_access:
+            return
+        
+        loop = asyncio.get_running_loop()
+        if self._access_loop is not loop:
+            # The timer and flush task of a previous loop never run again
+            if self._access_loop is not None:
+                self._access_inline = True
+            if self._access_timer is not None:
+                self._access_timer.cancel()
+            self._access_loop = loop
+            self._access_timer = None
+            self._access_flush = None
+        
+        if self._access_inline:
+            await self.flush_access_stats()
+        elif len(self._pending_access) >= self.config.access_flush_max_docs:
+            self._start_access_flush()
+        elif self._access_timer is None:
+            self._access_timer = loop.call_later(
+                self.config.access_flush_interval,
+                self._start_access_flush
+            )
+    
+    def _start_access_flush(self):
+        if self._access_flush is None or self._access_flush.done():
+            self._access_flush = asyncio.create_task(self.flush_access_stats())
+    
+    async def flush_access_stats(self):
+        """Write pending retrieval counts in one transaction"""
+        if self._access_timer is not None:
+            self._access_timer.cancel()
+            self._access_timer = None
+        pending, self._pending_access = self._pending_access, {}
+        if not pending:
+            return
+        
         try:
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                conn.execute(
-                    '''UPDATE documents 
-                       SET access_count = access_count + 1, last_accessed = ?
-                       WHERE doc_id = ?''',
-                    (datetime.now().isoformat(), doc_id)
-                )
-                conn.commit()
+            await self._run_db(self._flush_access_stats_sync, pending)
         except Exception as e:
-            logger.error(f"Failed to update access stats for {doc_id}: {e}")
+            logger.error(f"Failed to update access stats for {len(pending)} documents: {e}")
+            # Keep the counts for the next flush
+            for doc_id, (count, last_accessed) in pending.items():
+                entry = self._pending_access.setdefault(doc_id, [0, last_accessed])
+                entry[0] += count
+    
+    def _flush_access_stats_sync(self, pending: Dict[str, List[Any]]):
+        with self.metadata_db.connection() as conn:
+            conn.executemany(
+                '''UPDATE documents 
+                   SET access_count = access_count + ?, last_accessed = ?
+                   WHERE doc_id = ?''',
+                [(count, last_accessed, doc_id) for doc_id, (count, last_accessed) in pending.items()]
+            )
     
     async def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific document by ID"""
         try:
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                cursor = conn.execute(
-                    '''SELECT doc_id, content, metadata, created_at, updated_at, access_count, last_accessed
-                       FROM documents WHERE doc_id = ?''',
-                    (doc_id,)
-                )
-                row = cursor.fetchone()
-                
-                if row:
-                    return {
-                        "doc_id": row[0],
-                        "content": row[1],
-                        "metadata": json.loads(row[2]) if row[2] else {},
-                        "created_at": row[3],
-                        "updated_at": row[4],
-                        "access_count": row[5],
-                        "last_accessed": row[6]
-                    }
-                    
+            return await self._run_db(self._get_document_sync, doc_id)
         except Exception as e:
             logger.error(f"Failed to get document {doc_id}: {e}")
         
         return None
     
+    def _get_document_sync(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self.metadata_db.connection() as conn:
+            cursor = conn.execute(
+                '''SELECT doc_id, content, metadata, created_at, updated_at, access_count, last_accessed
+                   FROM documents WHERE doc_id = ?''',
+                (doc_id,)
+            )
+            row = cursor.fetchone()
+            
+            if row:
+                return {
+                    "doc_id": row[0],
+                    "content": row[1],
+                    "metadata": json.loads(row[2]) if row[2] else {},
+                    "created_at": row[3],
+                    "updated_at": row[4],
+                    "access_count": row[5],
+                    "last_accessed": row[6]
+                }
+        return None
+    
     async def delete_document(self, doc_id: str) -> bool:
         """Delete a document from the memory system"""
         try:
-            # Delete from vector database
-            # First, find all chunk IDs for this document
-            results = self.collection.get(
-                where={"doc_id": doc_id}
-            )
-            
-            if results["ids"]:
-                self.collection.delete(ids=results["ids"])
-            
-            # Delete from metadata database
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                cursor = conn.execute(
-                    "DELETE FROM documents WHERE doc_id = ?",
-                    (doc_id,)
-                )
-                conn.commit()
-                
-                deleted = cursor.rowcount > 0
+            deleted = await self._run_db(self._delete_document_sync, doc_id)
                 
             if deleted:
                 logger.info(f"Deleted document {doc_id}")
@@ -339,49 +787,71 @@ class RAGMemorySystem:
             logger.error(f"Failed to delete document {doc_id}: {e}")
             return False
     
+    def _delete_document_sync(self, doc_id: str) -> bool:
+        # Delete from vector database
+        # First, find all chunk IDs for this document
+        chunk_ids = self.vector_store.get_ids(where={"doc_id": doc_id})
+        
+        if chunk_ids:
+            self.vector_store.delete(chunk_ids)
+        
+        # Delete from metadata database
+        with self.metadata_db.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM documents WHERE doc_id = ?",
+                (doc_id,)
+            )
+            conn.commit()
+            
+            return cursor.rowcount > 0
+    
+    async def delete_sources(self, sources: List[str]) -> int:
+        """Delete every document whose metadata "source" is one of sources"""
+        deleted = await self._run_db(self._delete_sources_sync, sources)
+        logger.info(f"Deleted {deleted} documents from {len(sources)} sources")
+        return deleted
+    
+    def _delete_sources_sync(self, sources: List[str]) -> int:
+        deleted = 0
+        for source in sources:
+            self.vector_store.delete(self.vector_store.get_ids(where={"source": source}))
+            with self.metadata_db.connection() as conn:
+                cursor = conn.execute(
+                    "DELETE FROM documents WHERE json_extract(metadata, '$.source') = ?",
+                    (source,)
+                )
+                deleted += cursor.rowcount
+        return deleted
+    
     async def add_conversation(self, conversation_id: str, title: str = None):
         """Add a new conversation to memory"""
         try:
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                conn.execute(
-                    '''INSERT OR REPLACE INTO conversations 
-                       (conversation_id, title, created_at, updated_at, message_count)
-                       VALUES (?, ?, ?, ?, 0)''',
-                    (
-                        conversation_id,
-                        title or f"Conversation {conversation_id}",
-                        datetime.now().isoformat(),
-                        datetime.now().isoformat()
-                    )
-                )
-                conn.commit()
+            await self._run_db(self._add_conversation_sync, conversation_id, title)
             logger.info(f"Added conversation {conversation_id}")
         except Exception as e:
             logger.error(f"Failed to add conversation {conversation_id}: {e}")
     
+    def _add_conversation_sync(self, conversation_id: str, title: Optional[str]):
+        with self.metadata_db.connection() as conn:
+            conn.execute(
+                '''INSERT OR REPLACE INTO conversations 
+                   (conversation_id, title, created_at, updated_at, message_count)
+                   VALUES (?, ?, ?, ?, 0)''',
+                (
+                    conversation_id,
+                    title or f"Conversation {conversation_id}",
+                    datetime.now().isoformat(),
+                    datetime.now().isoformat()
+                )
+            )
+            conn.commit()
+    
     async def add_message_to_conversation(self, conversation_id: str, role: str, content: str, message_id: str = None):
         """Add a message to a conversation"""
         try:
             message_id = message_id or f"msg_{int(datetime.now().timestamp())}_{hash(content) % 10000}"
             
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                # Add message
-                conn.execute(
-                    '''INSERT INTO conversation_messages 
-                       (message_id, conversation_id, role, content, timestamp)
-                       VALUES (?, ?, ?, ?, ?)''',
-                    (message_id, conversation_id, role, content, datetime.now().isoformat())
-                )
-                
-                # Update conversation stats
-                conn.execute(
-                    '''UPDATE conversations 
-                       SET message_count = message_count + 1, updated_at = ?
-                       WHERE conversation_id = ?''',
-                    (datetime.now().isoformat(), conversation_id)
-                )
-                
-                conn.commit()
+            await self._run_db(self._add_message_sync, conversation_id, role, content, message_id)
             
             # Also add message content to document memory for retrieval
             await self.add_document(
@@ -397,104 +867,319 @@ class RAGMemorySystem:
         except Exception as e:
             logger.error(f"Failed to add message to conversation {conversation_id}: {e}")
     
+    def _add_message_sync(self, conversation_id: str, role: str, content: str, message_id: str):
+        with self.metadata_db.connection() as conn:
+            # Add message
+            conn.execute(
+                '''INSERT INTO conversation_messages 
+                   (message_id, conversation_id, role, content, timestamp)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (message_id, conversation_id, role, content, datetime.now().isoformat())
+            )
+            
+            # Update conversation stats
+            conn.execute(
+                '''UPDATE conversations 
+                   SET message_count = message_count + 1, updated_at = ?
+                   WHERE conversation_id = ?''',
+                (datetime.now().isoformat(), conversation_id)
+            )
+            
+            conn.commit()
+    
     async def get_conversation_history(self, conversation_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Get conversation history"""
         try:
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                cursor = conn.execute(
-                    '''SELECT message_id, role, content, timestamp
-                       FROM conversation_messages 
-                       WHERE conversation_id = ?
-                       ORDER BY timestamp DESC
-                       LIMIT ?''',
-                    (conversation_id, limit)
-                )
-                
-                messages = []
-                for row in cursor.fetchall():
-                    messages.append({
-                        "message_id": row[0],
-                        "role": row[1],
-                        "content": row[2],
-                        "timestamp": row[3]
-                    })
-                
-                return list(reversed(messages))  # Return in chronological order
-                
+            return await self._run_db(self._get_conversation_history_sync, conversation_id, limit)
         except Exception as e:
             logger.error(f"Failed to get conversation history for {conversation_id}: {e}")
             return []
     
+    def _get_conversation_history_sync(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        with self.metadata_db.connection() as conn:
+            cursor = conn.execute(
+                '''SELECT message_id, role, content, timestamp
+                   FROM conversation_messages 
+                   WHERE conversation_id = ?
+                   ORDER BY timestamp DESC
+                   LIMIT ?''',
+                (conversation_id, limit)
+            )
+            
+            messages = []
+            for row in cursor.fetchall():
+                messages.append({
+                    "message_id": row[0],
+                    "role": row[1],
+                    "content": row[2],
+                    "timestamp": row[3]
+                })
+            
+            return list(reversed(messages))  # Return in chronological order
+    
     async def clear_conversation_history(self, conversation_id: str) -> bool:
         """Clear all messages from a conversation"""
         try:
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                cursor = conn.execute(
-                    "DELETE FROM conversation_messages WHERE conversation_id = ?",
-                    (conversation_id,)
-                )
-                deleted_count = cursor.rowcount
-                conn.commit()
-                
-                logger.info(f"Cleared {deleted_count} messages from conversation {conversation_id}")
-                return deleted_count > 0
+            deleted_count = await self._run_db(self._clear_conversation_history_sync, conversation_id)
+            
+            logger.info(f"Cleared {deleted_count} messages from conversation {conversation_id}")
+            return deleted_count > 0
                 
         except Exception as e:
             logger.error(f"Failed to clear conversation history for {conversation_id}: {e}")
             return False
     
+    def _clear_conversation_history_sync(self, conversation_id: str) -> int:
+        with self.metadata_db.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM conversation_messages WHERE conversation_id = ?",
+                (conversation_id,)
+            )
+            conn.commit()
+            return cursor.rowcount
+    
     async def cleanup_old_documents(self, days: int = None):
         """Clean up old documents based on retention policy"""
         try:
             days = days or config.memory_retention_days
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
             
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                # Get old document IDs
-                cursor = conn.execute(
-                    "SELECT doc_id FROM documents WHERE created_at < ? AND access_count = 0",
-                    (cutoff_date,)
-                )
-                old_doc_ids = [row[0] for row in cursor.fetchall()]
-                
-                # Delete old documents
-                for doc_id in old_doc_ids:
-                    await self.delete_document(doc_id)
-                
-                logger.info(f"Cleaned up {len(old_doc_ids)} old documents")
+            # Documents retrieved recently must not look unused
+            await self.flush_access_stats()
+            
+            # Get old document IDs
+            old_doc_ids = await self._run_db(self._old_document_ids_sync, cutoff_date)
+            
+            # Delete old documents
+            for doc_id in old_doc_ids:
+                await self.delete_document(doc_id)
+            
+            logger.info(f"Cleaned up {len(old_doc_ids)} old documents")
                 
         except Exception as e:
             logger.error(f"Failed to cleanup old documents: {e}")
     
+    def _old_document_ids_sync(self, cutoff_date: str) -> List[str]:
+        with self.metadata_db.connection() as conn:
+            cursor = conn.execute(
+                "SELECT doc_id FROM documents WHERE created_at < ? AND access_count = 0",
+                (cutoff_date,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
     async def get_memory_stats(self) -> Dict[str, Any]:
         """Get memory system statistics"""
         try:
-            stats = {"vector_db": {}, "metadata_db": {}}
-            
-            # Vector database stats
-            collection_count = self.collection.count()
-            stats["vector_db"]["total_chunks"] = collection_count
-            
-            # Metadata database stats
-            with sqlite3.connect(self.metadata_db_path) as conn:
-                cursor = conn.execute("SELECT COUNT(*) FROM documents")
-                stats["metadata_db"]["total_documents"] = cursor.fetchone()[0]
-                
-                cursor = conn.execute("SELECT COUNT(*) FROM conversations")
-                stats["metadata_db"]["total_conversations"] = cursor.fetchone()[0]
-                
-                cursor = conn.execute("SELECT COUNT(*) FROM conversation_messages")
-                stats["metadata_db"]["total_messages"] = cursor.fetchone()[0]
-                
-                cursor = conn.execute("SELECT AVG(access_count) FROM documents")
-                avg_access = cursor.fetchone()[0]
-                stats["metadata_db"]["avg_document_access"] = round(avg_access or 0, 2)
-            
+            stats = await self._run_db(self._get_memory_stats_sync)
+            stats["embeddings"] = self.get_embedding_stats()
+            stats["metadata_db"]["pending_access_updates"] = len(self._pending_access)
             return stats
             
         except Exception as e:
             logger.error(f"Failed to get memory stats: {e}")
             return {}
+    
+    def _get_memory_stats_sync(self) -> Dict[str, Any]:
+        # Vector database stats
+        stats = {"vector_db": self.vector_store.get_stats(), "metadata_db": {}}
+        
+        # Metadata database stats
+        with self.metadata_db.connection() as conn:
+            cursor = conn.execute("SELECT COUNT(*) FROM documents")
+            stats["metadata_db"]["total_documents"] = cursor.fetchone()[0]
+            
+            cursor = conn.execute("SELECT COUNT(*) FROM conversations")
+            stats["metadata_db"]["total_conversations"] = cursor.fetchone()[0]
+            
+            cursor = conn.execute("SELECT COUNT(*) FROM conversation_messages")
+            stats["metadata_db"]["total_messages"] = cursor.fetchone()[0]
+            
+            cursor = conn.execute("SELECT AVG(access_count) FROM documents")
+            avg_access = cursor.fetchone()[0]
+            stats["metadata_db"]["avg_document_access"] = round(avg_access or 0, 2)
+        
+        return stats
+
+class MemoryWriteQueue:
+    """Bounded background queue that writes documents to memory in batches
+    
+    For records nobody is waiting on, such as interaction logs. enqueue()
+    returns as soon as the record is queued. A worker task writes up to
+    batch_size records per add_documents call, or whatever has arrived
+    after flush_interval. Past the high-water mark only sample_rate of new
+    records are kept, and a full queue drops them. close() writes
+    everything still queued.
+    
+    The queue and its worker belong to one event loop. Once a second loop
+    shows up, as when every request runs under its own asyncio.run(), there
+    is no loop left running to write in the background: records stranded
+    on the old loop are carried over and writes happen inline from then on.
+    """
+    
+    def __init__(self, memory: RAGMemorySystem, queue_config: MemoryWriteQueueConfig = None):
+        self.memory = memory
+        self.config = queue_config or config.memory_write_queue_config
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inline = False
+        self._carryover: List[Dict[str, Any]] = []
+        self._closing = False
+        self.stats = {
+            "queued": 0, "written": 0, "batches": 0, "dropped": 0, "sampled_out": 0, "failed": 0,
+            "loop_changes": 0
+        }
+    
+    def _bind_loop(self) -> List[Dict[str, Any]]:
+        """Attach to the running loop; returns records stranded on a previous one"""
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return []
+        
+        stranded, self._carryover = self._carryover + self._drain(), []
+        if self._loop is not None:
+            self._inline = True
+            self.stats["loop_changes"] += 1
+            logger.debug(f"Memory write queue moved to a new event loop; writing inline, {len(stranded)} records carried over")
+        
+        self._loop = loop
+        # Unbounded so the shutdown marker always fits; the limit is enforced in enqueue()
+        self._queue = asyncio.Queue()
+        self._worker = None
+        return stranded
+    
+    def _drain(self) -> List[Dict[str, Any]]:
+        """Take every record still in the queue"""
+        items = []
+        while self._queue is not None:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is not None:
+                items.append(item)
+        return items
+    
+    def _start_worker(self):
+        if self._queue.qsize() and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._run())
+    
+    async def enqueue(self, content: str, metadata: Dict[str, Any] = None, doc_id: str = None) -> bool:
+        """Queue a document for writing; False if it was dropped"""
+        if self._closing:
+            self.stats["dropped"] += 1
+            return False
+        
+        stranded = self._bind_loop()
+        record = {"content": content, "metadata": metadata, "doc_id": doc_id}
+        if self._inline:
+            self.stats["queued"] += 1
+            await self._write(stranded + [record], from_queue=False)
+            return True
+        for item in stranded:
+            self._queue.put_nowait(item)
+        
+        size = self._queue.qsize()
+        if size >= self.config.max_queue_size:
+            self.stats["dropped"] += 1
+            self._start_worker()
+            return False
+        if size >= self.config.max_queue_size * self.config.high_water_ratio and random.random() >= self.config.sample_rate:
+            self.stats["sampled_out"] += 1
+            self._start_worker()
+            return False
+        
+        self._queue.put_nowait(record)
+        self.stats["queued"] += 1
+        self._start_worker()
+        return True
+    
+    async def _run(self):
+        # The task inherited the scope of the request that started it
+        _request_embeddings.set(None)
+        loop = asyncio.get_running_loop()
+        batch: List[Dict[str, Any]] = []
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    return
+                
+                batch = [item]
+                deadline = loop.time() + self.config.flush_interval
+                stop = False
+                while len(batch) < self.config.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                
+                writing, batch = batch, []
+                await self._write(writing)
+                if stop:
+                    return
+        except asyncio.CancelledError:
+            # The loop is going away (asyncio.run() cancels leftover tasks);
+            # keep the records collected so far for the next loop
+            self._carryover.extend(batch)
+            raise
+    
+    async def _write(self, batch: List[Dict[str, Any]], from_queue: bool = True):
+        try:
+            await self.memory.add_documents(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.warning(f"Dropped {len(batch)} queued memory writes: {e}")
+        finally:
+            if from_queue:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def flush(self):
+        """Wait until everything queued so far has been written"""
+        stranded = self._bind_loop()
+        if stranded:
+            await self._write(stranded, from_queue=False)
+        if self._worker is not None and not self._worker.done():
+            await self._queue.join()
+    
+    async def close(self, timeout: float = 30.0):
+        """Stop accepting records and write the ones still queued"""
+        self._closing = True
+        stranded = self._bind_loop()
+        if stranded:
+            await self._write(stranded, from_queue=False)
+        if self._worker is None or self._worker.done():
+            return
+        
+        self._queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._worker, timeout)
+        except asyncio.TimeoutError:
+            lost = len(self._drain()) + len(self._carryover)
+            self.stats["dropped"] += lost
+            self._carryover = []
+            logger.warning(f"Memory write queue did not drain within {timeout}s; {lost} records lost")
+    
+    def reopen(self):
+        """Accept records again after close()"""
+        self._closing = False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            queue_size=(self._queue.qsize() if self._queue else 0) + len(self._carryover),
+            inline=self._inline
+        )
 
 # Global RAG memory system instance
 rag_memory = RAGMemorySystem()
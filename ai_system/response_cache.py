@@ -0,0 +1,253 @@
+"""
+LLM Response Cache
+TTL/LRU cache for chat completions with optional embedding-similarity lookup
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .config import ResponseCacheConfig, config
+except ImportError:
+    from config import ResponseCacheConfig, config
+
+logger = logging.getLogger(__name__)
+
+class LRUTTLCache:
+    """Bounded mapping with least-recently-used eviction and per-entry expiry"""
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return self._peek(key) is not None
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return a live value and mark it most recently used"""
+        entry = self._peek(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+    
+    def set(self, key: str, value: Any):
+        """Insert or replace a value, evicting the oldest entries if full"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    def pop(self, key: str) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+    
+    def items(self) -> List[Tuple[str, Any]]:
+        """Snapshot of live (key, value) pairs, oldest first"""
+        return [(key, value) for key, (expires_at, value) in list(self._entries.items())
+                if expires_at > time.monotonic()]
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def _peek(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.stats["expirations"] += 1
+            return None
+        
+        return entry
+
+class ResponseCache:
+    """Caches chat completions keyed by model, options, query and context
+    
+    A request is matched on its query and a context: by default the final
+    message and the messages before it. Callers that wrap the user's words
+    in prompt scaffolding (retrieved memory, tool lists) pass the raw query
+    and a context string holding only what shapes the answer instead, so
+    the scaffolding never enters the match. Exact lookups hash the
+    normalized query and context. When an encoder is attached, a
+    miss falls back to comparing the query against cached entries with the
+    same model, options and context, so rephrasings like "TSMC stock
+    price?" / "tsmc stock price" reuse one completion.
+    """
+    
+    def __init__(self, cache_config: ResponseCacheConfig = None):
+        self.config = cache_config or config.response_cache_config
+        self._cache = LRUTTLCache(self.config.max_entries, self.config.ttl_seconds)
+        self.encoder = None
+        self.stats = {"hits": 0, "misses": 0, "semantic_hits": 0, "stores": 0}
+    
+    def set_encoder(self, encoder):
+        """Attach an object with encode_async(texts), normally rag_memory
+        
+        Queries are then embedded through its encode cache and batching
+        instead of calling the model directly.
+        """
+        self.encoder = encoder
+        if encoder is not None:
+            logger.info("Response cache semantic lookup enabled")
+    
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        text = re.sub(r"\s+", " ", (text or "").strip().lower())
+        return text.rstrip("?!.。？！ ")
+    
+    def make_key(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        query: str = None,
+        context: str = None
+    ) -> str:
+        """Exact cache key for a request"""
+        query, context = self._match_parts(messages, query, context)
+        return self._hash(model, options, [context, query])
+    
+    async def lookup(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        query: str = None,
+        context: str = None
+    ) -> Optional[str]:
+        """Return a cached response for the request, if any"""
+        if not self.config.enabled or not messages:
+            return None
+        
+        entry = self._cache.get(self.make_key(model, messages, options, query, context))
+        if entry is None and self._semantic_active():
+            entry = await self._semantic_lookup(model, messages, options, query, context)
+            if entry is not None:
+                self.stats["semantic_hits"] += 1
+                self._cache.get(entry["key"])  # refresh LRU position
+        
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        
+        self.stats["hits"] += 1
+        return entry["response"]
+    
+    async def _semantic_lookup(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        query: str = None,
+        context: str = None
+    ) -> Optional[Dict[str, Any]]:
+        """Find the closest cached entry for the query"""
+        query, context = self._match_parts(messages, query, context)
+        context_key = self._hash(model, options, context)
+        candidates = [value for _, value in self._cache.items()
+                      if value["context_key"] == context_key and value["vector"] is not None]
+        if not candidates:
+            return None
+        
+        query_vector = await self._embed(query)
+        if query_vector is None:
+            return None
+        
+        similarities = np.stack([candidate["vector"] for candidate in candidates]) @ query_vector
+        best = int(np.argmax(similarities))
+        
+        if similarities[best] >= self.config.similarity_threshold:
+            return candidates[best]
+        
+        return None
+    
+    async def store(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        response: str,
+        query: str = None,
+        context: str = None
+    ):
+        """Cache a completed response"""
+        if not self.config.enabled or not messages or not response:
+            return
+        
+        query, context = self._match_parts(messages, query, context)
+        vector = None
+        if self._semantic_active():
+            vector = await self._embed(query)
+        
+        key = self._hash(model, options, [context, query])
+        self._cache.set(key, {
+            "key": key,
+            "response": response,
+            "context_key": self._hash(model, options, context),
+            "vector": vector
+        })
+        self.stats["stores"] += 1
+    
+    def clear(self):
+        self._cache.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss metrics for monitoring"""
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "entries": len(self._cache),
+            "evictions": self._cache.stats["evictions"],
+            "expirations": self._cache.stats["expirations"],
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0,
+            "semantic_enabled": self._semantic_active()
+        })
+        return stats
+    
+    def _semantic_active(self) -> bool:
+        return self.config.semantic_enabled and self.encoder is not None
+    
+    def _match_parts(self, messages: List[Dict[str, str]], query: Optional[str], context: Optional[str]) -> Tuple[str, Any]:
+        """Normalized query and the context it is matched within"""
+        if query is None:
+            return self.normalize_text(messages[-1].get("content", "")), [
+                (message.get("role"), self.normalize_text(message.get("content", "")))
+                for message in messages[:-1]
+            ]
+        return self.normalize_text(query), context or ""
+    
+    @staticmethod
+    def _hash(model: str, options: Dict[str, Any], parts: Any) -> str:
+        payload = json.dumps([model, options, parts], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Encode text with the attached encoder and L2-normalize it"""
+        try:
+            vector = (await self.encoder.encode_async([self.normalize_text(text)]))[0]
+            vector = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else None
+        except Exception as e:
+            logger.warning(f"Response cache embedding failed: {e}")
+            return None
@@ -6,15 +6,16 @@ Clean, working version with autonomous AI and RabbitMQ integration
 
 import streamlit as st
 import asyncio
+import atexit
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # Import our components
-from intelligent_agent import IntelligentAgent
+from intelligent_agent import IntelligentAgent, SectionCallback
 from llm_manager import LLMManager
-from rag_memory import RAGMemorySystem
+from rag_memory import rag_memory
 from rabbitmq_client import RabbitMQClient
 #from technical_search_manager import TechnicalSearchManager
 
@@ -77,9 +78,8 @@ async def initialize_components():
         st.session_state.llm_manager = LLMManager()
         await st.session_state.llm_manager.initialize()
         
-        # Initialize RAG Memory
-        st.session_state.rag_memory = RAGMemorySystem()
-        await st.session_state.rag_memory.initialize()
+        # Share the agent's RAG memory rather than loading a second model
+        st.session_state.rag_memory = await rag_memory.acquire()
         
         # Initialize Technical Search
         #st.session_state.technical_search = TechnicalSearchManager()
@@ -89,14 +89,37 @@ async def initialize_components():
         await st.session_state.rabbitmq_client.initialize()
         
         st.session_state.components_initialized = True
+        
+        # Each request runs on its own event loop, so teardown gets one too
+        agent = st.session_state.intelligent_agent
+        atexit.register(lambda: asyncio.run(shutdown_components(agent)))
         return True
         
     except Exception as e:
         st.error(f"Failed to initialize: {e}")
         return False
 
-async def process_request(user_input: str) -> Dict[str, Any]:
-    """Process user request"""
+async def shutdown_components(agent: IntelligentAgent):
+    """Write out queued learning records and release shared memory"""
+    try:
+        await agent.shutdown()
+        await rag_memory.release()
+    except Exception as e:
+        logger.error(f"Error during shutdown: {e}")
+
+def show_sections(placeholder) -> SectionCallback:
+    """on_section callback that renders technical-support sections into placeholder as they complete"""
+    sections = []
+    
+    async def on_section(event: Dict[str, Any]):
+        if event["status"] == "complete" and event["content"]:
+            sections.append(event["content"])
+            placeholder.text("\n\n".join(sections))
+    
+    return on_section
+
+async def process_request(user_input: str, on_section: Optional[SectionCallback] = None) -> Dict[str, Any]:
+    """Process user request; technical-support sections are passed to on_section as they complete"""
     try:
         # Ensure components are initialized
         if not st.session_state.components_initialized or st.session_state.intelligent_agent is None:
@@ -120,7 +143,7 @@ async def process_request(user_input: str) -> Dict[str, Any]:
         logger.info(f"Intent entities: {type(getattr(intent, 'entities', None))}, value: {getattr(intent, 'entities', None)}")
         
         # Execute intent
-        result = await agent.execute_intent(intent, user_id)
+        result = await agent.execute_intent(intent, user_id, on_section)
         logger.info(f"Intent executed: {type(result)}, keys: {result.keys() if isinstance(result, dict) else 'not dict'}")
         
         # Extract action and target from intent and result
@@ -351,7 +374,9 @@ def main():
             st.error("❌ Please initialize the system first")
         else:
             with st.spinner("🤖 Processing your request..."):
-                result = asyncio.run(process_request(user_input))
+                # Technical-support answers appear here section by section
+                sections_placeholder = st.empty()
+                result = asyncio.run(process_request(user_input, show_sections(sections_placeholder)))
                 
                 if result["success"]:
                     # Build status message
@@ -0,0 +1,85 @@
+"""
+SQLite Connection Pool
+Long-lived, tuned SQLite connections, one per thread
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Union
+
+logger = logging.getLogger(__name__)
+
+class SQLitePool:
+    """Hands each thread its own persistent connection to one database
+    
+    Opening a connection per query re-reads the schema and throws away the
+    connection's prepared-statement cache every time. Connections here stay
+    open, so repeated queries reuse their compiled statements. Every
+    connection uses WAL (readers do not block the writer), synchronous=NORMAL
+    (durable at checkpoints instead of fsync on every commit) and a larger
+    page cache.
+    """
+    
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        cache_mb: int = 20,
+        mmap_mb: int = 256,
+        synchronous: str = "NORMAL",
+        busy_timeout: float = 5.0,
+        cached_statements: int = 256
+    ):
+        self.db_path = str(db_path)
+        self.cache_mb = cache_mb
+        self.mmap_mb = mmap_mb
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+    
+    def _open(self) -> sqlite3.Connection:
+        # Each connection is only ever used by the thread that opened it;
+        # the flag lets close() run from another thread
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_mb * 1024}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_mb * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.append(conn)
+        logger.debug(f"Opened SQLite connection to {self.db_path} on {threading.current_thread().name}")
+        return conn
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """This thread's connection; commits on success and rolls back on error"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        with conn:
+            yield conn
+    
+    def close(self):
+        """Close every connection; threads reconnect on their next use"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.debug(f"Error closing SQLite connection: {e}")
+    
+    def __len__(self) -> int:
+        return len(self._connections)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules import each other flat when run as scripts; do the same here
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,25 @@
+"""
+Pattern fast path of IntelligentAgent.understand_intent
+"""
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from intelligent_agent import IntentCategory, intelligent_agent
+
+def test_equipment_error_code_is_not_fast_pathed():
+    # Scores SEARCH 0.811 against TECHNICAL_SUPPORT 0.685
+    assert intelligent_agent._fast_path_intent("tell me about the UR10 error code C204") is None
+
+def test_unambiguous_requests_still_use_fast_path():
+    navigation = intelligent_agent._fast_path_intent("go to Taipei 101")
+    search = intelligent_agent._fast_path_intent("tell me about Taipei 101")
+    assert navigation.category == IntentCategory.NAVIGATION
+    assert search.category == IntentCategory.SEARCH
+
+def test_entities_referring_to_the_assistant_or_context_are_not_fast_pathed():
+    # "you" is not something to search the web for
+    assert intelligent_agent._fast_path_intent("what are you") is None
+    assert intelligent_agent._fast_path_intent("what is your name") is None
+    assert intelligent_agent._fast_path_intent("你的名字是什麼") is None
@@ -0,0 +1,57 @@
+"""
+Priority admission and deadline shedding in LLMScheduler
+"""
+
+import asyncio
+
+import pytest
+
+# pytest imports the ai_system package for tests inside it, which loads RAG memory
+pytest.importorskip("sentence_transformers")
+
+from llm_scheduler import LLMScheduler, RequestPriority
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    scheduler = LLMScheduler(default_limit=1)
+    order = []
+    
+    async def request(name, priority):
+        async with scheduler.slot("llama3.2", priority):
+            order.append(name)
+    
+    async def run():
+        async with scheduler.slot("llama3.2"):
+            # Queued behind the busy slot, in this order
+            waiters = [
+                asyncio.ensure_future(request(name, priority)) for name, priority in [
+                    ("summary", RequestPriority.BACKGROUND),
+                    ("chat", RequestPriority.NORMAL),
+                    ("voice 1", RequestPriority.INTERACTIVE),
+                    ("voice 2", RequestPriority.INTERACTIVE)
+                ]
+            ]
+            await asyncio.sleep(0)
+            assert scheduler.get_stats()["llama3.2"]["queue_depth"] == 4
+        await asyncio.gather(*waiters)
+    
+    asyncio.run(run())
+    assert order == ["voice 1", "voice 2", "chat", "summary"]
+
+def test_request_past_its_deadline_is_shed_without_a_slot():
+    scheduler = LLMScheduler(default_limit=1)
+    
+    async def run():
+        async with scheduler.slot("llama3.2"):
+            with pytest.raises(asyncio.TimeoutError):
+                async with scheduler.slot("llama3.2", RequestPriority.INTERACTIVE, deadline=0.05):
+                    pytest.fail("an expired request must not run")
+        # The slot is free again for the next request
+        async with scheduler.slot("llama3.2", deadline=0.05):
+            pass
+    
+    asyncio.run(run())
+    stats = scheduler.get_stats()["llama3.2"]
+    assert stats["expired"] == 1
+    assert stats["granted"] == 2
+    assert stats["active"] == 0
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,59 @@
+"""
+EndpointBalancer routing and ejection
+"""
+
+import aiohttp
+import pytest
+
+# pytest imports the ai_system package for tests inside it, which loads RAG memory
+pytest.importorskip("sentence_transformers")
+
+from config import LoadBalancerConfig
+from load_balancer import EndpointBalancer
+
+A, B, C = "http://gpu-a:11434", "http://gpu-b:11434", "http://gpu-c:11434"
+
+def fail(balancer: EndpointBalancer, url: str, error: Exception):
+    with pytest.raises(type(error)):
+        with balancer.track(balancer.get_state(url)):
+            raise error
+
+def test_requests_go_to_the_least_loaded_endpoint():
+    balancer = EndpointBalancer(LoadBalancerConfig())
+    
+    with balancer.track(balancer.pick([A, B, C])) as first:
+        with balancer.track(balancer.pick([A, B, C])) as second:
+            third = balancer.pick([A, B, C])
+    assert len({first.url, second.url, third.url}) == 3
+    
+    # Sequential traffic is spread too, not pinned to the first idle endpoint
+    served = []
+    for _ in range(6):
+        with balancer.track(balancer.pick([A, B])) as state:
+            served.append(state.url)
+    assert served.count(A) == served.count(B) == 3
+
+def test_endpoints_with_the_model_are_preferred():
+    balancer = EndpointBalancer(LoadBalancerConfig())
+    balancer.get_state(B).models.add("codellama")
+    assert balancer.pick([A, B], "codellama").url == B
+    # Unknown models fall back to any endpoint
+    assert balancer.pick([A, B], "mistral").url in (A, B)
+
+def test_failing_endpoint_is_ejected_and_readmitted():
+    balancer = EndpointBalancer(LoadBalancerConfig(failure_threshold=2, ejection_seconds=60))
+    
+    # Errors caused by the request itself say nothing about the backend
+    fail(balancer, A, ValueError("bad request"))
+    fail(balancer, A, aiohttp.ClientConnectionError("refused"))
+    assert balancer.get_state(A).healthy
+    fail(balancer, A, aiohttp.ClientConnectionError("refused"))
+    assert not balancer.get_state(A).healthy
+    assert {balancer.pick([A, B]).url for _ in range(3)} == {B}
+    
+    # With every candidate ejected one is still used
+    assert balancer.pick([A]).url == A
+    
+    balancer.record_success(balancer.get_state(A))
+    assert balancer.get_stats([A])[A]["healthy"]
+    assert balancer.get_stats([A])[A]["total_failures"] == 2
@@ -0,0 +1,52 @@
+"""
+Response cache hits for repeated AIOrchestrator queries
+"""
+
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("aiohttp")
+
+import orchestrator
+from config import config
+from llm_manager import LLMManager
+from ollama_stub_server import OllamaStubServer
+from rag_memory import RAGMemorySystem
+
+def test_repeated_query_is_served_from_cache(monkeypatch, tmp_path):
+    server = OllamaStubServer(port=11498, response_text="Check the joint 3 encoder cable.")
+    for llm_config in config.llm_configs.values():
+        monkeypatch.setattr(llm_config, "endpoint", server.endpoint)
+        monkeypatch.setattr(llm_config, "endpoints", [])
+    monkeypatch.setattr(config, "reuse_generate_context", False)
+    
+    memory = RAGMemorySystem(replace(config.rag_config, vector_db_path=str(tmp_path / "memory"), vector_backend="faiss"))
+    manager = LLMManager()
+    monkeypatch.setattr(orchestrator, "rag_memory", memory)
+    monkeypatch.setattr(orchestrator, "llm_manager", manager)
+    ai = orchestrator.AIOrchestrator()
+    ai.system_initialized = True
+    
+    async def run():
+        await server.start()
+        await memory.initialize()
+        manager.response_cache.set_encoder(memory)
+        try:
+            first = await ai.process_query("How do I clear a UR10 protective stop?", use_tools=False)
+            # The first turn is now in memory and is retrieved as context
+            second = await ai.process_query("How do I clear a UR10 protective stop?", use_tools=False)
+            return first, second
+        finally:
+            await manager.shutdown()
+            await memory.close()
+            await server.stop()
+    
+    first, second = asyncio.run(run())
+    
+    assert any(doc["metadata"].get("type") == "conversation_message" for doc in second["context_used"])
+    assert second["response"] == first["response"]
+    assert manager.response_cache.stats["misses"] == 1
+    assert manager.response_cache.stats["hits"] == 1
@@ -0,0 +1,67 @@
+"""
+Token budgeting in PromptBuilder
+"""
+
+import pytest
+
+# pytest imports the ai_system package for tests inside it, which loads RAG memory
+pytest.importorskip("sentence_transformers")
+
+from config import LLMConfig
+from prompt_builder import TRUNCATION_MARKER, PromptBuilder, estimate_tokens
+
+def test_token_estimate_counts_cjk_characters_individually():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("機械手臂") == 4
+    assert estimate_tokens("UR10 機械手臂") == 6
+
+def test_budget_is_context_window_minus_reply():
+    llm_config = LLMConfig(model_name="llama3.2", model_type="ollama", context_length=8192, max_tokens=2048)
+    assert PromptBuilder.for_model(llm_config).budget_tokens == 6144
+    assert PromptBuilder.for_model(llm_config, max_tokens=192).budget_tokens == 8000
+
+def test_within_budget_nothing_is_cut():
+    builder = PromptBuilder(1000)
+    builder.add("system", "x" * 400, required=True)
+    builder.add("memory", "y" * 400, priority=2)
+    report = builder.build().report()
+    assert not report["over_budget"]
+    assert {section["status"] for section in report["sections"].values()} == {"kept"}
+
+def test_lowest_priority_and_oldest_sections_are_cut_first():
+    builder = PromptBuilder(300)
+    builder.add("system", "s" * 400, required=True)  # 100 tokens
+    builder.add("history_0", "old " * 100, priority=1)  # 100 tokens
+    builder.add("history_1", "new " * 100, priority=1)  # 100 tokens
+    builder.add("memory", "m" * 400, priority=2)  # 100 tokens
+    builder.add("query", "q" * 200, required=True)  # 50 tokens
+    report = builder.build().report()
+    
+    assert report["total_tokens"] <= 300
+    statuses = {name: section["status"] for name, section in report["sections"].items()}
+    assert statuses == {
+        "system": "kept",
+        "history_0": "dropped",
+        "history_1": "truncated",
+        "memory": "kept",
+        "query": "kept"
+    }
+    assert builder.text("history_0") == ""
+    assert builder.text("history_1").startswith("new new")
+    assert builder.text("history_1").endswith(TRUNCATION_MARKER)
+
+def test_small_remainder_is_dropped_and_required_sections_are_never_cut():
+    builder = PromptBuilder(100)
+    builder.add("system", "s" * 400, required=True)  # fills the budget alone
+    builder.add("memory", "m" * 400, priority=2, min_tokens=32)
+    report = builder.build().report()
+    
+    assert builder.text("system") == "s" * 400
+    assert report["sections"]["memory"]["status"] == "dropped"
+    assert report["total_tokens"] == 100
+    
+    builder = PromptBuilder(50)
+    builder.add("system", "s" * 400, required=True)
+    assert builder.build().report()["over_budget"]
+    assert builder.text("system") == "s" * 400
@@ -0,0 +1,68 @@
+"""
+Re-ingesting files with rag_ingest
+"""
+
+import asyncio
+import json
+from dataclasses import replace
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from config import config
+from rag_ingest import BulkIngester, IngestCheckpoint, find_sources, iter_records
+from rag_memory import RAGMemorySystem
+
+def ingest(memory: RAGMemorySystem, source_dir, checkpoint_path):
+    sources = find_sources([str(source_dir)])
+    checkpoint_path.unlink(missing_ok=True)
+    
+    async def run():
+        with BulkIngester(memory, workers=0, batch_docs=2) as ingester:
+            await ingester.ingest(
+                iter_records(sources, "document"),
+                IngestCheckpoint.load(checkpoint_path, sources),
+                checkpoint_path
+            )
+    
+    asyncio.run(run())
+
+def counts(memory: RAGMemorySystem):
+    stats = asyncio.run(memory.get_memory_stats())
+    return stats["vector_db"]["total_chunks"], stats["metadata_db"]["total_documents"]
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = RAGMemorySystem(replace(
+        config.rag_config,
+        vector_db_path=str(tmp_path / "memory"),
+        vector_backend="faiss",
+        chunk_size=10,
+        chunk_overlap=0
+    ))
+    asyncio.run(memory.initialize())
+    yield memory
+    asyncio.run(memory.close())
+
+def test_reingest_replaces_chunks_and_records(memory, tmp_path):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    checkpoint_path = tmp_path / "checkpoint.json"
+    manual = source_dir / "manual.txt"
+    records = source_dir / "faults.jsonl"
+    
+    manual.write_text("word " * 50)  # five chunks
+    records.write_text("".join(json.dumps({"content": f"fault code C{i}"}) + "\n" for i in range(4)))
+    ingest(memory, source_dir, checkpoint_path)
+    assert counts(memory) == (9, 5)
+    
+    # Same files again: nothing is duplicated
+    ingest(memory, source_dir, checkpoint_path)
+    assert counts(memory) == (9, 5)
+    
+    # Shorter files: the surplus chunks and records are gone
+    manual.write_text("word " * 20)  # two chunks
+    records.write_text(json.dumps({"content": "fault code C0"}) + "\n")
+    ingest(memory, source_dir, checkpoint_path)
+    assert counts(memory) == (3, 2)
@@ -0,0 +1,36 @@
+"""
+RAGMemorySystem used from several event loops
+"""
+
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from config import config
+from rag_memory import RAGMemorySystem
+
+def test_encode_batch_left_on_finished_loop_does_not_block(tmp_path):
+    memory = RAGMemorySystem(replace(
+        config.rag_config,
+        vector_db_path=str(tmp_path / "memory"),
+        vector_backend="faiss",
+        encode_batch_window=0.2
+    ))
+    
+    async def leave_batch_pending():
+        await memory.initialize()
+        asyncio.ensure_future(memory.encode_async(["queued when the loop ended"]))
+        await asyncio.sleep(0)
+    
+    async def encode_on_new_loop():
+        try:
+            return await asyncio.wait_for(memory.encode_async(["next request"]), timeout=5)
+        finally:
+            await memory.close()
+    
+    # Like Streamlit, each request runs under its own asyncio.run()
+    asyncio.run(leave_batch_pending())
+    assert len(asyncio.run(encode_on_new_loop())) == 1
@@ -0,0 +1,47 @@
+"""
+Concurrent technical-support sections of IntelligentAgent
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from config import config
+from intelligent_agent import intelligent_agent
+
+async def section(content: str, delay: float) -> str:
+    await asyncio.sleep(delay)
+    return content
+
+def test_sections_are_reported_as_they_complete(monkeypatch):
+    monkeypatch.setattr(config, "technical_support_deadline", 0.5)
+    events = []
+    
+    async def on_section(event):
+        events.append((event["section"], event["status"], asyncio.get_running_loop().time()))
+    
+    async def run():
+        started = asyncio.get_running_loop().time()
+        text = await intelligent_agent._gather_sections(
+            {
+                "guide": section("guide", 5.0),
+                "memory": section("memory", 0.2),
+                "immediate_steps": section("steps", 0.0)
+            },
+            on_section,
+            timeout_text="guide pending"
+        )
+        return text, started
+    
+    text, started = asyncio.run(run())
+    
+    assert [(name, status) for name, status, _ in events] == [
+        ("immediate_steps", "complete"),
+        ("memory", "complete"),
+        ("guide", "timed_out")
+    ]
+    # The first section is delivered long before the deadline
+    assert events[0][2] - started < 0.1
+    assert text == "guide pending\nmemory\nsteps"
@@ -0,0 +1,87 @@
+"""
+FaissVectorStore deletes, compaction, replacement and persistence
+"""
+
+import numpy as np
+import pytest
+
+# pytest imports the ai_system package for tests inside it, which loads RAG memory
+pytest.importorskip("sentence_transformers")
+
+from vector_store import FaissVectorStore
+
+DIM = 16
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+
+def fill(store: FaissVectorStore, embeddings: np.ndarray):
+    ids = [f"chunk_{i}" for i in range(len(embeddings))]
+    store.add(ids, embeddings, [f"text {i}" for i in range(len(ids))], [{"doc_id": f"doc_{i // 4}"} for i in range(len(ids))])
+    return ids
+
+def nearest(store: FaissVectorStore, query: np.ndarray, n: int = 5):
+    return store.query(query[None, :], n)["ids"][0]
+
+def exact_nearest(embeddings: np.ndarray, live: list, query: np.ndarray, n: int = 5):
+    distances = ((embeddings[live] - query) ** 2).sum(axis=1)
+    return [f"chunk_{live[i]}" for i in np.argsort(distances)[:n]]
+
+def test_delete_then_compact_then_search(tmp_path):
+    store = FaissVectorStore(str(tmp_path), compact_ratio=0.25)
+    embeddings = vectors(40)
+    fill(store, embeddings)
+    
+    # Below the ratio deleted rows stay as tombstones
+    store.delete([f"chunk_{i}" for i in range(5)])
+    assert store.get_stats()["deleted_rows"] == 5
+    assert store.compactions == 0
+    assert "chunk_0" not in nearest(store, embeddings[0])
+    
+    store.delete([f"chunk_{i}" for i in range(5, 12)])
+    stats = store.get_stats()
+    assert store.compactions == 1
+    assert (stats["stored_rows"], stats["deleted_rows"], store.count()) == (28, 0, 28)
+    
+    live = list(range(12, 40))
+    for i in (0, 7, 12, 25, 39):
+        assert nearest(store, embeddings[i]) == exact_nearest(embeddings, live, embeddings[i])
+    hit = store.query(embeddings[30][None, :], 1)
+    assert hit["ids"][0] == ["chunk_30"]
+    assert hit["documents"][0] == ["text 30"]
+    assert hit["metadatas"][0] == [{"doc_id": "doc_7"}]
+    assert sorted(store.get_ids({"doc_id": "doc_3"})) == ["chunk_12", "chunk_13", "chunk_14", "chunk_15"]
+    store.close()
+
+def test_adding_an_existing_id_replaces_it(tmp_path):
+    store = FaissVectorStore(str(tmp_path))
+    old, new = vectors(2, seed=1)
+    store.add(["chunk_a"], old[None, :], ["old text"], [{"doc_id": "doc_a"}])
+    store.add(["chunk_a"], new[None, :], ["new text"], [{"doc_id": "doc_a"}])
+    
+    assert store.count() == 1
+    assert store.get_ids({"doc_id": "doc_a"}) == ["chunk_a"]
+    result = store.query(new[None, :], 5)
+    assert result["ids"][0] == ["chunk_a"]
+    assert result["documents"][0] == ["new text"]
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-4)
+    store.close()
+
+@pytest.mark.parametrize("deleted", [3, 12])  # tombstoned, then compacted
+def test_reopen_from_disk(tmp_path, deleted):
+    embeddings = vectors(40)
+    store = FaissVectorStore(str(tmp_path))
+    fill(store, embeddings)
+    store.delete([f"chunk_{i}" for i in range(deleted)])
+    before = [store.query(embeddings[i][None, :], 5) for i in (0, 20, 39)]
+    store.close()
+    
+    reopened = FaissVectorStore(str(tmp_path))
+    assert reopened.count() == 40 - deleted
+    assert [reopened.query(embeddings[i][None, :], 5) for i in (0, 20, 39)] == before
+    
+    # Appending after a reopen continues after the stored rows
+    reopened.add(["chunk_new"], embeddings[0][None, :], ["text new"], [{"doc_id": "doc_new"}])
+    assert nearest(reopened, embeddings[0], 1) == ["chunk_new"]
+    assert reopened.count() == 41 - deleted
+    reopened.close()
@@ -0,0 +1,433 @@
+"""
+Vector Stores
+Pluggable storage and nearest-neighbour search for RAG chunk embeddings
+
+RAGMemorySystem talks to a VectorStore. ChromaVectorStore wraps a Chroma
+collection; FaissVectorStore keeps everything in process: vectors in a
+memory-mapped float32 file, chunk text and metadata in SQLite, and a FAISS
+index (or a NumPy scan when faiss is not installed) over the vectors.
+Both return query results in Chroma's shape, with squared L2 distances.
+"""
+
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from .config import RAGConfig
+    from .sqlite_pool import SQLitePool
+except ImportError:
+    from config import RAGConfig
+    from sqlite_pool import SQLitePool
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+class VectorStore:
+    """Interface for chunk embedding storage
+    
+    Not thread-safe; RAGMemorySystem calls it from its database thread only.
+    """
+    
+    backend = "base"
+    
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+    
+    def query(self, query_embeddings: np.ndarray, n_results: int) -> Dict[str, List[List[Any]]]:
+        """Nearest chunks per query: {"ids", "documents", "metadatas", "distances"}, one list per query"""
+        raise NotImplementedError
+    
+    def get_ids(self, where: Dict[str, Any]) -> List[str]:
+        """Ids of chunks whose metadata equals every key/value in where"""
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+    
+    def count(self) -> int:
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "total_chunks": self.count()}
+
+class ChromaVectorStore(VectorStore):
+    """Chroma persistent collection"""
+    
+    backend = "chroma"
+    
+    def __init__(self, path: str, collection_name: str):
+        import chromadb
+        from chromadb.config import Settings
+        
+        # Initialize ChromaDB client
+        self.client = chromadb.PersistentClient(
+            path=path,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        
+        # Get or create collection
+        try:
+            self.collection = self.client.get_collection(collection_name)
+            logger.info(f"Found existing collection: {collection_name}")
+        except:
+            self.collection = self.client.create_collection(
+                name=collection_name,
+                metadata={"description": "Long-term memory documents"}
+            )
+            logger.info(f"Created new collection: {collection_name}")
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        # Adding an existing id replaces that chunk, as in FaissVectorStore
+        self.collection.upsert(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=np.asarray(embeddings).tolist()
+        )
+    
+    def query(self, query_embeddings, n_results):
+        return self.collection.query(
+            query_embeddings=np.asarray(query_embeddings).tolist(),
+            n_results=n_results
+        )
+    
+    def get_ids(self, where):
+        return self.collection.get(where=where)["ids"]
+    
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+    
+    def count(self):
+        return self.collection.count()
+
+class FaissVectorStore(VectorStore):
+    """In-process vector store over a memory-mapped float32 matrix
+    
+    Row i of vectors.f32 is the embedding of the chunk whose id is
+    _ids[i], so the index only ever deals in row numbers. Index types:
+    "flat" (exact), "hnsw" (graph, no training), "ivf" (clustered, trained
+    on the stored vectors), or "auto": flat up to flat_limit chunks and HNSW
+    beyond. The index is saved on close() so large stores do not rebuild it
+    on startup.
+    
+    Deleted chunks are tombstoned and filtered out of results. Once they
+    make up compact_ratio of the stored rows, the file is rewritten without
+    them and the index rebuilt. Adding an existing id replaces that chunk.
+    """
+    
+    backend = "faiss"
+    
+    def __init__(
+        self,
+        path: str,
+        index_type: str = "auto",
+        flat_limit: int = 10_000,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        nprobe: int = 16,
+        compact_ratio: float = 0.25
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.index_type = index_type
+        self.flat_limit = flat_limit
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self.compact_ratio = compact_ratio
+        self.compactions = 0
+        
+        self._meta = SQLitePool(self.path / "chunks.db")
+        with self._meta.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chunks (
+                    row INTEGER PRIMARY KEY,
+                    chunk_id TEXT NOT NULL,
+                    document TEXT,
+                    metadata TEXT,
+                    deleted INTEGER DEFAULT 0
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_chunks_doc_id
+                ON chunks (json_extract(metadata, '$.doc_id'))
+            ''')
+            rows = conn.execute("SELECT row, chunk_id, deleted FROM chunks ORDER BY row").fetchall()
+        
+        state_path = self.path / "store.json"
+        state = json.loads(state_path.read_text()) if state_path.exists() else {}
+        self.dim: Optional[int] = state.get("dim")
+        self._size = len(rows)
+        self._ids: List[Optional[str]] = [None if deleted else chunk_id for _, chunk_id, deleted in rows]
+        self._rows: Dict[str, int] = {chunk_id: row for row, chunk_id in enumerate(self._ids) if chunk_id is not None}
+        self._deleted = self._size - len(self._rows)
+        self._vectors: Optional[np.memmap] = None
+        self._index = None
+        self._index_kind: Optional[str] = None
+        if self.dim is not None:
+            self._map_vectors(max(self._size, 1))
+            self._load_index()
+    
+    def _map_vectors(self, capacity: int):
+        """(Re)map vectors.f32 with room for at least capacity rows"""
+        vectors_path = self.path / "vectors.f32"
+        row_bytes = self.dim * 4
+        current = vectors_path.stat().st_size // row_bytes if vectors_path.exists() else 0
+        if current < capacity:
+            if self._vectors is not None:
+                self._vectors.flush()
+            with open(vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+            current = capacity
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(current, self.dim))
+    
+    def _save_state(self):
+        (self.path / "store.json").write_text(json.dumps({"dim": self.dim, "size": self._size}))
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if not len(ids):
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._map_vectors(1024)
+            self._save_state()
+        
+        replaced = [chunk_id for chunk_id in ids if chunk_id in self._rows]
+        if replaced:
+            self.delete(replaced)
+        
+        start = self._size
+        end = start + len(ids)
+        if end > self._vectors.shape[0]:
+            # Double the file so appends stay amortized O(1)
+            self._map_vectors(max(end, self._vectors.shape[0] * 2))
+        self._vectors[start:end] = vectors
+        
+        with self._meta.connection() as conn:
+            conn.executemany(
+                "INSERT INTO chunks (row, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (start + i, chunk_id, document, json.dumps(metadata))
+                    for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                ]
+            )
+        for i, chunk_id in enumerate(ids):
+            self._ids.append(chunk_id)
+            self._rows[chunk_id] = start + i
+        self._size = end
+        
+        if self._index is not None and self._index_kind == self._wanted_index_kind():
+            self._index.add(vectors)
+        else:
+            self._index = None  # built on the next query
+        self._save_state()
+    
+    def delete(self, ids):
+        rows = [self._rows.pop(chunk_id) for chunk_id in ids if chunk_id in self._rows]
+        if not rows:
+            return
+        with self._meta.connection() as conn:
+            conn.executemany("UPDATE chunks SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+        for row in rows:
+            self._ids[row] = None
+        self._deleted += len(rows)
+        if self._deleted >= self.compact_ratio * self._size:
+            self._compact()
+    
+    def _compact(self):
+        """Rewrite the vectors and row numbers without the deleted rows"""
+        live = [row for row, chunk_id in enumerate(self._ids) if chunk_id is not None]
+        vectors_path = self.path / "vectors.f32"
+        tmp_path = self.path / "vectors.f32.tmp"
+        compacted = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(max(len(live), 1), self.dim))
+        for start in range(0, len(live), 65536):
+            part = live[start:start + 65536]
+            compacted[start:start + len(part)] = self._vectors[part]
+        compacted.flush()
+        del compacted
+        
+        with self._meta.connection() as conn:
+            conn.execute("DELETE FROM chunks WHERE deleted = 1")
+            # Ascending, so a row never moves onto one that is still occupied
+            conn.executemany("UPDATE chunks SET row = ? WHERE row = ?", [(new, old) for new, old in enumerate(live) if new != old])
+            # Swap the file in before committing; only a crash between the two leaves them out of step
+            self._vectors = None
+            os.replace(tmp_path, vectors_path)
+        
+        for stale in ("index.faiss", "index.json"):
+            (self.path / stale).unlink(missing_ok=True)
+        self._ids = [self._ids[row] for row in live]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._size = len(live)
+        self._deleted = 0
+        self._index = None
+        self._map_vectors(max(self._size, 1))
+        self._save_state()
+        self.compactions += 1
+        logger.info(f"Compacted vector store to {self._size} rows")
+    
+    def count(self):
+        return self._size - self._deleted
+    
+    def get_ids(self, where):
+        clauses, params = ["deleted = 0"], []
+        for key, value in where.items():
+            if not re.fullmatch(r"\w+", key):
+                raise Exception(f"Unsupported metadata key: {key!r}")
+            clauses.append(f"json_extract(metadata, '$.{key}') = ?")
+            params.append(value)
+        with self._meta.connection() as conn:
+            rows = conn.execute(f"SELECT chunk_id FROM chunks WHERE {' AND '.join(clauses)}", params).fetchall()
+        return [row[0] for row in rows]
+    
+    def _wanted_index_kind(self) -> str:
+        if faiss is None:
+            return "numpy"
+        if self.index_type != "auto":
+            return self.index_type
+        return "flat" if self._size <= self.flat_limit else "hnsw"
+    
+    def _build_index(self):
+        kind = self._wanted_index_kind()
+        vectors = self._vectors[:self._size]
+        if kind == "numpy":
+            index = None
+        elif kind == "flat":
+            index = faiss.IndexFlatL2(self.dim)
+        elif kind == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dim, self.hnsw_m)
+        elif kind == "ivf":
+            nlist = max(1, min(int(4 * np.sqrt(self._size)), self._size // 39))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.dim), self.dim, nlist)
+            # About 50 training points per list is plenty for k-means
+            sample = np.sort(np.random.default_rng(0).choice(self._size, min(self._size, nlist * 50), replace=False))
+            index.train(np.ascontiguousarray(vectors[sample]))
+        else:
+            raise Exception(f"Unknown FAISS index type: {kind}")
+        
+        if index is not None:
+            # Add in slices so a huge memmap is never copied into memory at once
+            for start in range(0, self._size, 65536):
+                index.add(np.ascontiguousarray(vectors[start:start + 65536]))
+            logger.info(f"Built {kind} index over {self._size} vectors")
+        self._index, self._index_kind = index, kind
+    
+    def _load_index(self):
+        index_path = self.path / "index.faiss"
+        if faiss is None or not index_path.exists():
+            return
+        index = faiss.read_index(str(index_path))
+        meta_path = self.path / "index.json"
+        kind = json.loads(meta_path.read_text()).get("kind") if meta_path.exists() else None
+        if index.ntotal == self._size and kind == self._wanted_index_kind():
+            self._index, self._index_kind = index, kind
+    
+    def _search(self, queries: np.ndarray, k: int):
+        if self._index_kind == "numpy":
+            vectors = self._vectors[:self._size]
+            # ||v - q||^2 without materializing the differences
+            distances = (
+                np.einsum("ij,ij->i", vectors, vectors)[None, :]
+                - 2 * queries @ vectors.T
+                + np.einsum("ij,ij->i", queries, queries)[:, None]
+            )
+            rows = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            ordered = np.take_along_axis(distances, rows, axis=1).argsort(axis=1)
+            rows = np.take_along_axis(rows, ordered, axis=1)
+            return np.take_along_axis(distances, rows, axis=1), rows
+        
+        if self._index_kind == "hnsw":
+            self._index.hnsw.efSearch = max(self.ef_search, k)
+        elif self._index_kind == "ivf":
+            self._index.nprobe = self.nprobe
+        return self._index.search(queries, k)
+    
+    def query(self, query_embeddings, n_results):
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        queries = np.ascontiguousarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim or 1)
+        if self.count() == 0:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+        
+        if self._index_kind != self._wanted_index_kind() or (self._index is None and self._index_kind != "numpy"):
+            self._build_index()
+        
+        # Deleted rows are at most compact_ratio of the index; over-fetch a
+        # little and widen only for queries whose neighbours are mostly deleted
+        k = min(self._size, n_results if not self._deleted else 2 * n_results + 8)
+        while True:
+            distances, rows = self._search(queries, k)
+            live_hits = [sum(1 for row in query_rows if row >= 0 and self._ids[row] is not None) for query_rows in rows]
+            if k >= self._size or min(live_hits) >= min(n_results, self.count()):
+                break
+            k = min(self._size, k * 4)
+        
+        for query_distances, query_rows in zip(distances, rows):
+            hits = [
+                (int(row), float(distance))
+                for distance, row in zip(query_distances, query_rows)
+                if row >= 0 and self._ids[row] is not None
+            ][:n_results]
+            with self._meta.connection() as conn:
+                stored = dict(
+                    (row, (document, metadata))
+                    for row, document, metadata in conn.execute(
+                        f"SELECT row, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(hits))})",
+                        [row for row, _ in hits]
+                    )
+                ) if hits else {}
+            results["ids"].append([self._ids[row] for row, _ in hits])
+            results["documents"].append([stored[row][0] for row, _ in hits])
+            results["metadatas"].append([json.loads(stored[row][1]) for row, _ in hits])
+            results["distances"].append([distance for _, distance in hits])
+        return results
+    
+    def close(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+        if self._index is not None and self._index_kind not in (None, "numpy"):
+            faiss.write_index(self._index, str(self.path / "index.faiss"))
+            (self.path / "index.json").write_text(json.dumps({"kind": self._index_kind}))
+        self._save_state()
+        self._meta.close()
+    
+    def get_stats(self):
+        stats = super().get_stats()
+        stats.update({
+            "index": self._index_kind or self._wanted_index_kind(),
+            "stored_rows": self._size,
+            "deleted_rows": self._deleted,
+            "compactions": self.compactions
+        })
+        return stats
+
+def create_vector_store(rag_config: RAGConfig, collection_name: str) -> VectorStore:
+    """Vector store for RAGConfig.vector_backend"""
+    if rag_config.vector_backend == "chroma":
+        return ChromaVectorStore(rag_config.vector_db_path, collection_name)
+    if rag_config.vector_backend == "faiss":
+        if faiss is None:
+            logger.warning("faiss is not installed; searching vectors with NumPy")
+        return FaissVectorStore(
+            str(Path(rag_config.vector_db_path) / collection_name),
+            index_type=rag_config.faiss_index,
+            flat_limit=rag_config.faiss_flat_limit,
+            compact_ratio=rag_config.faiss_compact_ratio
+        )
+    raise Exception(f"Unknown vector backend: {rag_config.vector_backend}")